@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yarc_stub import StubServer  # noqa: E402
+
+IDENTITY = {"userId": "12", "districtId": "3", "location": "Shimla", "district": "Shimla", "offCd": "7"}
+
+
+@pytest.fixture
+def identity():
+    return dict(IDENTITY)
+
+
+@pytest.fixture
+def stub(request):
+    # A stub pushdata server on a free port; parametrize indirectly with StubServer keyword arguments
+    server = StubServer(port=0, **getattr(request, "param", {})).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def ids(tmp_path):
+    from yarc_core import IdGenerator
+    return IdGenerator(str(tmp_path / "ids.json"))
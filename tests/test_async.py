@@ -0,0 +1,139 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from yarc_core import AsyncEngine, AsyncHTTPClient, AsyncTransportError
+
+OK = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"
+
+
+class ScriptedServer:
+    # Reads requests off keep-alive connections and answers the n-th one with
+    # replies[n], a (bytes, close) pair: close drops the connection after writing
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.bodies = []
+        self.connections = 0
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.url = "http://127.0.0.1:%d/pushdata" % self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn, conn.makefile("rb") as f:
+            while True:
+                headers = {}
+                line = f.readline()
+                if not line:
+                    return
+                while line not in (b"\r\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                    line = f.readline()
+                self.bodies.append(f.read(int(headers.get("content-length", 0))))
+                reply, close = self.replies.pop(0)
+                conn.sendall(reply)
+                if close:
+                    return
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def scripted():
+    servers = []
+
+    def start(*replies):
+        servers.append(ScriptedServer(replies))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def post_each(url, bodies):
+    # Posts bodies one after another through one client; failures are returned
+    async def run():
+        client = AsyncHTTPClient(max_connections=1)
+        results = []
+        for body in bodies:
+            try:
+                results.append(await client.post(url, body, timeout=5))
+            except AsyncTransportError as e:
+                results.append(e)
+        client.close()
+        return results
+
+    return asyncio.run(run())
+
+
+def test_keep_alive_connection_is_reused(scripted):
+    server = scripted((OK, False), (OK, False))
+    results = post_each(server.url, [b"1", b"2"])
+    assert [result.content for result in results] == [b"ok", b"ok"]
+    assert server.connections == 1
+
+
+def test_idle_connection_closed_before_answering_is_retried(scripted):
+    server = scripted((OK, False), (b"", True), (OK, False))
+    results = post_each(server.url, [b"1", b"2"])
+    assert [result.status_code for result in results] == [200, 200]
+    assert server.bodies == [b"1", b"2", b"2"]
+    assert server.connections == 2
+
+
+def test_failure_after_the_response_started_is_not_resent(scripted):
+    server = scripted((OK, False), (b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n", True))
+    results = post_each(server.url, [b"1", b"2"])
+    assert results[0].status_code == 200
+    assert isinstance(results[1], AsyncTransportError)
+    assert server.bodies == [b"1", b"2"]
+
+
+def test_fresh_connection_failure_is_not_resent(scripted):
+    server = scripted((b"", True))
+    assert isinstance(post_each(server.url, [b"1"])[0], AsyncTransportError)
+    assert server.bodies == [b"1"]
+
+
+def test_engine_posts_json_and_prepares_off_the_loop(scripted):
+    server = scripted((OK, False))
+    engine = AsyncEngine(max_in_flight=2)
+    try:
+        threads = []
+
+        def prepare(response):
+            threads.append(threading.current_thread())
+            return response.status_code, response.text
+
+        result = engine.post(server.url, {"notice": 1}, timeout=5, prepare=prepare).result(5)
+    finally:
+        engine.close()
+    assert result == (200, "ok")
+    assert json.loads(server.bodies[0]) == {"notice": 1}
+    assert threads[0] is not engine.thread
+
+
+def test_thread_per_request_draws_from_the_given_ids(stub, identity, ids, monkeypatch):
+    import yarc_core
+
+    def shared_ids():
+        raise AssertionError("the shared ~/.yarc ID space was used")
+
+    monkeypatch.setattr(yarc_core, "id_generator", shared_ids)
+    stats = yarc_core.run_load_thread_per_request("custom", identity, 3, concurrency=2, url=stub.url, ids=ids)
+    assert stats.total == 3
+    assert stats.status_counts.get("2xx") == 3
@@ -0,0 +1,50 @@
+from yarc_core import map_batch_response, prepare_response_view
+
+NUMBERS = ["REAMN000000000001A0001", "REAMN000000000002A0002", "REAMN000000000003A0003"]
+
+
+def test_items_are_matched_by_transaction_number():
+    items = [{"transactionNo": number, "status": f"S{index}"} for index, number in enumerate(NUMBERS)]
+    parsed = {"status": "SUCCESS", "data": list(reversed(items))}
+    assert map_batch_response(NUMBERS, parsed) == dict(zip(NUMBERS, items))
+
+
+def test_numbers_missing_from_the_items_get_none():
+    parsed = {"data": [{"transactionNo": NUMBERS[1], "status": "ACCEPTED"}]}
+    results = map_batch_response(NUMBERS, parsed)
+    assert results == {NUMBERS[0]: None, NUMBERS[1]: parsed["data"][0], NUMBERS[2]: None}
+
+
+def test_items_without_numbers_are_matched_by_position():
+    parsed = [{"ok": True}, {"ok": False}, {"ok": True}]
+    assert map_batch_response(NUMBERS, parsed) == dict(zip(NUMBERS, parsed))
+
+
+def test_a_count_mismatch_gives_every_notice_the_whole_body():
+    parsed = {"status": "FAILURE", "data": [{"ok": True}]}
+    assert map_batch_response(NUMBERS, parsed) == {number: parsed for number in NUMBERS}
+
+
+def test_unparsed_bodies_are_shared():
+    assert map_batch_response(NUMBERS, None) == {number: None for number in NUMBERS}
+    assert map_batch_response(NUMBERS, "Bad Gateway") == {number: "Bad Gateway" for number in NUMBERS}
+
+
+class Response:
+    def __init__(self, status_code, content):
+        import datetime
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode("utf-8")
+        self.elapsed = datetime.timedelta(seconds=0.25)
+
+
+def test_response_view_counts_itemised_notices():
+    body = (
+        b'{"status": "SUCCESS", "data": [{"transactionNo": "%s", "status": "ACCEPTED"}, '
+        b'{"transactionNo": "%s", "status": "ACCEPTED"}]}' % (NUMBERS[0].encode(), NUMBERS[2].encode())
+    )
+    view = prepare_response_view(Response(200, body), NUMBERS)
+    assert view.status_code == 200
+    assert view.itemised == 2
+    assert view.summary == {"status": "SUCCESS"}
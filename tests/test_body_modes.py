@@ -0,0 +1,42 @@
+import pytest
+import requests
+
+from yarc_core import AsyncEngine, BodyModes, post_parts
+
+PARTS = (b'{"cctvNoticeData": [{"transactionNo": "', b"T1", b'"}]}')
+
+
+def send_twice(url, modes):
+    # The same parts through both transports, each twice
+    statuses = []
+    with requests.Session() as session:
+        for _ in range(2):
+            statuses.append(post_parts(session, url, PARTS, "custom", modes, timeout=5).status_code)
+    engine = AsyncEngine(max_in_flight=1)
+    for _ in range(2):
+        statuses.append(engine.post(url, PARTS, url_type="custom", body_modes=modes).result(timeout=5).status_code)
+    engine.close()
+    return statuses
+
+
+@pytest.mark.parametrize("stub", [{"gzip": False}], indirect=True)
+def test_refused_gzip_falls_back_to_stream(stub):
+    modes = BodyModes({"custom": "gzip"})
+    with requests.Session() as session:
+        assert post_parts(session, stub.url, PARTS, "custom", modes, timeout=5).status_code == 200
+    assert modes.stats("custom") == {"mode": "stream", "fallbacks": 1}
+    engine_modes = BodyModes({"custom": "gzip"})
+    engine = AsyncEngine(max_in_flight=1)
+    response = engine.post(stub.url, PARTS, url_type="custom", body_modes=engine_modes).result(timeout=5)
+    engine.close()
+    assert response.status_code == 200
+    assert engine_modes.stats("custom") == {"mode": "stream", "fallbacks": 1}
+    # Later sends go out in stream mode straight away
+    assert send_twice(stub.url, modes) == [200] * 4
+    assert modes.stats("custom") == {"mode": "stream", "fallbacks": 1}
+
+
+def test_accepted_gzip_is_kept(stub):
+    modes = BodyModes({"custom": "gzip"})
+    assert send_twice(stub.url, modes) == [200] * 4
+    assert modes.stats("custom") == {"mode": "gzip", "fallbacks": 0}
@@ -0,0 +1,85 @@
+import json
+import re
+
+import pytest
+
+from yarc_core import SendCapture, read_capture, run_load, run_replay
+
+
+TIME = "2024-01-01 10:00:00"
+
+
+def notices(records):
+    return [notice for record in records for notice in record["notices"]]
+
+
+def test_replay_resends_the_captured_notices_with_fresh_ids(stub, tmp_path, identity, ids):
+    captured_path = str(tmp_path / "capture.jsonl.gz")
+    capture = SendCapture(captured_path, run_id="first")
+    stats = run_load("custom", identity, total=12, concurrency=3, url=stub.url, ids=ids, capture=capture)
+    capture.close()
+    assert stats.errors == 0
+    records = read_capture(captured_path)
+    assert len(records) == 12
+    assert {record["run"] for record in records} == {"first"}
+    assert all(record["identity"] == identity and record["status"] == 200 for record in records)
+
+    replayed_path = str(tmp_path / "replay.jsonl")
+    capture = SendCapture(replayed_path, run_id="replay")
+    stats = run_replay(records, "custom", speed=0, concurrency=3, url=stub.url, ids=ids, capture=capture)
+    capture.close()
+    assert stats.errors == 0 and sum(stats.status_counts.values()) == 12
+    replayed = read_capture(replayed_path)
+    assert len(replayed) == 12
+    assert all(record["identity"] == identity for record in replayed)
+    before, after = notices(records), notices(replayed)
+    assert sorted((notice["voilationTime"], notice["actionTime"]) for notice in after) == sorted(
+        (notice["voilationTime"], notice["actionTime"]) for notice in before
+    )
+    fresh = {notice["transactionNo"] for notice in after}
+    assert len(fresh) == 12 and not fresh & {notice["transactionNo"] for notice in before}
+
+
+def test_runs_are_appended_and_selected_by_id(tmp_path, identity):
+    path = str(tmp_path / "capture.jsonl")
+    for run_id, count in (("a", 2), ("b", 3)):
+        capture = SendCapture(path, append=True, run_id=run_id)
+        for i in range(count):
+            notice = {"transactionNo": f"{run_id}{i}", "voilationTime": TIME, "actionTime": TIME}
+            fields = {"offenceId": 1, "identity": identity, "notices": [notice]}
+            capture.record(fields, "custom", 100.0 - i, 200, 0.01)
+        capture.close()
+    # Sends are read back in send order
+    assert [record["notices"][0]["transactionNo"] for record in read_capture(path)] == ["b2", "b1", "b0"]
+    assert len(read_capture(path, "a")) == 2
+    with pytest.raises(ValueError, match=r"no run c \(runs: a, b\)"):
+        read_capture(path, "c")
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda record: record["notices"][0].pop("actionTime"), "notice 0 has no actionTime"),
+    (lambda record: record["notices"].append("x"), "notice 1 is not an object"),
+    (lambda record: record["identity"].pop("userId"), "identity has no userId"),
+    (lambda record: record.update(notices=[]), "no notices"),
+    (lambda record: record.pop("at"), "'at'"),
+])
+def test_incomplete_records_are_refused_with_their_line(tmp_path, identity, change, message):
+    path = tmp_path / "capture.jsonl"
+    good = {"identity": identity, "notices": [{"voilationTime": TIME, "actionTime": TIME}], "at": 1.0}
+    bad = json.loads(json.dumps(good))
+    change(bad)
+    path.write_text(json.dumps(good) + "\n" + json.dumps(bad) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=r"capture.jsonl:2: invalid capture record \(.*" + re.escape(message)):
+        read_capture(str(path))
+
+
+def test_an_existing_capture_is_not_overwritten(tmp_path, identity):
+    path = str(tmp_path / "capture.jsonl")
+    capture = SendCapture(path)
+    capture.record({"offenceId": 1, "identity": identity, "notices": [{}]}, "custom", 1.0, 200, 0.01)
+    capture.close()
+    # Late records after close are dropped rather than raising
+    capture.record({"offenceId": 1, "identity": identity, "notices": [{}]}, "custom", 2.0, 200, 0.01)
+    assert capture.count == 1
+    with pytest.raises(ValueError, match="--append"):
+        SendCapture(path)
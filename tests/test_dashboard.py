@@ -0,0 +1,46 @@
+import threading
+
+from yarc_core import ResultRing, RollingStats
+
+
+def test_late_results_are_kept_in_the_buckets():
+    stats = RollingStats(window=10, history=60)
+    stats.add([(0, 100.5, 200, 0.1), (1, 103.5, 200, 0.3)])
+    # Late results for a second between buckets and for one before the oldest
+    stats.add([(2, 101.5, 500, 0.2), (3, 99.5, None, 0.4)])
+    assert [bucket[0] for bucket in stats.buckets] == [100, 101, 103]
+    assert sum(bucket[1] for bucket in stats.buckets) == stats.total == 4
+    snapshot = stats.snapshot(now=104.0)
+    assert snapshot["rates"] == {"2xx": 0.5, "3xx": 0.0, "4xx": 0.0, "5xx": 0.25, "error": 0.25}
+    assert snapshot["latency"][-5:] == [0.25, 0.2, None, 0.3, None]
+
+
+def test_concurrent_pushes_are_all_drained():
+    ring = ResultRing(capacity=100000)
+    drained = []
+
+    def push():
+        for _ in range(5000):
+            ring.push(200, 0.01)
+
+    threads = [threading.Thread(target=push) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        drained.extend(ring.drain()[0])
+    for thread in threads:
+        thread.join()
+    results, dropped = ring.drain()
+    drained.extend(results)
+    assert ring.read == 40000 and dropped == 0
+    assert sorted(result[0] for result in drained) == list(range(40000))
+
+
+def test_results_lapped_by_writers_are_counted_as_dropped():
+    ring = ResultRing(capacity=4)
+    for _ in range(10):
+        ring.push(200, 0.01)
+    results, dropped = ring.drain()
+    assert [result[0] for result in results] == [6, 7, 8, 9]
+    assert dropped == 6
+    assert ring.drain() == ([], 0)
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWidgets")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import yarc_gui  # noqa: E402
+
+CUSTOM = [url_type for url_type, _, _, _ in yarc_gui.URL_TYPES].index("custom")
+
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.delenv("YARC_JOURNAL", raising=False)
+    monkeypatch.delenv("YARC_CAPTURE", raising=False)
+    app = QApplication.instance() or QApplication([])
+    window = yarc_gui.ChallanSender()
+    window.show()
+    app.processEvents()
+    yield window
+    window.close()
+
+
+def test_nothing_is_preconnected_until_an_endpoint_is_chosen(window, stub):
+    assert not window.standby_timer.isActive()
+    assert window.prewarming == {}
+    # Programmatic changes are not a choice
+    window.url_type_combo.setCurrentIndex(CUSTOM)
+    window.custom_url_input.setText(stub.url)
+    assert window.prewarming == {}
+    window.url_type_combo.activated.emit(CUSTOM)
+    window.prewarming[(False, "custom", stub.url)].result(5)
+    assert window.sessions.stats("custom")["prewarmed"] == 1
+    assert window.standby_timer.isActive()
+
+
+def test_sends_are_journaled_only_when_asked(window, monkeypatch, tmp_path):
+    assert window.send_pool.journal is None and window.send_pool.capture is None
+    path = str(tmp_path / "journal.sqlite3")
+    monkeypatch.setenv("YARC_JOURNAL", path)
+    journaled = yarc_gui.ChallanSender()
+    try:
+        assert journaled.send_pool.journal.path == path
+    finally:
+        journaled.close()
+        journaled.send_pool.close()
+
+
+def test_responses_render_at_once_unless_one_was_just_shown(window, monkeypatch):
+    from types import SimpleNamespace
+
+    shown = []
+
+    def show_response(job, view):
+        window.shown_at = yarc_gui.time.perf_counter()
+        shown.append(job)
+
+    monkeypatch.setattr(window, "show_response", show_response)
+    view = SimpleNamespace(status_code=200, timings={})
+    first, second = (SimpleNamespace(url_type="custom", url="u", elapsed=lambda: 0.01) for _ in range(2))
+    window.start_dashboard()
+    window.on_response_received(first, view)
+    window.on_response_received(second, view)
+    assert shown == [first]
+    assert window.pending_response == (second, view)
+    window.refresh_dashboard()
+    assert shown == [first, second] and window.pending_response is None
+    window.dashboard_timer.stop()
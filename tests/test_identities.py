@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+import yarc
+from yarc_core import IdentityImport, validate_identity
+
+FIELDS = ("userId", "districtId", "location", "district", "offCd")
+
+
+def write_csv(path, rows):
+    path.write_text("\n".join([",".join(FIELDS)] + [",".join(row) for row in rows]) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_validate_identity_capitalises_text_fields(identity):
+    row = dict(identity, location="shimla", district="kullu")
+    assert validate_identity(row) == dict(identity, location="Shimla", district="Kullu")
+
+
+@pytest.mark.parametrize("field, value, message", [
+    ("userId", "12a", "userId must be a whole number"),
+    ("offCd", "10000", "offCd must be a whole number"),
+    ("districtId", None, "districtId must be a whole number"),
+    ("location", "  ", "location is empty"),
+])
+def test_validate_identity_rejects(identity, field, value, message):
+    with pytest.raises(ValueError, match=message):
+        validate_identity(dict(identity, **{field: value}))
+
+
+def test_csv_import_counts_and_reports_malformed_rows(tmp_path):
+    path = write_csv(tmp_path / "ids.csv", [
+        ("1", "2", "shimla", "Shimla", "3"),
+        ("x", "2", "Shimla", "Shimla", "3"),
+        ("4", "5", "Mandi", "", "6"),
+        ("7", "8", "Solan", "Solan", "9"),
+    ])
+    rejected = []
+    imported = IdentityImport(path, on_error=lambda line, message: rejected.append(line))
+    identities = list(imported)
+    assert [identity["userId"] for identity in identities] == ["1", "7"]
+    assert identities[0]["location"] == "Shimla"
+    assert (imported.valid, imported.malformed) == (2, 2)
+    assert rejected == [3, 4]
+    assert "userId must be a whole number" in imported.errors[0][1]
+    assert imported.errors[1] == (4, "district is empty")
+    assert "2 imported, 2 malformed" in imported.summary()
+
+
+def test_undecodable_and_oversized_rows_do_not_end_the_import(tmp_path, identity):
+    header = ",".join(FIELDS).encode("utf-8")
+    path = tmp_path / "ids.csv"
+    path.write_bytes(b"\n".join([
+        header,
+        b"1,2,Shimla,Shimla,3",
+        b"4,5,Man\xff\xfedi,Mandi,6",
+        b"7,8,Solan," + b"x" * 200000 + b",9",
+        b"10,11,Kullu,Kullu,12",
+    ]) + b"\n")
+    imported = IdentityImport(str(path))
+    assert [identity["userId"] for identity in imported] == ["1", "10"]
+    assert imported.errors[0] == (3, "invalid UTF-8")
+    assert imported.errors[1][0] == 4 and imported.errors[1][1].startswith("invalid CSV")
+    jsonl = tmp_path / "ids.jsonl"
+    jsonl.write_bytes(b"\n".join([json.dumps(identity).encode("utf-8"), b'{"userId": "\xff"}']) + b"\n")
+    imported = IdentityImport(str(jsonl))
+    assert len(list(imported)) == 1
+    assert imported.errors == [(2, "invalid UTF-8")]
+
+
+def test_jsonl_import_rejects_bad_json_and_non_objects(tmp_path, identity):
+    path = tmp_path / "ids.jsonl"
+    path.write_text("\n".join([
+        json.dumps(identity),
+        "{not json",
+        "",
+        json.dumps([1, 2]),
+        json.dumps(dict(identity, userId=99)),
+    ]) + "\n", encoding="utf-8")
+    imported = IdentityImport(str(path))
+    assert imported.file_format == "jsonl"
+    assert [identity["userId"] for identity in imported] == ["12", "99"]
+    assert imported.malformed == 2
+    assert imported.errors[0][0] == 2 and imported.errors[0][1].startswith("invalid JSON")
+    assert imported.errors[1] == (4, "row is not an object")
+
+
+def test_only_the_first_errors_are_kept(tmp_path):
+    path = write_csv(tmp_path / "ids.txt", [("x", "1", "A", "B", "1")] * 25)
+    imported = IdentityImport(path)
+    assert imported.file_format == "csv"
+    assert list(imported) == []
+    assert imported.malformed == 25 and len(imported.errors) == IdentityImport.MAX_KEPT_ERRORS
+    assert imported.summary().endswith("... 5 more")
+
+
+def test_unknown_format_is_refused(tmp_path):
+    with pytest.raises(ValueError, match="Unknown identity file format"):
+        IdentityImport(str(tmp_path / "ids.csv"), file_format="xml")
+
+
+def test_conflicting_options_are_usage_errors(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exited:
+        yarc.main(["load", "--resume", "--identities", str(tmp_path / "ids.csv"), "--id-state", str(tmp_path / "s")])
+    assert exited.value.code == 2
+    assert "--resume needs --journal" in capsys.readouterr().err
+
+
+def test_runtime_errors_are_reported_without_a_usage_message(tmp_path, capsys):
+    args = ["load", "--url-type", "custom", "--url", "http://127.0.0.1:9/", "-n", "1", "--user-id", "1"]
+    assert yarc.main(args + ["--id-state", str(tmp_path / "s")]) == 1
+    err = capsys.readouterr().err
+    assert err == "yarc.py: error: Missing identity fields: districtId, location, district, offCd\n"
+    assert yarc.main(["replay", str(tmp_path / "missing.jsonl")]) == 1
+    assert "No such file" in capsys.readouterr().err
+
+
+def test_what_load_opened_is_closed_when_later_setup_fails(tmp_path, monkeypatch, capsys):
+    path = write_csv(tmp_path / "ids.csv", [("1", "2", "Shimla", "Shimla", "3")])
+    closed = []
+    close = IdentityImport.close
+
+    def spy(self):
+        closed.append(self.path)
+        close(self)
+
+    monkeypatch.setattr(IdentityImport, "close", spy)
+    capture = tmp_path / "capture.jsonl"
+    capture.write_text("{}\n", encoding="utf-8")
+    args = ["load", "--url-type", "custom", "--url", "http://127.0.0.1:9/", "-n", "1", "--identities", path]
+    # An existing capture without --append is refused after the identities were opened
+    assert yarc.main(args + ["--capture", str(capture), "--id-state", str(tmp_path / "s")]) == 1
+    assert "--append" in capsys.readouterr().err
+    assert closed == [path]
+
+
+def test_a_missing_identity_file_is_reported_before_sending(tmp_path, capsys):
+    args = ["load", "--url-type", "custom", "--url", "http://127.0.0.1:9/", "-n", "1"]
+    assert yarc.main(args + ["--identities", str(tmp_path / "missing.csv"), "--id-state", str(tmp_path / "s")]) == 1
+    err = capsys.readouterr().err
+    assert err.startswith("yarc.py: error:") and "No such file" in err
@@ -0,0 +1,190 @@
+import itertools
+import json
+import pickle
+import threading
+import time
+
+import pytest
+
+import yarc_core
+from yarc_core import (
+    SHARD_ID_RANGE, IdGenerator, IdRangeExhausted, NoticeFactory, format_id_block, run_load_sharded,
+)
+
+
+def draw(source, count):
+    return [source.next_ids() for _ in range(count)]
+
+
+def assert_disjoint(groups):
+    # No two groups share any of the three generated fields
+    for field in range(3):
+        for first, second in itertools.combinations(groups, 2):
+            assert not {ids[field] for ids in first} & {ids[field] for ids in second}
+
+
+def test_short_ids_cycle_through_the_whole_space(ids):
+    block = format_id_block(ids._params, 0, IdGenerator.SHORT_SPACE)
+    for field in range(3):
+        assert len({ids[field] for ids in block}) == IdGenerator.SHORT_SPACE
+
+
+def test_ids_are_well_formed(ids):
+    transaction_number, registration_number, equipment_id = ids.next_ids()
+    assert len(transaction_number) == 22 and transaction_number.startswith("REAMN") and transaction_number[17] == "A"
+    assert registration_number.startswith("DL4CQ") and len(registration_number) == 10
+    assert equipment_id.startswith("GTFGF") and len(equipment_id) == 10
+
+
+def test_reservations_continue_across_generators(tmp_path):
+    state = str(tmp_path / "ids.json")
+    first = IdGenerator(state, block_size=16)
+    earlier = draw(first, 100)
+    # A later run, and one running at the same time, both start past every reservation made so far
+    second = IdGenerator(state, block_size=16)
+    concurrent = draw(second, 100)
+    earlier += draw(first, IdGenerator.RESERVE + 100)
+    later = draw(IdGenerator(state), 100)
+    numbers = [ids[0] for ids in earlier + concurrent + later]
+    assert len(set(numbers)) == len(numbers)
+    with open(state, encoding="utf-8") as f:
+        assert json.load(f)["params"] == first._params == second._params
+
+
+def test_claimed_ranges_never_overlap_the_generator(ids):
+    before = draw(ids, 10)
+    claimed = draw(ids.claim_range(500), 500)
+    after = draw(ids, 2000)
+    numbers = [ids[0] for ids in before + claimed + after]
+    assert len(set(numbers)) == len(numbers)
+
+
+@pytest.mark.parametrize("processes, total", [(2, None), (4, None), (3, 3001)])
+def test_shards_share_no_id_field(ids, processes, total):
+    ranges = ids.claim_range(total or SHARD_ID_RANGE * processes).interleave(processes)
+    per_shard = (total or 6000) // processes
+    groups = [draw(id_range, per_shard) for id_range in ranges]
+    assert_disjoint(groups)
+    for group in groups:
+        for field in range(3):
+            assert len({ids[field] for ids in group}) == per_shard
+
+
+def test_interleaved_shares_match_the_split_of_total(ids):
+    ranges = ids.claim_range(3001).interleave(3)
+    assert [len(id_range) for id_range in ranges] == [1001, 1000, 1000]
+    groups = [draw(id_range, len(id_range)) for id_range in ranges]
+    for id_range in ranges:
+        with pytest.raises(IdRangeExhausted):
+            id_range.next_ids()
+    assert len({ids[0] for group in groups for ids in group}) == 3001
+
+
+def test_concurrent_draws_issue_every_id_in_the_range(ids, monkeypatch):
+    # Like the sender loop: 8 threads share 40 send slots and each slot draws
+    # once, so a draw that wrongly finds the range used up loses a send. Slow
+    # formatting holds the window between claiming a block and buffering it open
+    def slow_format(*args):
+        time.sleep(0.01)
+        return format_id_block(*args)
+
+    monkeypatch.setattr(yarc_core, "format_id_block", slow_format)
+    id_range = ids.claim_range(40)
+    id_range.block_size = 8
+    slots = itertools.count()
+    issued = []
+
+    def send_loop():
+        while next(slots) < 40:
+            try:
+                issued.append(id_range.next_ids()[0])
+            except IdRangeExhausted:
+                return
+
+    threads = [threading.Thread(target=send_loop) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(issued) == len(set(issued)) == 40
+
+
+def mark(state):
+    with open(state, encoding="utf-8") as f:
+        return json.load(f)["next"]
+
+
+def test_unused_claims_go_back_to_the_mark(tmp_path):
+    state = str(tmp_path / "ids.json")
+    first = IdGenerator(state)
+    claimed = first.claim_range(SHARD_ID_RANGE)
+    used = draw(claimed, 10)
+    first.unclaim(claimed.position, claimed.stop)
+    assert mark(state) < 2 * first.block_size
+    later = draw(IdGenerator(state), 10)
+    assert not {ids[0] for ids in used} & {ids[0] for ids in later}
+
+
+def test_unused_claims_stay_with_the_generator_once_others_reserved(tmp_path):
+    state = str(tmp_path / "ids.json")
+    first, second = IdGenerator(state), IdGenerator(state)
+    claimed = first.claim_range(5000)
+    used = draw(claimed, 10)
+    concurrent = draw(second, 10)
+    before = mark(state)
+    first.unclaim(claimed.position, claimed.stop)
+    assert mark(state) == before
+    reused = draw(first.claim_range(100), 100)
+    numbers = [ids[0] for ids in used + concurrent + reused]
+    assert len(set(numbers)) == len(numbers)
+
+
+@pytest.mark.parametrize("stub", [{"latency": "fixed:20"}], indirect=True)
+def test_duration_bound_shards_use_up_only_what_they_send(stub, tmp_path, identity):
+    state = str(tmp_path / "ids.json")
+    stats = run_load_sharded("custom", identity, processes=2, duration=0.3, url=stub.url, ids=IdGenerator(state))
+    assert 0 < stats.total
+    # Each shard formats whole blocks ahead of what it sends
+    assert stats.total <= mark(state) <= stats.total + 2 * 1024
+
+
+def test_concurrent_shards_send_exactly_the_requested_total(stub, ids, identity):
+    stats = run_load_sharded("custom", identity, processes=2, total=101, concurrency=4, url=stub.url, ids=ids)
+    assert stats.total == stats.status_counts["2xx"] == 101
+    assert stats.short_shards == []
+    assert "Short shares" not in stats.summary()
+
+
+def test_id_range_skips_numbers_and_survives_pickling(ids):
+    id_range = ids.claim_range(50)
+    everything = draw(pickle.loads(pickle.dumps(id_range)), 50)
+    skip = frozenset(ids[0] for ids in everything[::2])
+    id_range.skip = skip
+    rest = draw(pickle.loads(pickle.dumps(id_range)), 25)
+    assert rest == everything[1::2]
+
+
+def test_an_exhausted_range_is_not_replaced_by_the_default_generator(ids, identity):
+    id_range = ids.claim_range(1)
+    id_range.next_ids()
+    assert len(id_range) == 0
+    with pytest.raises(IdRangeExhausted):
+        NoticeFactory("9759", identity, ids=id_range).render()
+
+
+def draw_from_state(state, count, results):
+    results.put([ids[0] for ids in draw(IdGenerator(state, block_size=64), count)])
+
+
+def test_processes_sharing_a_state_file_never_overlap(tmp_path):
+    import multiprocessing
+    state = str(tmp_path / "ids.json")
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=draw_from_state, args=(state, 3000, results)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    numbers = [number for _ in processes for number in results.get(timeout=60)]
+    for process in processes:
+        process.join()
+    assert len(numbers) == 9000 and len(set(numbers)) == 9000
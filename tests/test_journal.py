@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+import yarc
+from yarc_core import SendJournal
+
+
+def journaled(path, run_id):
+    with sqlite3.connect(path) as connection:
+        return connection.execute(
+            "SELECT transaction_no, status FROM sends WHERE run_id = ? ORDER BY id", (run_id,)
+        ).fetchall()
+
+
+def test_records_are_committed_by_close(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    journal = SendJournal(path)
+    journal.record("r", ["T1", "T2"], ["R1", "R2"], b"{}", "custom", "http://x/", 200, 0.1)
+    journal.record("r", ["T3"], None, (b"{", b"}"), "custom", "http://x/", 500, 0.2)
+    journal.record("other", ["T4"], None, b"{}", "custom", "http://x/", 201, 0.1)
+    journal.close()
+    assert journaled(path, "r") == [("T1", 200), ("T2", 200), ("T3", 500)]
+    reopened = SendJournal(path)
+    assert reopened.succeeded_numbers("r") == {"T1", "T2"}
+    # Parts hash like the joined body
+    assert reopened.lookup("T3")[0]["payload_hash"] == reopened.lookup("T1")[0]["payload_hash"]
+    reopened.close()
+
+
+def test_failed_commits_are_counted_and_the_writer_keeps_going(tmp_path, capsys):
+    path = str(tmp_path / "journal.sqlite3")
+    journal = SendJournal(path)
+    with sqlite3.connect(path) as connection:
+        connection.execute("ALTER TABLE sends RENAME TO hidden")
+    journal.record("r", ["T1"], None, b"{}", "custom", "http://x/", 200, 0.1)
+    assert journal.flush(5)
+    assert journal.failed == 1 and isinstance(journal.error, sqlite3.OperationalError)
+    with sqlite3.connect(path) as connection:
+        connection.execute("ALTER TABLE hidden RENAME TO sends")
+    journal.record("r", ["T2"], None, b"{}", "custom", "http://x/", 200, 0.1)
+    journal.close()
+    assert journaled(path, "r") == [("T2", 200)]
+    assert (journal.rows, journal.failed) == (1, 1)
+    assert "commit failed" in capsys.readouterr().err
+
+
+def test_runs_remember_their_id_range(tmp_path, ids):
+    journal = SendJournal(str(tmp_path / "journal.sqlite3"))
+    claimed = ids.claim_range(20)
+    journal.start_run("r", claimed)
+    first = [claimed.next_ids() for _ in range(20)]
+    assert journal.run_ids("missing") is None
+    skip = frozenset(ids[0] for ids in first[:15])
+    again = journal.run_ids("r", skip=skip)
+    assert [again.next_ids() for _ in range(5)] == first[15:]
+    journal.close()
+
+
+@pytest.mark.parametrize("stub", [{"error_rate": 0.4, "seed": 5}], indirect=True)
+def test_resume_resends_only_what_did_not_succeed(stub, tmp_path, identity):
+    path = str(tmp_path / "journal.sqlite3")
+    args = [
+        "load", "--url-type", "custom", "--url", stub.url, "--id-state", str(tmp_path / "ids.json"),
+        "--user-id", identity["userId"], "--district-id", identity["districtId"], "--location", identity["location"],
+        "--district", identity["district"], "--off-cd", identity["offCd"],
+        "-n", "40", "-c", "4", "--retries", "0", "--breaker-failures", "0", "--journal", path, "--run-id", "r1",
+    ]
+    yarc.main(args)
+    rows = journaled(path, "r1")
+    numbers = {number for number, _ in rows}
+    assert len(rows) == len(numbers) == 40
+    for _ in range(10):
+        succeeded = {number for number, status in rows if 200 <= status < 300}
+        if len(succeeded) == 40:
+            break
+        yarc.main(args + ["--resume"])
+        previous, rows = len(rows), journaled(path, "r1")
+        resent = [number for number, _ in rows[previous:]]
+        assert sorted(resent) == sorted(numbers - succeeded)
+    assert {number for number, status in rows if 200 <= status < 300} == numbers
@@ -0,0 +1,39 @@
+import pytest
+
+from yarc_core import MissingModule, lazy_import
+
+
+def test_missing_module_fails_on_first_use():
+    module = lazy_import("yarc_no_such_module")
+    assert isinstance(module, MissingModule)
+    with pytest.raises(ModuleNotFoundError) as error:
+        module.Session
+    assert error.value.name == "yarc_no_such_module"
+
+
+def test_missing_parent_package_is_deferred_too():
+    module = lazy_import("yarc_no_such_package.child")
+    with pytest.raises(ModuleNotFoundError):
+        module.anything
+
+
+def test_concurrent_first_access_sees_the_loaded_module():
+    import sys
+    import threading
+
+    sys.modules.pop("wave", None)
+    module = lazy_import("wave")
+    barrier = threading.Barrier(8)
+    found = []
+
+    def touch():
+        barrier.wait()
+        found.append(module.Wave_read)
+
+    threads = [threading.Thread(target=touch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(found) == 8
+    sys.modules.pop("wave", None)
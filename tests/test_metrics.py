@@ -0,0 +1,55 @@
+import math
+import random
+
+import pytest
+
+from yarc_core import LatencyHistogram
+
+
+def exact_percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * p / 100)) - 1]
+
+
+@pytest.mark.parametrize("p", [50, 90, 99, 99.9, 100])
+def test_percentiles_are_within_one_bucket(p):
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-3, 1) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    exact = exact_percentile(values, p)
+    # A bucket's upper bound overstates its values by at most one growth step
+    assert exact <= histogram.percentile(p) <= exact * histogram.growth
+
+
+def test_percentiles_are_clamped_to_the_observed_range():
+    histogram = LatencyHistogram()
+    for value in (0.1, 0.1, 0.1):
+        histogram.record(value)
+    assert histogram.percentile(50) == histogram.percentile(99) == 0.1
+    assert histogram.min == histogram.max == 0.1
+    assert histogram.mean == pytest.approx(0.1)
+
+
+def test_empty_and_out_of_range_values():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0.0 and histogram.mean == 0.0
+    histogram.record(0.0)
+    histogram.record(1000.0)
+    # Values under min_value share the first bucket
+    assert histogram.percentile(50) <= histogram.min_value
+    assert histogram.percentile(100) == 1000.0
+
+
+def test_merge_matches_recording_everything_in_one():
+    rng = random.Random(3)
+    values = [rng.uniform(0.001, 2.0) for _ in range(5000)]
+    whole, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for index, value in enumerate(values):
+        whole.record(value)
+        (first if index % 2 else second).record(value)
+    first.merge(second)
+    assert first.counts == whole.counts
+    assert (first.count, first.min, first.max) == (whole.count, whole.min, whole.max)
+    assert first.percentile(99) == whole.percentile(99)
@@ -0,0 +1,90 @@
+import json
+import zlib
+
+import pytest
+
+from yarc_core import (
+    IMAGE1, batch_body, batch_parts, build_notice, build_payload, compile_template, encode_body,
+)
+
+DATES = ("2026-10-16 10:14:45.0", "2026-10-16 10:44:00.0")
+IDS = ("REAMN000012345678A9012", "DL4CQ01234", "GTFGF56789")
+
+
+def expected(identity, ids=IDS, dates=DATES, image1=IMAGE1, offence_id="9759"):
+    notice = build_notice(offence_id, *ids, identity, *dates, image1)
+    return json.dumps(build_payload([notice])).encode("utf-8")
+
+
+def test_template_matches_json_dumps(identity):
+    template = compile_template("9759", identity)
+    assert template.render(*IDS, *DATES) == expected(identity)
+
+
+def test_template_with_an_image(identity):
+    template = compile_template("4391", identity)
+    image = "aGVsbG8="
+    assert template.render(*IDS, *DATES, image1=image) == expected(identity, image1=image, offence_id="4391")
+    assert template.render(*IDS, *DATES, image1=image.encode("ascii")) == expected(
+        identity, image1=image, offence_id="4391"
+    )
+
+
+@pytest.mark.parametrize("ids", [
+    ("REAMN1", "DL4CQ01234", "GTFGF56789"),
+    ('REAMN"quoted\\slash"', "DL4CQ01234", "GTFGF56789"),
+    ("REAMN000012345678A9012", "DL4CQé中", "GTFGF56789"),
+])
+def test_values_that_do_not_fit_the_slots_take_the_slow_path(identity, ids):
+    template = compile_template("9759", identity)
+    assert template.render(*ids, *DATES) == expected(identity, ids)
+    assert b"".join(template.render_parts(*ids, *DATES)) == expected(identity, ids)
+
+
+@pytest.mark.parametrize("dates", [
+    ("2026-10-16 10:14:45.\x7f", DATES[1]),
+    (DATES[0], "2026-10-16\t10:44:00.0"),
+    (DATES[0], "2026-10-16 10:44:00\u00e9"),
+])
+def test_replayed_dates_needing_escapes(identity, dates):
+    template = compile_template("9759", identity)
+    assert template.render(*IDS, *dates) == expected(identity, dates=dates)
+
+
+def test_identity_needing_escapes(identity):
+    identity.update(location='Near "Mall" Road\\1', district="Kullu कु")
+    template = compile_template("9759", identity)
+    assert template.render(*IDS, *DATES) == expected(identity)
+
+
+def test_parts_join_to_the_rendered_payload(identity):
+    template = compile_template("9759", identity)
+    head, image, tail = template.render_parts(*IDS, *DATES, image1="abcd")
+    assert image == b"abcd"
+    assert head + image + tail == template.render(*IDS, *DATES, image1="abcd")
+
+
+def test_batches_match_json_dumps(identity):
+    template = compile_template("9759", identity)
+    rows = [
+        (f"REAMN{index:012d}A0000", f"DL4CQ{index:05d}", f"GTFGF{index:05d}") for index in range(3)
+    ]
+    notices = [build_notice("9759", *ids, identity, *DATES, IMAGE1) for ids in rows]
+    wanted = json.dumps(build_payload(notices)).encode("utf-8")
+    assert batch_body([template.render_notice(*ids, *DATES) for ids in rows]) == wanted
+    assert b"".join(batch_parts([template.render_notice_parts(*ids, *DATES) for ids in rows])) == wanted
+
+
+@pytest.mark.parametrize("mode", ["buffered", "stream"])
+def test_body_modes_send_the_same_bytes(identity, mode):
+    parts = compile_template("9759", identity).render_parts(*IDS, *DATES)
+    body, headers = encode_body(parts, mode)
+    sent = body if isinstance(body, bytes) else b"".join(bytes(chunk) for chunk in body)
+    assert sent == expected(identity)
+
+
+def test_gzip_body_decompresses_to_the_payload(identity):
+    parts = compile_template("9759", identity).render_parts(*IDS, *DATES)
+    body, headers = encode_body(parts, "gzip")
+    assert headers["Content-Encoding"] == "gzip"
+    assert zlib.decompress(b"".join(bytes(chunk) for chunk in body), 31) == expected(identity)
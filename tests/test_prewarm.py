@@ -0,0 +1,54 @@
+import json
+
+from yarc_core import AsyncEngine, DnsCache, SessionPool, dns_cache
+
+PAYLOAD = json.dumps({"cctvNoticeData": [{"transactionNo": "T1"}]}).encode("utf-8")
+
+
+def test_dns_results_are_cached_for_the_ttl():
+    cache = DnsCache(ttl=60)
+    first = cache.resolve("127.0.0.1", 80)
+    assert cache.resolve("127.0.0.1", 80) == first
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+    expired = DnsCache(ttl=0)
+    expired.resolve("127.0.0.1", 80)
+    expired.resolve("127.0.0.1", 80)
+    assert expired.stats()["misses"] == 2
+
+
+def test_prewarmed_connections_are_used_by_the_next_sends(stub):
+    sessions = SessionPool(pool_size=2)
+    lookups = dns_cache().stats()
+    timings = sessions.prewarm("custom", stub.url, 2).result(timeout=10)
+    assert "connect" in timings
+    assert sessions.stats("custom")["prewarmed"] == 2
+    # The second connection found the address the first one looked up
+    assert dns_cache().stats()["hits"] > lookups["hits"]
+    for _ in range(3):
+        assert sessions.post("custom", stub.url, data=PAYLOAD, timeout=5).status_code == 200
+    stats = sessions.stats("custom")
+    assert (stats["connections"], stats["requests"], stats["reused"]) == (2, 3, 3)
+    # A standby top-up with the connections idle and alive opens none
+    sessions.prewarm("custom", stub.url, 2).result(timeout=10)
+    assert sessions.stats("custom")["connections"] == 2
+    sessions.close()
+
+
+def test_async_prewarm_parks_connections_for_the_engine(stub):
+    engine = AsyncEngine(max_in_flight=2)
+    engine.prewarm(stub.url, 2).result(timeout=10)
+    assert engine.client.counters.snapshot()["prewarmed"] == 2
+    assert engine.post(stub.url, PAYLOAD).result(timeout=5).status_code == 200
+    stats = engine.client.counters.snapshot()
+    assert (stats["connections"], stats["reused"]) == (2, 1)
+    engine.close()
+
+
+def test_older_urllib3_falls_back_to_stock_connects(stub, monkeypatch):
+    import yarc_core
+
+    monkeypatch.setattr(yarc_core, "transport_features", lambda: {"dns_cache": False, "prewarm": False})
+    sessions = SessionPool(pool_size=1)
+    assert sessions.prewarm("custom", stub.url).result(timeout=10) is None
+    assert sessions.post("custom", stub.url, data=PAYLOAD, timeout=5).status_code == 200
+    assert sessions.stats("custom")["prewarmed"] == 0
@@ -0,0 +1,74 @@
+import pytest
+
+from yarc_core import RateSchedule, parse_rate_profile, rate_capacity, run_load_rate
+
+SLOW = {"latency": "fixed:200"}
+
+
+def offsets(spec, duration=None, total=None):
+    return list(RateSchedule(parse_rate_profile(spec), duration, total))
+
+
+def test_constant_rate_is_evenly_spaced():
+    due = offsets("10", duration=1.0)
+    assert len(due) in (9, 10)
+    assert due[0] == pytest.approx(0.1)
+    assert all(later - earlier == pytest.approx(0.1) for earlier, later in zip(due, due[1:]))
+    assert all(offset < 1.0 for offset in due)
+
+
+def test_total_ends_the_schedule():
+    assert len(offsets("1000", total=25)) == 25
+
+
+def test_step_and_ramp_profiles():
+    due = offsets("step:10,20:1", duration=2.0)
+    assert len([offset for offset in due if offset < 1.0]) == pytest.approx(10, abs=1)
+    assert len([offset for offset in due if offset >= 1.0]) == pytest.approx(20, abs=1)
+    ramp = offsets("ramp:0:20:2", duration=2.0)
+    # 0 to 20 req/s over 2 s: 20 sends, each closer to the last than the one before
+    assert len(ramp) == pytest.approx(20, abs=1)
+    gaps = [later - earlier for earlier, later in zip(ramp, ramp[1:])]
+    assert gaps == sorted(gaps, reverse=True)
+
+
+@pytest.mark.parametrize("spec, peak", [("25", 25), ("constant:5", 5), ("ramp:30:10:2", 30), ("step:1,8,2:1", 8)])
+def test_profiles_carry_their_peak(spec, peak):
+    assert parse_rate_profile(spec).peak == peak
+    assert rate_capacity(spec, 2.0) == 2 * peak
+    assert rate_capacity(spec, 0.01, minimum=4) == 4
+
+
+@pytest.mark.parametrize("spec", ["0", "-5", "ramp:0:0:5", "step:1,2", "step:1,x:5", "sine:5", "ramp:1:2:0"])
+def test_invalid_profiles(spec):
+    with pytest.raises(ValueError):
+        parse_rate_profile(spec)
+
+
+@pytest.mark.parametrize("stub", [SLOW], indirect=True)
+def test_slow_responses_do_not_hold_back_the_schedule(stub, identity, ids):
+    # 20 req/s against 200 ms responses with a single "sender": open-loop means
+    # about four sends in flight, not one send every 200 ms
+    stats = run_load_rate("custom", identity, "20", duration=1.0, concurrency=1, timeout=5, ids=ids, url=stub.url)
+    assert stats.total == stats.rate["scheduled"] >= 19
+    assert stats.rate["dropped"] == 0
+    assert stats.rate["peak_in_flight"] >= 3
+    assert stats.elapsed < 1.6
+    assert stats.metrics.histogram("custom", "queue").percentile(99) < 0.05
+
+
+@pytest.mark.parametrize("stub", [SLOW], indirect=True)
+def test_sends_beyond_the_cap_are_dropped_and_the_deadline_holds(stub, identity, ids):
+    stats = run_load_rate(
+        "custom", identity, "50", duration=1.0, timeout=5, ids=ids, url=stub.url, max_in_flight=2
+    )
+    assert stats.rate["peak_in_flight"] <= 2
+    assert stats.rate["dropped"] > 0
+    assert stats.total + stats.rate["dropped"] == stats.rate["scheduled"]
+    # The last send goes out before the deadline and finishes one response later
+    assert stats.elapsed < 1.0 + 0.2 + 0.3
+
+
+def test_a_rate_needs_an_end(identity, ids):
+    with pytest.raises(ValueError):
+        run_load_rate("custom", identity, "10", ids=ids, url="http://127.0.0.1:9/")
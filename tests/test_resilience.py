@@ -0,0 +1,155 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from yarc_core import CircuitBreaker, CircuitOpenError, ResiliencePolicy, RetryPolicy
+
+BODY = json.dumps({"cctvNoticeData": [{"transactionNo": "T1"}]})
+SLOW = {"latency": "fixed:200"}
+FAILING = {"error_rate": 1.0}
+
+
+def posting(url, calls):
+    # An attempt that POSTs to url, noting each call
+    def attempt(timeout):
+        calls.append(url)
+        return requests.post(url, data=BODY, timeout=timeout)
+
+    return attempt
+
+
+def policy(**options):
+    options.setdefault("retry", RetryPolicy(retries=2, backoff=0.01))
+    options.setdefault("failure_threshold", 0)
+    return ResiliencePolicy(**options)
+
+
+@pytest.fixture
+def closed_url():
+    # Nothing listens here, so connections are refused
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/pushdata"
+
+
+def test_failures_to_connect_are_retried(closed_url):
+    calls = []
+    resilience = policy()
+    with pytest.raises(requests.ConnectionError):
+        resilience.send("custom", ["T1"], posting(closed_url, calls))
+    assert len(calls) == 3
+    assert resilience.stats()["retries"] == 2
+
+
+@pytest.mark.parametrize("stub", [SLOW], indirect=True)
+def test_read_timeouts_are_not_retried(stub):
+    calls = []
+    resilience = policy(read_timeout=0.05)
+    with pytest.raises(requests.ReadTimeout):
+        resilience.send("custom", ["T1"], posting(stub.url, calls))
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("stub", [FAILING], indirect=True)
+def test_server_errors_are_not_retried(stub):
+    calls = []
+    response = policy().send("custom", ["T1"], posting(stub.url, calls))
+    assert response.status_code == 500 and len(calls) == 1
+
+
+@pytest.mark.parametrize("stub", [FAILING], indirect=True)
+def test_breaker_opens_and_lets_one_probe_through_after_the_reset(stub):
+    calls = []
+    resilience = policy(failure_threshold=2, reset_after=0.2)
+    attempt = posting(stub.url, calls)
+    for _ in range(2):
+        assert resilience.send("custom", ["T1"], attempt).status_code == 500
+    with pytest.raises(CircuitOpenError):
+        resilience.send("custom", ["T1"], attempt)
+    assert len(calls) == 2
+    time.sleep(0.25)
+    # The half-open probe fails, which opens the circuit again at once
+    assert resilience.send("custom", ["T1"], attempt).status_code == 500
+    with pytest.raises(CircuitOpenError):
+        resilience.send("custom", ["T1"], attempt)
+    assert len(calls) == 3
+    assert resilience.stats()["failed_fast"] == 2
+
+
+def test_half_open_breaker_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.05)
+    breaker.record(False)
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.mark.parametrize("stub", [SLOW], indirect=True)
+def test_hedge_goes_out_but_the_primary_answer_is_kept(stub):
+    calls = []
+    resilience = policy(hedge_after=0.05, idempotent=["custom"])
+    try:
+        response = resilience.send("custom", ["T1"], posting(stub.url, calls))
+    finally:
+        resilience.close()
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert resilience.stats()["hedges"] == 1 and "hedge_wins" not in resilience.stats()
+
+
+@pytest.mark.parametrize("stub", [SLOW], indirect=True)
+def test_a_hedge_still_waiting_for_a_thread_is_cancelled(stub):
+    calls = []
+    resilience = policy(hedge_after=0.05, max_hedges=1, idempotent=["custom"])
+    # Leave the hedge pool a single free thread, which the primary takes
+    release = threading.Event()
+    for _ in range(resilience.hedges._max_workers - 1):
+        resilience.hedges.submit(release.wait, 5)
+    try:
+        response = resilience.send("custom", ["T1"], posting(stub.url, calls))
+    finally:
+        release.set()
+        resilience.close()
+    assert response.status_code == 200
+    assert calls == [stub.url]
+    assert "hedges" not in resilience.stats()
+
+
+@pytest.mark.parametrize("stub", [SLOW], indirect=True)
+def test_hedge_answer_stands_when_the_primary_fails(stub, closed_url):
+    calls = []
+
+    def attempt(timeout):
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.3)
+            return requests.post(closed_url, data=BODY, timeout=timeout)
+        return requests.post(stub.url, data=BODY, timeout=timeout)
+
+    resilience = policy(hedge_after=0.05, idempotent=["custom"])
+    try:
+        response = resilience.send("custom", ["T1"], attempt)
+    finally:
+        resilience.close()
+    assert response.status_code == 200
+    assert resilience.stats()["hedge_wins"] == 1
+    # Neither copy is retried once a hedge went out
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("stub", [SLOW], indirect=True)
+def test_only_idempotent_url_types_are_hedged(stub):
+    calls = []
+    resilience = policy(hedge_after=0.05, idempotent=["testing"])
+    try:
+        resilience.send("custom", ["T1"], posting(stub.url, calls))
+    finally:
+        resilience.close()
+    assert len(calls) == 1 and "hedges" not in resilience.stats()
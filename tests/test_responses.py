@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from yarc_core import AsyncEngine, SessionPool, fetch_response_view, prepare_response_view
+
+PAYLOAD = json.dumps({"cctvNoticeData": [{"transactionNo": "T1"}]}).encode("utf-8")
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncEngine(max_in_flight=2)
+    yield engine
+    engine.close()
+
+
+@pytest.mark.parametrize("stub", [{"response_bytes": 500000}], indirect=True)
+def test_large_bodies_are_cut_at_the_byte_cap(stub, engine):
+    sessions = SessionPool(pool_size=1)
+    views = [
+        fetch_response_view(sessions.session("custom"), stub.url, PAYLOAD, byte_cap=8192),
+        engine.post(stub.url, PAYLOAD, byte_cap=8192, prepare=prepare_response_view).result(),
+    ]
+    for view in views:
+        assert view.status_code == 200 and view.truncated
+        assert view.body_size == 500000
+        assert "... truncated, 500000 bytes in total" in view.body_text
+        assert len(view.body_text) < 8192 + 100
+    # The next send after a capped read still gets its own, whole answer
+    view = fetch_response_view(sessions.session("custom"), stub.url, PAYLOAD, byte_cap=0)
+    assert not view.truncated and view.summary["status"] == "SUCCESS"
+    sessions.close()
+
+
+def test_small_bodies_are_parsed_whole(stub, engine):
+    sessions = SessionPool(pool_size=1)
+    views = [
+        fetch_response_view(sessions.session("custom"), stub.url, PAYLOAD, transaction_numbers=["T1"]),
+        engine.post(stub.url, PAYLOAD, prepare=prepare_response_view).result(),
+    ]
+    for view in views:
+        assert not view.truncated
+        assert view.summary == {"status": "SUCCESS"}
+        assert json.loads(view.body_text)["data"] == [{"transactionNo": "T1", "status": "ACCEPTED"}]
+    sessions.close()
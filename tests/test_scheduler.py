@@ -0,0 +1,56 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from yarc_core import SendScheduler
+
+
+def test_join_waits_for_the_last_send():
+    sent = []
+
+    def send(job):
+        time.sleep(0.01)
+        sent.append(job)
+
+    scheduler = SendScheduler(send, workers=3, queue_size=2)
+    for job in range(20):
+        scheduler.submit(job, block=True)
+    scheduler.join()
+    assert sorted(sent) == list(range(20))
+    assert scheduler.stats()["completed"] == 20
+    scheduler.close()
+
+
+def test_a_full_queue_pushes_back():
+    release = threading.Event()
+    scheduler = SendScheduler(lambda job: release.wait(5), workers=1, queue_size=1)
+    scheduler.submit(1)
+    # Queued once the worker has taken the first job
+    scheduler.submit(2, block=True, timeout=5)
+    with pytest.raises(queue.Full):
+        scheduler.submit(3)
+    assert scheduler.stats()["queued"] == 1 and scheduler.stats()["in_flight"] == 1
+    release.set()
+    scheduler.join()
+    scheduler.close()
+
+
+def test_a_job_that_raises_does_not_take_its_worker_with_it():
+    sent, failed = [], []
+
+    def send(job):
+        if job % 2:
+            raise RuntimeError(f"job {job}")
+        sent.append(job)
+
+    scheduler = SendScheduler(send, workers=2, queue_size=4, on_error=lambda job, e: failed.append((job, str(e))))
+    for job in range(10):
+        scheduler.submit(job, block=True, timeout=5)
+    scheduler.join()
+    assert sorted(sent) == [0, 2, 4, 6, 8]
+    assert sorted(failed) == [(job, f"job {job}") for job in (1, 3, 5, 7, 9)]
+    assert all(thread.is_alive() for thread in scheduler.threads)
+    assert scheduler.stats()["completed"] == 10
+    scheduler.close()
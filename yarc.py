@@ -1,643 +1,595 @@
 import sys
-import requests
-from PyQt5.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QTextEdit, QLabel,
-    QFrame, QScrollArea, QComboBox, QDialog, QProgressBar, QSizePolicy
-)
-from PyQt5.QtGui import QIcon, QIntValidator
-from PyQt5.QtCore import Qt, QPropertyAnimation, QEasingCurve, QRect, pyqtProperty, QObject, QTimer, QThread, pyqtSignal
-from datetime import datetime, timedelta
-import random
-import string
+from datetime import datetime
+import contextlib
 import json
-#import resources_rc  # Uncomment if you are using a resource file
-
-
-class ResponseDialog(QDialog):
-    def __init__(self, response_text, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Full Response Body")
-        self.setGeometry(200, 200, 600, 400)
-
-        layout = QVBoxLayout()
-
-        self.response_text_edit = QTextEdit()
-        self.response_text_edit.setReadOnly(True)
-        self.response_text_edit.setText(response_text)
-
-        layout.addWidget(self.response_text_edit)
-
-        self.close_button = QPushButton("Close")
-        self.close_button.clicked.connect(self.accept)
-        layout.addWidget(self.close_button)
-
-        self.setLayout(layout)
-
-
-class SmoothTextEdit(QTextEdit):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.scroll_duration = 500
-
-    def smooth_scroll(self, value):
-        scroll_bar = self.verticalScrollBar()
-        start_value = scroll_bar.value()
-        if start_value == value:
-            return
-
-        step_count = 20
-        step_size = (value - start_value) / step_count
-
-        def perform_scroll_step():
-            current_value = scroll_bar.value()
-            new_value = int(current_value + step_size)
-            if abs(new_value - value) < abs(step_size):
-                new_value = int(value)
-            scroll_bar.setValue(new_value)
-            if new_value != value:
-                QTimer.singleShot(self.scroll_duration // step_count, perform_scroll_step)
-
-        perform_scroll_step()
-
-    def setText(self, text):
-        super().setText(text)
-        self.smooth_scroll(self.verticalScrollBar().maximum())
-
-    def mousePressEvent(self, event):
-        super().mousePressEvent(event)
-        self.last_mouse_pos = event.pos()
-
-    def mouseMoveEvent(self, event):
-        if event.buttons() & Qt.LeftButton:
-            delta = event.pos() - self.last_mouse_pos
-            scroll_bar = self.verticalScrollBar()
-            scroll_bar.setValue(scroll_bar.value() - delta.y())
-            self.last_mouse_pos = event.pos()
-        super().mouseMoveEvent(event)
-
-    def wheelEvent(self, event):
-        scroll_bar = self.verticalScrollBar()
-        current_value = scroll_bar.value()
-        scroll_step = event.angleDelta().y() / 120
-        new_value = current_value - scroll_step * 10
-        self.smooth_scroll(new_value)
-
-
-class FadeEffect(QObject):
-    def __init__(self, widget, duration=500, parent=None):
-        super().__init__(parent)
-        self._opacity = 1.0
-        self._widget = widget
-        self._duration = duration
-
-    @pyqtProperty(float)
-    def opacity(self):
-        return self._opacity
-
-    @opacity.setter
-    def opacity(self, value):
-        self._opacity = value
-        self._widget.setStyleSheet(
-            f"background-color: rgba(255, 255, 255, {self._opacity * 255});"
-        )
+import argparse
+import os
+from yarc_core import (
+    URL_TYPES, IDENTITY_FIELDS, BODY_MODES, DEFAULT_ID_STATE, DEFAULT_JOURNAL, BodyModes, IdentityImport, ImageCorpus,
+    Profiler, ResiliencePolicy, RetryPolicy, SendCapture, SendJournal, SessionPool, compare_replay, env_flag,
+    id_generator, load_identity, parse_rate_profile, rate_capacity, read_capture, replay_capacity, resolve_endpoint,
+    run_load, run_load_async, run_load_batched, run_load_rate, run_load_sharded, run_replay,
+)
 
-    def apply_fade_in(self):
-        animation = QPropertyAnimation(self, b"opacity")
-        animation.setDuration(self._duration)
-        animation.setStartValue(0.0)
-        animation.setEndValue(1.0)
-        animation.setEasingCurve(QEasingCurve.InOutQuad)
-        animation.start()
-
-
-# Worker Thread for Network Request
-class Worker(QThread):
-    finished = pyqtSignal()
-    error = pyqtSignal(str)
-    response_received = pyqtSignal(object)  # Signal to emit the response
-
-    def __init__(self, url, payload):
-        super().__init__()
-        self.url = url
-        self.payload = payload
-
-    def run(self):
-        try:
-            response = requests.post(self.url, json=self.payload, timeout=40)
-            self.response_received.emit(response)  # Emit signal with the response
-        except requests.RequestException as e:
-            self.error.emit(f"An error occurred: {str(e)}")
-        finally:
-            self.finished.emit()
-
-class ChallanSender(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.init_ui()
-        self.set_auto_dates()
-        self.update_random_ids()
-
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        QTimer.singleShot(0, self.center)
-
-    def showEvent(self, event):
-        super().showEvent(event)
-        QTimer.singleShot(0, self.center)
-
-    def center(self):
-        screen_geometry = QApplication.desktop().availableGeometry()
-        widget_geometry = self.geometry()
-        x = (screen_geometry.width() - widget_geometry.width()) / 2
-        y = (screen_geometry.height() - widget_geometry.height()) / 2
-        self.move(int(x), int(y))
-
-    def init_ui(self):
-        self.setWindowTitle("Challan Checker")
-        self.setWindowIcon(QIcon(":/logo.png"))  # If using a resource file
-        self.resize(800, 695)
-        self.center()
-
-        self.main_layout = QVBoxLayout()
-        self.setLayout(self.main_layout)
-
-        self.header_label = QLabel("Challan Checker for Himachal Pradesh")
-        self.header_label.setStyleSheet(
-            """
-            font-size: 24px;
-            font-weight: bold;
-            color: #007bff;
-            padding: 10px;
-            border-bottom: 2px solid #007bff;
-            background-color: #f0f8ff;
-            text-align: center;
-            width: 100%;
-        """
-        )
-        self.main_layout.addWidget(self.header_label)
-
-        self.container_widget = QWidget()
-        self.container_layout = QVBoxLayout(self.container_widget)
-        self.container_layout.setContentsMargins(0, 0, 0, 0)
-
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.container_widget)
-        self.main_layout.addWidget(self.scroll_area)
-
-        self.setStyleSheet(
-            """
-            QWidget {
-                background-color: #f0f0f0;
-                font-size: 14px;
-            }
-            QLabel {
-                color: #333;
-                font-weight: bold;
-                width: 150px;
-                text-align: right;
-                margin-right: 10px;
-            }
-            QLabel#url-label {
-                font-size: 16px;
-                color: #007bff;
-                background-color: #f0f8ff;
-                padding: 5px;
-                border: 1px solid #007bff;
-                border-radius: 5px;
-            }
-            QLineEdit, QTextEdit {
-                padding: 10px;
-                border-radius: 5px;
-                border: 1px solid #aaa;
-                font-size: 14px;
-                background-color: #f9f9f9;
-                min-width: 300px;
-            }
-            QTextEdit {
-                min-height: 100px;
-                max-height: 300px;
-            }
-            QPushButton {
-                background-color: #007bff;
-                color: white;
-                border-radius: 5px;
-                padding: 10px;
-                border: none;
-                font-size: 14px;
-                margin-top: 10px;
-            }
-            QPushButton:hover {
-                background-color: #0056b3;
-            }
-            QFrame {
-                border-radius: 5px;
-                padding: 10px;
-                margin: 10px 0;
-                border: 1px solid #ddd;
-            }
-            #url-frame {
-                background-color: #e6f7ff;
-                border-bottom: 4px solid #66cdaa;
-            }
-            #details-frame {
-                background-color: #fff5e6;
-                border-bottom: 4px solid #ff9900;
-            }
-            #response-frame {
-                background-color: #e6ffe6;
-                border-bottom: 4px solid #00cc66;
-            }
-            #progress-frame {
-                background-color: #f0f0f0;
-            }
-            QComboBox {
-                padding: 5px 10px;
-                border-radius: 5px;
-                border: 1px solid #aaa;
-                background-color: #f9f9f9;
-                font-size: 16px;
-            }
-            QComboBox::drop-down {
-                subcontrol-origin: padding;
-                subcontrol-position: top right;
-                width: 15px;
-                border-left-width: 1px;
-                border-left-color: #ddd;
-                border-left-style: solid;
-            }
-            QComboBox::down-arrow {
-                image: url(:/down-arrow.png);
-            }
-            QComboBox QAbstractItemView {
-                border: 1px solid #ddd;
-                background-color: #ffffff;
-                selection-background-color: #007bff;
-                selection-color: white;
-                font-size: 20px;
-                font-weight: bold;
-            }
-            QComboBox::item {
-                padding: 5px 10px;
-            }
-            QComboBox::item:selected {
-                background-color: #007bff;
-                color: white;
-            }
-            QLabel#copyright {
-                color: #007bff;
-                font-size: 12px;
-                font-family: 'Arial', sans-serif;
-                font-style: italic;
-                text-align: right;
-                margin-right: 10px;
-                margin-bottom: 10px;
-                background-color: #f0f0f0;
-                padding: 5px;
-                border-radius: 5px;
-                border: 1px solid #007bff;
-            }
-            QScrollBar:vertical {
-                border: 1px solid #ddd;
-                background: #f1f1f1;
-                width: 16px;
-            }
-            QScrollBar::handle:vertical {
-                background: #007bff;
-                border-radius: 5px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: #0056b3;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                border: 1px solid #ddd;
-                background: #f1f1f1;
-                height: 10px;
-            }
-            QScrollBar::add-line:vertical {
-                border-bottom: 1px solid #ddd;
-                border-top-left-radius: 5px;
-                border-top-right-radius: 5px;
-            }
-            QScrollBar::sub-line:vertical {
-                border-top: 1px solid #ddd;
-                border-bottom-left-radius: 5px;
-                border-bottom-right-radius: 5px;
-            }
-        """
-        )
 
-        # URL Type Selection
-        self.url_type_frame = QFrame()
-        self.url_type_frame.setObjectName("url-frame")
-        self.url_type_layout = QHBoxLayout()
-        self.url_type_frame.setLayout(self.url_type_layout)
-        self.url_type_label = QLabel("Select URL Type:")
-        self.url_type_label.setObjectName("url-label")
-        self.url_type_combo = QComboBox()
-        self.url_type_combo.addItems(["Live Challan URL", "Testing Challan URL"])
-        self.url_type_combo.currentIndexChanged.connect(self.update_url)
-        self.url_type_layout.addWidget(self.url_type_label)
-        self.url_type_layout.addWidget(self.url_type_combo)
-        self.container_layout.addWidget(self.url_type_frame)
-
-        # User Details Frame
-        self.details_frame = QFrame()
-        self.details_frame.setObjectName("details-frame")
-        self.details_layout = QVBoxLayout()
-        self.details_frame.setLayout(self.details_layout)
-
-        self.user_id_input = QLineEdit()
-        self.district_id_input = QLineEdit()
-        self.location_input = QLineEdit()
-        self.district_input = QLineEdit()
-        self.off_code_input = QLineEdit()
-        int_validator = QIntValidator(0, 9999, self)
-
-        self.user_id_input.setValidator(int_validator)
-        self.district_id_input.setValidator(int_validator)
-        self.off_code_input.setValidator(int_validator)
-
-        fields = [
-            ("User ID:", self.user_id_input),
-            ("District ID:", self.district_id_input),
-            ("Location:", self.location_input),
-            ("District:", self.district_input),
-            ("RTO circle Number:", self.off_code_input),
-        ]
-        for label_text, field in fields:
-            field_layout = QHBoxLayout()
-            label = QLabel(label_text)
-            field_layout.addWidget(label)
-            field_layout.addWidget(field)
-            field_layout.setStretch(1, 1)
-            field_layout.setContentsMargins(0, 0, 0, 0)
-            self.details_layout.addLayout(field_layout)
-
-        self.container_layout.addWidget(self.details_frame)
-
-        # Response Frame
-        self.response_frame = QFrame()
-        self.response_frame.setObjectName("response-frame")
-        self.response_layout = QVBoxLayout()
-        self.response_frame.setLayout(self.response_layout)
-
-        self.request_details = SmoothTextEdit()
-        self.request_details.setReadOnly(True)
-        self.response_body = SmoothTextEdit()
-        self.response_body.setReadOnly(True)
-
-        self.response_layout.addWidget(QLabel("Request Details:"))
-        self.response_layout.addWidget(self.request_details)
-        self.response_layout.addWidget(QLabel("Response Body:"))
-        self.response_layout.addWidget(self.response_body)
-
-        self.container_layout.addWidget(self.response_frame)
-
-        # Progress Bar
-        self.progress_frame = QFrame()
-        self.progress_frame.setObjectName("progress-frame")
-        self.progress_frame.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
-        self.progress_layout = QVBoxLayout()
-        self.progress_frame.setLayout(self.progress_layout)
-
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, 100)
-        self.progress_bar.setValue(0)
-        self.progress_bar.setTextVisible(False)
-
-        self.progress_layout.addWidget(self.progress_bar)
-        self.progress_frame.hide()
-
-        self.container_layout.addWidget(self.progress_frame)
-
-        # Send Button
-        self.send_button = QPushButton("Send Challan")
-        self.send_button.clicked.connect(self.send_challan)
-        self.main_layout.addWidget(self.send_button)
-
-        # Copyright Notice
-        self.copyright_label = QLabel("@with love by sahyam")
-        self.copyright_label.setObjectName("copyright")
-        self.main_layout.addWidget(self.copyright_label)
-
-        # Apply fade effects
-        self.apply_fade_in_effect(self.url_type_frame)
-        self.apply_fade_in_effect(self.details_frame)
-        self.apply_fade_in_effect(self.response_frame)
-
-        # Example frame transition animation
-        self.animate_frame_transition(
-            self.details_frame,
-            QRect(self.details_frame.geometry()),
-            QRect(0, 100, self.details_frame.width(), self.details_frame.height()),
-        )
-        self.capitalize_first_letter()
-        self.location_input.textChanged.connect(self.capitalize_first_letter)
-        self.district_input.textChanged.connect(self.capitalize_first_letter)
-
-    def capitalize_first_letter(self):
-        for field in [self.location_input, self.district_input]:
-            text = field.text()
-            if text:
-                capitalized_text = text[0].upper() + text[1:]
-                if text != capitalized_text:
-                    field.setText(capitalized_text)
-
-    def apply_fade_in_effect(self, widget):
-        effect = FadeEffect(widget)
-        effect.apply_fade_in()
-
-    def animate_frame_transition(self, frame, start_rect, end_rect):
-        animation = QPropertyAnimation(frame, b"geometry")
-        animation.setDuration(500)
-        animation.setStartValue(start_rect)
-        animation.setEndValue(end_rect)
-        animation.setEasingCurve(QEasingCurve.InOutQuad)
-        animation.start()
-
-    def set_auto_dates(self):
-        now = datetime.now()
-        base_date = now - timedelta(days=2)
-        self.violation_time = base_date.strftime("%Y-%m-%d 10:14:45.0")
-        self.action_time = base_date.strftime("%Y-%m-%d 10:44:00.0")
-
-    def update_random_ids(self):
-        self.transaction_number = (
-            f"REAMN{''.join(random.choices(string.digits, k=12))}A{''.join(random.choices(string.digits, k=4))}"
+def add_url_arguments(parser):
+    parser.add_argument("--url-type", choices=[entry[0] for entry in URL_TYPES], default="testing")
+    parser.add_argument("--url", help="endpoint to use instead of the URL type's default (required for custom)")
+
+
+def add_identity_arguments(parser):
+    parser.add_argument("--identity-file", help="JSON file with userId, districtId, location, district and offCd")
+    parser.add_argument("--user-id", dest="userId")
+    parser.add_argument("--district-id", dest="districtId")
+    parser.add_argument("--location")
+    parser.add_argument("--district")
+    parser.add_argument("--off-cd", dest="offCd")
+
+
+def add_image_arguments(parser):
+    parser.add_argument("--images", help="directory of JPEG evidence images to rotate through")
+    parser.add_argument("--image-order", choices=["round-robin", "random"], default="round-robin")
+    parser.add_argument("--image-cache-mb", type=float, default=64, help="size limit of the encoded image cache")
+
+
+def add_id_arguments(parser):
+    parser.add_argument(
+        "--id-state", default=DEFAULT_ID_STATE,
+        help="file holding the ID high-water mark, shared across runs (default: %(default)s)",
+    )
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-csv", help="write a latency/status snapshot as CSV")
+    parser.add_argument("--metrics-prom", help="write a latency/status snapshot in Prometheus text format")
+
+
+def export_metrics(args, metrics):
+    if args.metrics_csv:
+        with open(args.metrics_csv, "w", encoding="utf-8", newline="") as f:
+            f.write(metrics.to_csv())
+    if args.metrics_prom:
+        with open(args.metrics_prom, "w", encoding="utf-8") as f:
+            f.write(metrics.to_prometheus())
+
+
+def images_from_args(args):
+    if not args.images:
+        return None
+    return ImageCorpus(args.images, cache_bytes=int(args.image_cache_mb * 1048576), order=args.image_order)
+
+
+def identity_from_args(args, defaults=None):
+    return load_identity(
+        args.identity_file,
+        defaults,
+        **{field: getattr(args, field) for field in IDENTITY_FIELDS},
+    )
+
+
+class UsageError(Exception):
+    # Options that cannot be used together; main() reports these like argparse's own errors
+    pass
+
+
+def check_load_args(args):
+    # Before anything is opened or sent
+    if args.engine == "asyncio" and args.hedge_after is not None:
+        raise UsageError("Hedging is only supported with the threads engine")
+    if args.processes > 1 and (
+        args.batch_size > 1 or args.rate or args.journal or args.identities or args.profile or args.capture
+    ):
+        raise UsageError(
+            "--processes cannot be combined with batching, --rate, --journal, --identities, --profile or --capture"
         )
-        self.registration_number = f"DL4CQ{''.join(random.choices(string.digits, k=5))}"
-        self.equipment_id = f"GTFGF{''.join(random.choices(string.digits, k=5))}"
-
-    def update_url(self):
-        index = self.url_type_combo.currentIndex()
-        if index == 0:
-            self.url = "https://itmschallan.parivahan.gov.in/pushws/api/echallan/pushdata"
-            self.offence_id = "4391"
+    if args.batch_size > 1 and args.engine == "asyncio":
+        raise UsageError("Batching is only supported with the threads engine")
+    if args.rate and (args.batch_size > 1 or args.engine == "asyncio"):
+        raise UsageError("--rate is only supported with the threads engine and no batching")
+    if args.rate and args.requests is None and args.duration is None and args.identities is None:
+        raise UsageError("A rate profile needs --requests, --duration or --identities")
+    if args.body_mode != "buffered" and args.batch_size > 1:
+        raise UsageError("--body-mode is only supported without batching")
+    if args.capture and args.batch_size > 1:
+        raise UsageError("--capture is only supported without batching")
+    if args.resume and (not args.journal or not args.run_id or args.requests is None):
+        raise UsageError("--resume needs --journal, --run-id and --requests")
+    if args.resume and args.identities:
+        raise UsageError("--resume cannot be combined with --identities")
+
+
+def cmd_load(args):
+    check_load_args(args)
+    # Hedged duplicates need connections of their own
+    pool_size = args.pool_size or args.concurrency * (2 if args.hedge_after is not None else 1)
+    if args.rate and not args.pool_size:
+        # Open-loop sends must not queue for a connection
+        pool_size = rate_capacity(args.rate, args.timeout, pool_size)
+    body_modes = BodyModes({args.url_type: args.body_mode})
+    # Whatever was opened is closed on errors and interrupted runs (Ctrl-C) too,
+    # including an error while opening the rest; last opened, first closed: the
+    # hedge threads stop, then what was journaled is committed and the capture closed
+    with contextlib.ExitStack() as stack:
+        identities = IdentityImport(args.identities, args.identities_format) if args.identities else None
+        if identities is not None:
+            stack.callback(identities.close)
+        identity = identity_from_args(args) if identities is None else None
+        images = images_from_args(args)
+        ids = id_generator(args.id_state)
+        capture = SendCapture(args.capture, args.append, args.run_id) if args.capture else None
+        if capture is not None:
+            stack.callback(capture.close)
+        journal = SendJournal(args.journal) if args.journal else None
+        if journal is not None:
+            stack.callback(journal.close)
+        policy = policy_from_args(args) if args.engine == "threads" and args.processes == 1 else None
+        if policy is not None:
+            stack.callback(policy.close)
+        run_id = args.run_id or (datetime.now().strftime("%Y%m%d-%H%M%S") if journal is not None else None)
+        total = args.requests
+        if args.resume:
+            done = journal.succeeded_numbers(run_id)
+            # The run's own transaction numbers again, minus those that succeeded
+            ids = journal.run_ids(run_id, skip=done)
+            if ids is None:
+                raise ValueError(f"Run {run_id} has no recorded ID range to resume from")
+            total = max(0, min(total, len(ids)) - len(done))
+            print(
+                f"Resuming run {run_id}: {len(done)} of {args.requests} already succeeded, "
+                f"sending the other {total} with their original transaction numbers"
+            )
+        elif journal is not None and total is not None:
+            ids = ids.claim_range(total)
+            journal.start_run(run_id, ids)
+        sessions = SessionPool(pool_size=pool_size, keep_alive=not args.no_keep_alive)
+        if args.prewarm and args.engine == "threads" and args.processes == 1:
+            sessions.prewarm(
+                args.url_type, resolve_endpoint(args.url_type, args.url)[0], min(pool_size, args.concurrency)
+            ).result()
+        profiler = profiler_from_args(args)
+        if profiler is not None:
+            profiler.start()
+        if args.processes > 1:
+            stats = run_load_sharded(
+                args.url_type,
+                identity,
+                args.processes,
+                total=total,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                timeout=args.timeout,
+                images=images,
+                ids=ids,
+                url=args.url,
+                engine=args.engine,
+                policy_options=policy_options_from_args(args),
+                pool_size=pool_size,
+                keep_alive=not args.no_keep_alive,
+                prewarm=args.prewarm,
+                body_modes=body_modes,
+            )
+        elif args.rate:
+            stats = run_load_rate(
+                args.url_type,
+                identity,
+                args.rate,
+                duration=args.duration,
+                total=total,
+                concurrency=args.concurrency,
+                timeout=args.timeout,
+                sessions=sessions,
+                images=images,
+                ids=ids,
+                url=args.url,
+                identities=identities,
+                policy=policy,
+                journal=journal,
+                run_id=run_id,
+                body_modes=body_modes,
+                capture=capture,
+                max_in_flight=pool_size,
+            )
+        elif args.batch_size > 1:
+            results_file = open(args.batch_results, "w", encoding="utf-8") if args.batch_results else None
+            try:
+                stats = run_load_batched(
+                    args.url_type,
+                    identity,
+                    total=total,
+                    concurrency=args.concurrency,
+                    duration=args.duration,
+                    timeout=args.timeout,
+                    sessions=sessions,
+                    images=images,
+                    max_count=args.batch_size,
+                    max_bytes=int(args.batch_kb * 1024),
+                    max_wait=args.batch_wait,
+                    results_file=results_file,
+                    ids=ids,
+                    url=args.url,
+                    identities=identities,
+                    policy=policy,
+                    journal=journal,
+                    run_id=run_id,
+                )
+            finally:
+                if results_file is not None:
+                    results_file.close()
+        elif args.engine == "asyncio":
+            stats = run_load_async(
+                args.url_type,
+                identity,
+                total=total,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                timeout=args.timeout,
+                keep_alive=not args.no_keep_alive,
+                images=images,
+                ids=ids,
+                url=args.url,
+                identities=identities,
+                journal=journal,
+                run_id=run_id,
+                prewarm=args.prewarm,
+                body_modes=body_modes,
+                capture=capture,
+            )
         else:
-            self.url = "https://staging.parivahan.gov.in/pushws/api/echallan/pushdata"
-            self.offence_id = "9759"
-
-    def scroll_to_widget(self, widget):
-        scroll_bar = self.scroll_area.verticalScrollBar()
-        widget_rect = widget.rect()
-        widget_global_rect = widget.mapToGlobal(widget_rect.topLeft())
-        scroll_area_rect = self.scroll_area.viewport().rect()
-        scroll_area_global_rect = self.scroll_area.viewport().mapToGlobal(
-            scroll_area_rect.topLeft()
+            stats = run_load(
+                args.url_type,
+                identity,
+                total=total,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                timeout=args.timeout,
+                sessions=sessions,
+                images=images,
+                ids=ids,
+                url=args.url,
+                identities=identities,
+                policy=policy,
+                journal=journal,
+                run_id=run_id,
+                body_modes=body_modes,
+                capture=capture,
+            )
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(args.profile)
+        print(stats.summary())
+        if profiler is not None:
+            print(profiler.summary())
+            print(f"Trace:        {args.profile} (summary in {args.profile}.txt)")
+        if identities is not None:
+            print(identities.summary())
+        if journal is not None:
+            journal.flush()
+            print(f"Journal:      run {run_id}, {journal.rows} rows in {journal.commits} commits to {journal.path}")
+            if journal.failed:
+                print(f"              {journal.failed} rows were not journaled: {journal.error}")
+        if capture is not None:
+            print(f"Capture:      {capture.count} sends to {capture.path}")
+        export_metrics(args, stats.metrics)
+        return 0 if stats.errors == 0 and not (journal is not None and journal.failed) else 1
+
+
+def parse_speed(value):
+    # 1, 10, 0.5, 10x or max
+    if value.lower() == "max":
+        return 0.0
+    try:
+        speed = float(value.lower().rstrip("x"))
+    except ValueError:
+        speed = 0.0
+    if speed <= 0:
+        raise argparse.ArgumentTypeError(f"invalid speed: {value} (use a positive multiple such as 1, 10x, or max)")
+    return speed
+
+
+def parse_rate(value):
+    # Checked here so a typo is reported before anything is sent; the spec itself is passed on
+    try:
+        parse_rate_profile(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def cmd_replay(args):
+    records = read_capture(args.capture_file, args.run)
+    if not records:
+        raise ValueError(f"{args.capture_file} has no captured sends")
+    images = images_from_args(args)
+    max_in_flight = args.pool_size or replay_capacity(records, args.speed, args.timeout, args.concurrency)
+    sessions = SessionPool(pool_size=max_in_flight)
+    speed = "max speed" if args.speed == 0 else f"{args.speed:g}x"
+    run = records[0].get("run")
+    with contextlib.ExitStack() as stack:
+        capture = SendCapture(args.capture, args.append) if args.capture else None
+        if capture is not None:
+            stack.callback(capture.close)
+        policy = policy_from_args(args)
+        stack.callback(policy.close)
+        print(
+            f"Replaying {len(records)} sends" + (f" of run {run}" if run else "")
+            + f" from {args.capture_file} to {args.url_type} at {speed}"
         )
-        target_position = (
-            widget_global_rect.y()
-            - scroll_area_global_rect.y()
-            + scroll_bar.value()
+        stats = run_replay(
+            records,
+            args.url_type,
+            speed=args.speed,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            sessions=sessions,
+            images=images,
+            ids=id_generator(args.id_state),
+            url=args.url,
+            policy=policy,
+            body_modes=BodyModes({args.url_type: args.body_mode}),
+            capture=capture,
+            max_in_flight=max_in_flight,
         )
-        target_position = max(0, min(scroll_bar.maximum(), target_position))
-
-        animation_duration = 500
-        step_count = 20
-        step_size = (target_position - scroll_bar.value()) / step_count
-
-        def scroll_step():
-            current_value = scroll_bar.value()
-            new_value = int(current_value + step_size)
-            if abs(new_value - target_position) < abs(step_size):
-                new_value = int(target_position)
-            scroll_bar.setValue(new_value)
-            if new_value != target_position:
-                QTimer.singleShot(animation_duration // step_count, scroll_step)
-
-        scroll_step()
-
-    def send_challan(self):
-        self.send_button.setEnabled(False)
-        self.update_random_ids()
-        self.update_url()
-
-        self.progress_bar.setValue(0)
-        self.progress_bar.show()
-
-        payload = {
-            "cctvNoticeData": [
-                {
-                    "offenceId": self.offence_id,
-                    "dpCd": "TP",
-                    "latitude": 1.0,
-                    "transactionNo": self.transaction_number,
-                    "userId": self.user_id_input.text(),
-                    "regnNo": self.registration_number,
-                    "voilationSource": "OSV",
-                    "voilationSourceCatg": "Over Speed Violation",
-                    "stateCd": "HP",
-                    "districtId": self.district_id_input.text(),
-                    "location": self.location_input.text(),
-                    "district": self.district_input.text(),
-                    "offCd": self.off_code_input.text(),
-                    "equipmentId": self.equipment_id,
-                    "vendorName": "I2V",
-                    "vehicleSpeed": 50,
-                    "speedLimit": 40,
-                    "vehicleWeight": 0,
-                    "voilationTime": self.violation_time,
-                    "actionTime": self.action_time,
-                    "longitude": 1.0,
-                    "image1": "/9j/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8UHRofHh0aHBwgJC4nICIsIxwcKDcpLDAxNDQ0Hyc5PTgyPC4zNDL/2wBDAQkJCQwLDBgNDRgyIRwhMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjL/wAAUCAC1APAEASIAAhEBAxEBBCIA/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADgQBAAIRAxEEAAA/APn+iiigD5/ooooooooAKKKKWitfw9pI1zWrfT/N8rzdxLemFJ/XGM9s5wa9G174UrfXsJ8NpFaWyQYk+0yu+997nKldzEhdoPyqMjgHJxE6sIO0mXGlOavFBRVzS9NutY1S206zjMlzcyCONR3JrqvFHwv8UeGLqRJdMnurVMYuraMujcc9OR+NeRUV0GqeDNf0rVZdOl025lmQttaCJpEkUYyykDkfMv03AHB4rHubS4tJ2huYJIZVxuSRSrDIyMg89KpSi9mJwkt0cTRTmVkYqwKsOCCMEU2q1FFFMkKKKKKKKKACiiiiiiigAooooooooAKKKKKKKKACiiiiiiigAooooooooAKKKKWitLR9Ll1jUoLKLAEjANIQSI1zyx9h+vQcmvX9O0Ox8N2uy2+ZmJw8igSOMnBbH16fz61x3w6tYozcahKqM24Qx8nK45bjpzlfyNHj3X5muzYWzhUeMGYq3zc5+T245PqCO3XGfM5ciLWi5iWKGSeVIokZ5HYKqqMkk9AK998OfCrw94K8P/wDCSePHSWVFD/ZWP7uM9lx/G/t0rkfgN4fi1jx6b24QNFpsJnAPTzCcL+XJ/Cq3xp8UXut+O73Tmmb7Bp7+TDED8u4Abm9znNY/jLWItW1ZBbyFoYUKM3BVnJOSuB0xtHfoSODXL0UVslZWIOT8W+ID4m8R3WprAtvA52W8CKAIohwq4HHT9c1gUUUUUUUAFFFFFFFFABRRRRVm1tpbu6htoV3SzOqRrkDLE4Ayfeq1WbW5ltLqG5hbbLC6vG2AcMDkHB96He2g1a+oUUUV7B4Y8GDw1KblrqK6nljVX2x7fJPcAk/MCT1wPujiuttp5oH4JwK4ew+J2l3LKt1ZvZuWALbzJGF4yxIG7PXgLjOOQDx21ldWmoRNLZXMNxGrbC8ThxnrjI78j86+dxMq6nerGx72HdBR5aTPePgv8NtasfE1t4j1ew+z2aWzPb+Yw3MzDAO3qOCTzX0PXyf4W+OHijw7FHa3Zj1SzjAVUuOHUDsHH9c1694e+PHhLV9kd+82lTngi4Xcmf8AfH9QK1lu3kjH710fBw6sQRkYrHliWaP7Ne20NxHxujddyNjkZB6jvzU53I2atxKl3tKjDKvNQo89uV6nXTlGzTOv1XwJ4X1u9F3qOh2dxcAbd7Jgke+Ov41zOtfA/wAF6tCwt7F9OmI+WS1kIA/4Ccg13Xw40O/v7+41bV7Z7W2tpNkUKgF2PoAOSfwrznxr8N9a8IXcs9nH9q09yGF1ECQmeSV6Ee4rGv7W/W0M1jC0jDlHHzL6Buhq54X8dax4TuJYrG4/tHT3IKzxBmUn+Ijg/hVqDxRq2mzCG2u443XkrEhdD6hgQR9RWn4m02S5s7eGaMrLC7KxB5BHb6VxHiTwjfeHdRlvrRmns5GKRTRHhlP8AEOh/CuipUjTgtGeXUqRpzl7zCiiiuk5gooooAKKKKKAO0+Hvw/uvF+uR2lnJ9n06JmkklIy7Hoq+54r16vw80O7gW5srqS3kHKyRu6uv+6SDj6GvWtL+MPhfULdLm40+4tZVGWjuFVmH+8pOPxrnvEHwf1vRbhrvSpLqwuFwWjmUMxA6sDwfoa9eEW6SJVBGQRgg968v8X/CvW/Dl1Je2M1xqWnMSzQzKVZc/dU8H6V3nhfxBqHhnVIr2yk8y3dg0MgXcpx1U9D9K8+pWhVjzWdjqp4iVKNkFFFFekcwUUUUAFFFFABRRRQAUUUUAFFFFABRRRQAUUUUAFFFFABRRRQAUUUUAFFFFABRRRQAUUUUAFFFFABRRRQAUUUUAFFFFAH/9k=",
-                }
-            ]
-        }
-
-        # Create and start the worker thread
-        self.worker = Worker(self.url, payload)
-        self.worker.finished.connect(self.on_request_finished)
-        self.worker.error.connect(self.on_request_error)
-        self.worker.response_received.connect(self.on_response_received)
-        self.worker.start()
-
-    def on_response_received(self, response):
-        response_text = response.text
-
-        # Update progress bar
-        self.progress_bar.setValue(100)
-
-        # Hide progress bar after request
-        self.progress_bar.hide()
-
-        # Determine color based on status code category
-        if 200 <= response.status_code < 300:
-            status_color = "green"
-            status_background_color = "#d4edda"
-            status_code_text = f"{response.status_code} - Success"
-        elif 300 <= response.status_code < 400:
-            status_color = "orange"
-            status_background_color = "#fff3cd"
-            status_code_text = f"{response.status_code} - Redirection"
-        elif 400 <= response.status_code < 500:
-            status_color = "darkred"
-            status_background_color = "#f8d7da"
-            status_code_text = f"{response.status_code} - Client Error"
-        else:
-            status_color = "darkred"
-            status_background_color = "#f5c6cb"
-            status_code_text = f"{response.status_code} - Server Error"
-
-        status_code_html = f"""
-        <div style="
-            padding: 15px; 
-            margin-bottom: 20px; 
-            border: 3px solid {status_color}; 
-            background-color: {status_background_color}; 
-            border-radius: 8px;
-            font-size: 20px;
-            font-weight: bold;
-            text-align: center;
-            color: {status_color};
-            ">
-            Response Status: {status_code_text}
-        </div>
-        """
-
-        request_details_html = f"""
-        <div style="
-            padding: 10px; 
-            margin-top: 10px; 
-            font-size: 16px;
-            line-height: 1.5;
-            color: #333;
-            ">
-            <strong>Request URL:</strong> {self.url}<br>
-            <strong>Response Time:</strong> {response.elapsed.total_seconds()} seconds
-        </div>
-        """
-
-        self.request_details.setHtml(
-            f"""
-            {status_code_html}
-            {request_details_html}
-        """
+    print(stats.summary())
+    print(compare_replay(records, stats))
+    if capture is not None:
+        print(f"Capture:      {capture.count} sends to {capture.path}")
+    export_metrics(args, stats.metrics)
+    return 0 if stats.errors == 0 else 1
+
+
+def cmd_stub_server(args):
+    from yarc_stub import StubServer
+    server = StubServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        response_bytes=args.response_bytes,
+        seed=args.seed,
+        verbose=args.verbose,
+        certfile=args.certfile,
+        keyfile=args.keyfile,
+        gzip=not args.no_gzip,
+    )
+    print(f"Serving stub pushdata endpoint at {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def add_resilience_arguments(parser):
+    parser.add_argument("--connect-timeout", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=40, help="read timeout in seconds")
+    parser.add_argument("--retries", type=int, default=2, help="retries on 429/502/503/504 and failures to connect")
+    parser.add_argument("--backoff", type=float, default=0.2, help="base of the jittered exponential backoff")
+    parser.add_argument(
+        "--breaker-failures", type=int, default=5,
+        help="consecutive failures that open a URL type's circuit (0 disables)",
+    )
+    parser.add_argument("--breaker-reset", type=float, default=30, help="seconds before a half-open probe")
+    parser.add_argument(
+        "--hedge-after", type=float,
+        help="send a duplicate with the same transactionNo after this many milliseconds (needs --idempotent)",
+    )
+    parser.add_argument(
+        "--idempotent", action="store_true",
+        help="the endpoint is known to deduplicate transactionNo, so hedged duplicates are safe",
+    )
+
+
+def policy_options_from_args(args):
+    if args.hedge_after is not None and not args.idempotent:
+        raise UsageError(
+            "--hedge-after resends the same transactionNo and can double-submit a notice; "
+            "add --idempotent only if the endpoint deduplicates them"
         )
-
-        QTimer.singleShot(0, lambda: self.scroll_to_widget(self.request_details))
-
-        try:
-            formatted_response = json.dumps(response.json(), indent=4)
-        except (ValueError, json.JSONDecodeError):
-            formatted_response = response_text
-
-        if len(formatted_response) > 50:
-            self.response_dialog = ResponseDialog(formatted_response)
-            self.response_dialog.exec_()
-        else:
-            self.response_body.setText(formatted_response)
-    
-    def on_request_finished(self):
-        self.send_button.setEnabled(True)  # Re-enable button
-
-    def on_request_error(self, error_message):
-        self.send_button.setEnabled(True)  # Re-enable button
-        self.response_body.setText(error_message)  # Display error
+    return {
+        "connect_timeout": args.connect_timeout,
+        "read_timeout": args.timeout,
+        "retry": RetryPolicy(retries=args.retries, backoff=args.backoff),
+        "failure_threshold": args.breaker_failures,
+        "reset_after": args.breaker_reset,
+        "hedge_after": args.hedge_after / 1000 if args.hedge_after is not None else None,
+        "max_hedges": args.concurrency,
+        "idempotent": [args.url_type] if args.idempotent else [],
+    }
+
+
+def policy_from_args(args):
+    return ResiliencePolicy(**policy_options_from_args(args))
+
+
+def add_profile_arguments(parser):
+    parser.add_argument(
+        "--profile", metavar="TRACE", default=os.environ.get("YARC_PROFILE"),
+        help="time each send's phases and write them to TRACE as a Chrome trace (chrome://tracing, Perfetto), "
+        "with a summary in TRACE.txt (default: $YARC_PROFILE)",
+    )
+    parser.add_argument(
+        "--profile-cpu", action="store_true", default=env_flag("YARC_PROFILE_CPU"),
+        help="also run cProfile on every thread and save the stats to TRACE.prof",
+    )
+    parser.add_argument(
+        "--profile-memory", action="store_true", default=env_flag("YARC_PROFILE_MEMORY"),
+        help="also trace allocations with tracemalloc (slow)",
+    )
+
+
+def profiler_from_args(args):
+    if not args.profile:
+        return None
+    return Profiler(cpu=args.profile_cpu, memory=args.profile_memory)
+
+
+def add_stub_arguments(parser):
+    parser.add_argument(
+        "--latency", default="fixed:0",
+        help="server latency: fixed:MS, uniform:LO:HI, normal:MEAN:SD, lognormal:MEDIAN:SIGMA or exp:MEAN",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--response-bytes", type=int, default=0, help="pad responses to at least this size")
+
+
+def cmd_journal(args):
+    journal = SendJournal(args.journal)
+    try:
+        if args.run_id:
+            print(f"run {args.run_id}: {journal.succeeded(args.run_id)} succeeded")
+        for transaction_no in args.transaction_no:
+            rows = journal.lookup(transaction_no)
+            if not rows:
+                print(f"{transaction_no}: not in journal")
+            for row in rows:
+                print(json.dumps(row))
+    finally:
+        journal.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="yarc.py",
+        description="Challan Checker. Run without arguments to open the GUI.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    load = subparsers.add_parser("load", help="send challans without the GUI and report throughput/latency")
+    add_url_arguments(load)
+    add_identity_arguments(load)
+    add_image_arguments(load)
+    add_id_arguments(load)
+    add_metrics_arguments(load)
+    load.add_argument("-n", "--requests", type=int, help="number of challans to send")
+    load.add_argument("-c", "--concurrency", type=int, default=1, help="parallel senders")
+    load.add_argument("-d", "--duration", type=float, help="stop after this many seconds")
+    load.add_argument(
+        "-p", "--processes", type=int, default=1,
+        help="split the run across this many sender processes, each with -c senders and its own ID range",
+    )
+    add_resilience_arguments(load)
+    add_profile_arguments(load)
+    load.add_argument("--pool-size", type=int, help="connections kept per URL type (default: concurrency)")
+    load.add_argument("--no-keep-alive", action="store_true", help="close the connection after every request")
+    load.add_argument(
+        "--prewarm", action="store_true",
+        help="resolve, connect and handshake one connection per sender before the clock starts",
+    )
+    load.add_argument(
+        "--engine", choices=["threads", "asyncio"], default="threads",
+        help="the asyncio engine uses --timeout only, without retries, circuit breaking or hedging",
+    )
+    load.add_argument(
+        "--body-mode", choices=BODY_MODES, default="buffered",
+        help="send bodies joined in memory, streamed in chunks, or streamed and gzip-compressed (falls back to "
+        "stream if the server refuses gzip)",
+    )
+    load.add_argument("--batch-size", type=int, default=1, help="notices per request; -n counts notices")
+    load.add_argument("--batch-kb", type=float, default=1024, help="close a batch at this body size")
+    load.add_argument("--batch-wait", type=float, default=1.0, help="close a batch after this many seconds")
+    load.add_argument("--batch-results", help="write per-notice results to this JSONL file")
+    load.add_argument(
+        "--rate", type=parse_rate,
+        help="open-loop send rate: R, constant:R, ramp:FROM:TO:SECONDS or step:R1,R2,...:SECONDS (req/s); up to "
+        "peak rate x --timeout sends (or --pool-size) are in flight, and sends due beyond that are dropped",
+    )
+    load.add_argument(
+        "--journal", nargs="?", const=DEFAULT_JOURNAL, help=f"record every send in this SQLite journal "
+        f"(default: {DEFAULT_JOURNAL})",
+    )
+    load.add_argument(
+        "--identities", help="CSV or JSONL file of identities; each challan uses the next valid row"
+    )
+    load.add_argument("--identities-format", choices=["csv", "jsonl"], help="default: from the file extension")
+    load.add_argument("--run-id", help="journal and capture run name (default: the start time)")
+    load.add_argument(
+        "--resume", action="store_true", help="only send what the journaled run has not yet sent successfully"
+    )
+    load.add_argument(
+        "--capture", help="record every send's notice fields and send time to this JSONL file (.gz to compress) "
+        "for the replay command",
+    )
+    load.add_argument(
+        "--append", action="store_true",
+        help="add this run to an existing --capture file (replay picks one run) instead of refusing to overwrite it",
+    )
+    load.set_defaults(func=cmd_load)
+
+    replay = subparsers.add_parser(
+        "replay", help="re-send a capture to a URL type with fresh IDs and compare against the original"
+    )
+    replay.add_argument("capture_file", help="capture written by load --capture or the GUI's YARC_CAPTURE")
+    replay.add_argument("--run", help="the captured run to replay (default: the one appended last)")
+    add_url_arguments(replay)
+    add_image_arguments(replay)
+    add_id_arguments(replay)
+    add_metrics_arguments(replay)
+    replay.add_argument(
+        "--speed", type=parse_speed, default=1.0,
+        help="replay at this multiple of the captured pace (1, 10x, 0.5) or max, ignoring the timing",
+    )
+    replay.add_argument(
+        "-c", "--concurrency", type=int, default=32,
+        help="senders at --speed max; otherwise the fewest sends allowed in flight before sends are dropped",
+    )
+    add_resilience_arguments(replay)
+    replay.add_argument(
+        "--pool-size", type=int,
+        help="connections kept, and sends allowed in flight (default: the most captured sends due within --timeout)",
+    )
+    replay.add_argument("--body-mode", choices=BODY_MODES, default="buffered")
+    replay.add_argument("--capture", help="also capture the replay's own sends to this file")
+    replay.add_argument("--append", action="store_true", help="add the replay to an existing --capture file")
+    replay.set_defaults(func=cmd_replay)
+
+    journal = subparsers.add_parser("journal", help="look up sends in the journal")
+    journal.add_argument("transaction_no", nargs="*")
+    journal.add_argument("--journal", default=DEFAULT_JOURNAL)
+    journal.add_argument("--run-id", help="also report how many sends of this run succeeded")
+    journal.set_defaults(func=cmd_journal)
+
+    stub_server = subparsers.add_parser("stub-server", help="run a local stand-in for the pushdata endpoint")
+    stub_server.add_argument("--host", default="127.0.0.1")
+    stub_server.add_argument("--port", type=int, default=8089)
+    add_stub_arguments(stub_server)
+    stub_server.add_argument("--seed", type=int)
+    stub_server.add_argument("--verbose", action="store_true", help="log every request")
+    stub_server.add_argument("--certfile", help="serve HTTPS with this PEM certificate (and key, unless --keyfile)")
+    stub_server.add_argument("--keyfile", help="PEM private key for --certfile")
+    stub_server.add_argument(
+        "--no-gzip", action="store_true", help="refuse gzip-encoded request bodies with 415 Unsupported Media Type"
+    )
+    stub_server.set_defaults(func=cmd_stub_server)
+
+    return parser
+
+
+def run_gui():
+    # Qt is only imported when the window is actually wanted
+    import yarc_gui
+    return yarc_gui.run_gui()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        return run_gui()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        return run_gui()
+    try:
+        return args.func(args)
+    except UsageError as e:
+        parser.error(str(e))
+    except (OSError, ValueError) as e:
+        # Missing or unreadable input files, unknown runs and the like: not a mistake in the arguments
+        print(f"{parser.prog}: error: {e}", file=sys.stderr)
+        return 1
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = ChallanSender()
-    window.show()
-    sys.exit(app.exec_())
+    sys.exit(main())
@@ -0,0 +1,563 @@
+# Benchmark harness: measures payload building, ID generation, the transports,
+# the journal, memory, body modes, startup and GUI update cost, and records the
+# suite's results so runs can be compared across commits.
+# Run as python yarc_bench.py <benchmark>; the GUI is only loaded to measure it
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from yarc import (
+    add_identity_arguments, add_image_arguments, add_stub_arguments, add_url_arguments, identity_from_args,
+    images_from_args,
+)
+from yarc_core import (
+    BODY_MODES, JSON_HEADERS, RESPONSE_BYTE_CAP, BodyModes, IdGenerator, Metrics, NoticeFactory, SendJournal,
+    SendJob, SendScheduler, SessionPool, auto_dates, build_notice, build_payload, compile_template,
+    fetch_response_view, post_parts, prepare_response_view, random_ids, run_load, run_load_async,
+    run_load_thread_per_request, url_type_info,
+)
+
+
+BENCH_IDENTITY = {"userId": "1", "districtId": "1", "location": "Shimla", "district": "Shimla", "offCd": "1"}
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def read_last_bench_record(path):
+    record = None
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+    return record
+
+
+def current_rss():
+    # Resident set size in bytes; /proc where available, otherwise the peak from getrusage
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def spawn_stub(*options):
+    # A stub server child process on a free port, and its URL
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "yarc.py"), "stub-server",
+         "--port", "0", *options],
+        stdout=subprocess.PIPE, text=True,
+    )
+    return stub, stub.stdout.readline().split()[-1]
+
+
+def measure_payload_build(offence_id, identity, count, repeat):
+    violation_time, action_time = auto_dates()
+    template = compile_template(offence_id, identity)
+    ids = IdGenerator().next_block(count)
+
+    def build_dict():
+        for transaction_number, registration_number, equipment_id in ids:
+            json.dumps(build_payload([
+                build_notice(
+                    offence_id, transaction_number, registration_number, equipment_id,
+                    identity, violation_time, action_time,
+                )
+            ])).encode("utf-8")
+
+    def build_template():
+        for transaction_number, registration_number, equipment_id in ids:
+            template.render(transaction_number, registration_number, equipment_id, violation_time, action_time)
+
+    sample = ids[0]
+    expected = json.dumps(build_payload([
+        build_notice(offence_id, *sample, identity, violation_time, action_time)
+    ])).encode("utf-8")
+    if template.render(*sample, violation_time, action_time) != expected:
+        raise ValueError("Template output differs from the dict payload")
+    return [
+        min(timeit.repeat(func, number=1, repeat=repeat)) / count
+        for func in (build_dict, build_template)
+    ]
+
+
+def measure_startup(repeat=5, gui=True):
+    # Returns (seconds to import the Qt-free core, seconds from process spawn to the
+    # GUI's first paint or None). perf_counter is CLOCK_MONOTONIC, shared by processes
+    directory = os.path.dirname(os.path.abspath(__file__))
+    probe = "import time; start = time.perf_counter(); import yarc_core; print(time.perf_counter() - start)"
+    import_seconds = min(
+        float(subprocess.run(
+            [sys.executable, "-c", probe], cwd=directory, capture_output=True, text=True, check=True
+        ).stdout)
+        for _ in range(repeat)
+    )
+    if not gui:
+        return import_seconds, None
+    env = dict(os.environ, YARC_EXIT_AFTER_FIRST_PAINT="1")
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    paint_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, os.path.join(directory, "yarc.py")], env=env, capture_output=True, text=True,
+            timeout=60,
+        )
+        painted = [line.split()[1] for line in result.stdout.splitlines() if line.startswith("first-paint ")]
+        if not painted:
+            raise ValueError(f"GUI did not report a first paint: {result.stderr.strip()[-200:]}")
+        paint_seconds.append(float(painted[0]) - start)
+    return import_seconds, min(paint_seconds)
+
+
+def measure_memory(count, response_bytes, byte_cap=RESPONSE_BYTE_CAP, concurrency=4, samples=10):
+    # Sends `count` challans to a stub answering with `response_bytes` bodies,
+    # reducing each response the way the GUI's senders do and keeping only the
+    # latest view. Returns [(sends so far, RSS bytes)]. byte_cap=0 reads whole
+    # responses through requests instead, as the senders used to. The stub runs in
+    # a child process so its own buffers stay out of the measurement
+    stub, url = spawn_stub("--response-bytes", str(response_bytes))
+    sessions = SessionPool(pool_size=concurrency)
+    session = sessions.session("custom")
+    factory = NoticeFactory(url_type_info("custom")[3], BENCH_IDENTITY, ids=IdGenerator())
+    latest = [None]
+
+    def send(body):
+        if byte_cap:
+            latest[0] = fetch_response_view(session, url, body, byte_cap=byte_cap)
+        else:
+            latest[0] = prepare_response_view(session.post(url, data=body, headers=JSON_HEADERS, timeout=40))
+
+    senders = SendScheduler(send, workers=concurrency, queue_size=concurrency * 4)
+    usage = [(0, current_rss())]
+    step = max(1, count // samples)
+    try:
+        for sent in range(1, count + 1):
+            senders.submit(factory.render_payload()[1], block=True)
+            if sent % step == 0 or sent == count:
+                usage.append((sent, current_rss()))
+        senders.join()
+    finally:
+        senders.close()
+        sessions.close()
+        stub.terminate()
+        stub.wait()
+    return usage
+
+
+def measure_body(count, images=None, modes=BODY_MODES):
+    # Sends `count` challans in each body mode to a stub child process. Returns
+    # {mode: (bytes written to the socket per request, peak traced allocation per
+    # request, requests per second)}; the peak covers rendering the payload, sending
+    # it and reading the response
+    import tracemalloc
+    stub, url = spawn_stub()
+    results = {}
+    try:
+        for mode in modes:
+            sessions = SessionPool(pool_size=1)
+            session = sessions.session("custom")
+            body_modes = BodyModes({"custom": mode})
+            factory = NoticeFactory(url_type_info("custom")[3], BENCH_IDENTITY, images, IdGenerator())
+            post_parts(session, url, factory.render_payload_parts()[1], "custom", body_modes, timeout=40).close()
+            sent = sessions.stats("custom")["bytes_sent"]
+            peak = 0
+            tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                for _ in range(count):
+                    tracemalloc.reset_peak()
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    parts = factory.render_payload_parts()[1]
+                    response = post_parts(session, url, parts, "custom", body_modes, timeout=40)
+                    if response.status_code != 200:
+                        raise ValueError(f"{mode} send failed with status {response.status_code}")
+                    peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+                    del parts, response
+            finally:
+                elapsed = time.perf_counter() - start
+                tracemalloc.stop()
+                sessions.close()
+            sent = sessions.stats("custom")["bytes_sent"] - sent
+            results[mode] = (sent / count, peak, count / elapsed)
+    finally:
+        stub.terminate()
+        stub.wait()
+    return results
+
+
+def measure_journal(count, max_batch=5000, synchronous="NORMAL"):
+    # Returns (seconds per record() call on the sending thread, rows committed per second, commits)
+    identity = BENCH_IDENTITY
+    _, _, _, offence_id = url_type_info("custom")
+    factory = NoticeFactory(offence_id, identity, ids=IdGenerator())
+    sends = [factory.render_payload() for _ in range(min(count, 1000))]
+    with tempfile.TemporaryDirectory() as directory:
+        journal = SendJournal(os.path.join(directory, "journal.sqlite3"), max_batch, synchronous)
+        start = time.perf_counter()
+        record_seconds = 0.0
+        for index in range(count):
+            (transaction_number, registration_number, _), body = sends[index % len(sends)]
+            before = time.perf_counter()
+            journal.record(None, [transaction_number], [registration_number], body, "custom", "", 200, 0.01)
+            record_seconds += time.perf_counter() - before
+        journal.close()
+        elapsed = time.perf_counter() - start
+    return record_seconds / count, journal.rows / elapsed, journal.commits
+
+
+class BenchResponse:
+    status_code = 200
+    content = b'{"status": "SUCCESS"}'
+    text = content.decode("utf-8")
+    elapsed = timedelta(milliseconds=5)
+    timings = {}
+
+
+def measure_gui_update(count):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from yarc_gui import ChallanSender
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = ChallanSender()
+    window.show()
+    window.update_url()
+    response = prepare_response_view(BenchResponse())
+    job = SendJob(window.url_type, window.url, b"", [])
+    app.processEvents()
+    start = time.perf_counter()
+    for _ in range(count):
+        job.started = time.perf_counter()
+        window.on_response_received(job, response)
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    window.close()
+    return elapsed / count
+
+
+def measure_gui_frames(count, rate=200):
+    # Streams responses into a live event loop at `rate` per second and returns
+    # the animation frame times seen while the scroll animations run
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from PyQt5.QtWidgets import QApplication
+    from yarc_gui import ChallanSender
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = ChallanSender()
+    window.show()
+    window.update_url()
+    response = prepare_response_view(BenchResponse())
+    job = SendJob(window.url_type, window.url, b"", [])
+    app.processEvents()
+    loop = QEventLoop()
+    timer = QTimer()
+    timer.setInterval(max(1, int(1000 / rate)))
+    sent = 0
+
+    def deliver():
+        nonlocal sent
+        job.started = time.perf_counter()
+        window.on_response_received(job, response)
+        sent += 1
+        if sent >= count:
+            timer.stop()
+            QTimer.singleShot(600, loop.quit)
+
+    timer.timeout.connect(deliver)
+    timer.start()
+    loop.exec_()
+    stats = window.animator.frame_stats()
+    window.close()
+    return stats
+
+
+def cmd_suite(args):
+    identity = identity_from_args(args, BENCH_IDENTITY)
+    _, _, _, offence_id = url_type_info("custom")
+    results = {}
+
+    dict_seconds, template_seconds = measure_payload_build(offence_id, identity, args.payload_count, 3)
+    results["payload_dict_us"] = dict_seconds * 1e6
+    results["payload_template_us"] = template_seconds * 1e6
+
+    stub = None
+    url = args.url
+    if not url:
+        from yarc_stub import StubServer
+        stub = StubServer(
+            port=0, latency=args.latency, error_rate=args.error_rate, response_bytes=args.response_bytes, seed=1
+        ).start()
+        url = stub.url
+    try:
+        for engine, runner in (("threads", run_load), ("asyncio", run_load_async)):
+            stats = runner(
+                "custom", identity, total=args.requests, concurrency=args.concurrency, ids=IdGenerator(), url=url
+            )
+            histogram = stats.metrics.histogram("custom")
+            results[f"{engine}_rps"] = stats.total / stats.elapsed
+            for q in Metrics.QUANTILES:
+                results[f"{engine}_p{q:g}_ms"] = histogram.percentile(q) * 1000
+            results[f"{engine}_failures"] = stats.total - stats.status_counts.get("2xx", 0)
+    finally:
+        if stub is not None:
+            stub.stop()
+
+    record_seconds, rows_per_second, _ = measure_journal(args.requests * 10)
+    results["journal_record_us"] = record_seconds * 1e6
+    results["journal_rows_per_s"] = rows_per_second
+
+    import_seconds, paint_seconds = measure_startup(gui=not args.skip_gui)
+    results["startup_import_ms"] = import_seconds * 1000
+    if not args.skip_gui:
+        results["startup_first_paint_ms"] = paint_seconds * 1000
+        results["gui_update_ms"] = measure_gui_update(args.gui_updates) * 1000
+        frames = measure_gui_frames(args.gui_updates)
+        results["gui_frame_p50_ms"] = frames["p50_ms"]
+        results["gui_frame_p99_ms"] = frames["p99_ms"]
+
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "response_bytes": args.response_bytes,
+            "url": args.url or "stub",
+        },
+        "results": results,
+    }
+    previous = read_last_bench_record(args.results)
+    previous_results = previous["results"] if previous else {}
+    if previous:
+        print(f"Comparing with {previous.get('commit') or 'unknown commit'} ({previous['timestamp']})")
+    print(f"{'metric':<24}{'current':>12}{'previous':>12}{'change':>10}")
+    for name, value in results.items():
+        before = previous_results.get(name)
+        change = f"{(value - before) / before:+.1%}" if before else ""
+        before_text = f"{before:.2f}" if before is not None else "-"
+        print(f"{name:<24}{value:>12.2f}{before_text:>12}{change:>10}")
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    return 0
+
+
+def cmd_engines(args):
+    identity = identity_from_args(args)
+    results = [
+        ("thread-per-request", run_load_thread_per_request(
+            args.url_type, identity, args.requests, args.concurrency, args.timeout, url=args.url, ids=IdGenerator()
+        )),
+        ("asyncio", run_load_async(
+            args.url_type, identity, total=args.requests, concurrency=args.concurrency, timeout=args.timeout,
+            url=args.url, ids=IdGenerator(),
+        )),
+    ]
+    for name, stats in results:
+        print(f"== {name} ==")
+        print(stats.summary())
+        print()
+    baseline, candidate = (stats.total / stats.elapsed for _, stats in results)
+    print(f"asyncio throughput: {candidate / baseline:.2f}x thread-per-request")
+    return 0
+
+
+def cmd_payload(args):
+    identity = identity_from_args(args)
+    _, _, _, offence_id = url_type_info(args.url_type)
+    results = measure_payload_build(offence_id, identity, args.count, args.repeat)
+    for name, seconds in zip(("dict + json.dumps", "template"), results):
+        print(f"{name:<20} {seconds * 1e6:8.2f} us/payload")
+    print(f"speedup: {results[0] / results[1]:.1f}x")
+    return 0
+
+
+def cmd_ids(args):
+    count = args.count
+
+    def legacy():
+        for _ in range(count):
+            random_ids()
+
+    def single():
+        generator = IdGenerator()
+        for _ in range(count):
+            generator.next_ids()
+
+    def block():
+        IdGenerator().next_block(count)
+
+    rates = []
+    for name, func in (("random.choices", legacy), ("IdGenerator.next_ids", single), ("IdGenerator.next_block", block)):
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        rates.append(count / best)
+        print(f"{name:<24} {count / best:12,.0f} ids/s")
+    print(f"block speedup: {rates[2] / rates[0]:.1f}x")
+
+    block_ids = IdGenerator().next_block(min(count, IdGenerator.SHORT_SPACE))
+    legacy_ids = [random_ids() for _ in range(len(block_ids))]
+    for position, field in enumerate(("transactionNo", "regnNo", "equipmentId")):
+        unique = len({ids[position] for ids in block_ids})
+        legacy_unique = len({ids[position] for ids in legacy_ids})
+        print(f"{field:<14} unique of {len(block_ids)}: IdGenerator {unique}, random.choices {legacy_unique}")
+    return 0
+
+
+def cmd_journal(args):
+    for label, max_batch in (("group commit", 5000), ("commit per send", 1)):
+        record_seconds, rows_per_second, commits = measure_journal(args.count, max_batch, args.synchronous)
+        print(
+            f"{label:<16} record() {record_seconds * 1e6:6.2f} us/send   "
+            f"{rows_per_second:10,.0f} rows/s   {commits} commits"
+        )
+    return 0
+
+
+def cmd_memory(args):
+    byte_cap = int(args.byte_cap_kb * 1024)
+    label = f"{args.byte_cap_kb:g} KB cap" if byte_cap else "no cap"
+    print(f"{args.requests} sends, {args.response_kb:g} KB responses, {label}")
+    start = time.perf_counter()
+    usage = measure_memory(args.requests, int(args.response_kb * 1024), byte_cap, args.concurrency)
+    for sent, rss in usage:
+        print(f"{sent:>10} sends   RSS {rss / 1048576:8.1f} MiB")
+    # Growth is taken after the first sample, once pools and caches have warmed up
+    growth = usage[-1][1] - usage[1][1]
+    print(f"growth after the first {usage[1][0]} sends: {growth / 1048576:+.1f} MiB "
+          f"in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def cmd_body(args):
+    images = images_from_args(args)
+    results = measure_body(args.requests, images)
+    baseline_sent, baseline_peak, _ = results["buffered"]
+    print(f"{'mode':<10}{'bytes/request':>15}{'vs buffered':>13}{'peak KiB':>11}{'vs buffered':>13}{'req/s':>9}")
+    for mode, (sent, peak, rate) in results.items():
+        print(
+            f"{mode:<10}{sent:>15,.0f}{sent / baseline_sent:>12.0%} {peak / 1024:>10.1f}"
+            f"{peak / baseline_peak:>12.0%} {rate:>9.1f}"
+        )
+    return 0
+
+
+def cmd_startup(args):
+    import_seconds, paint_seconds = measure_startup(args.repeat, gui=not args.skip_gui)
+    print(f"import yarc_core   {import_seconds * 1000:8.1f} ms")
+    if paint_seconds is not None:
+        print(f"first paint        {paint_seconds * 1000:8.1f} ms (from process start)")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="yarc_bench.py", description="Challan Checker benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    suite = subparsers.add_parser(
+        "suite", help="run the benchmark suite against the stub server and record the results"
+    )
+    suite.add_argument("--url", help="benchmark this endpoint instead of an in-process stub server")
+    add_identity_arguments(suite)
+    add_stub_arguments(suite)
+    suite.add_argument("-n", "--requests", type=int, default=2000)
+    suite.add_argument("-c", "--concurrency", type=int, default=50)
+    suite.add_argument("--payload-count", type=int, default=20000)
+    suite.add_argument("--gui-updates", type=int, default=200)
+    suite.add_argument("--skip-gui", action="store_true", help="do not measure GUI update cost")
+    suite.add_argument("--results", default="yarc-bench.jsonl", help="JSONL file the results are appended to")
+    suite.set_defaults(func=cmd_suite)
+
+    engines = subparsers.add_parser(
+        "engines", help="compare thread-per-request sends against the asyncio engine"
+    )
+    add_url_arguments(engines)
+    add_identity_arguments(engines)
+    engines.add_argument("-n", "--requests", type=int, default=500)
+    engines.add_argument("-c", "--concurrency", type=int, default=100, help="requests in flight")
+    engines.add_argument("--timeout", type=float, default=40)
+    engines.set_defaults(func=cmd_engines)
+
+    payload = subparsers.add_parser(
+        "payload", help="compare per-payload build time of the dict builder and the template"
+    )
+    add_url_arguments(payload)
+    add_identity_arguments(payload)
+    payload.add_argument("--count", type=int, default=20000)
+    payload.add_argument("--repeat", type=int, default=5)
+    payload.set_defaults(func=cmd_payload)
+
+    ids = subparsers.add_parser("ids", help="measure ID generation throughput and uniqueness")
+    ids.add_argument("--count", type=int, default=100000)
+    ids.add_argument("--repeat", type=int, default=3)
+    ids.set_defaults(func=cmd_ids)
+
+    journal = subparsers.add_parser(
+        "journal", help="measure send journal overhead with and without group commit"
+    )
+    journal.add_argument("--count", type=int, default=20000)
+    journal.add_argument("--synchronous", choices=["OFF", "NORMAL", "FULL"], default="NORMAL")
+    journal.set_defaults(func=cmd_journal)
+
+    memory = subparsers.add_parser(
+        "memory", help="track resident memory over many sends with large responses"
+    )
+    memory.add_argument("-n", "--requests", type=int, default=100000)
+    memory.add_argument("-c", "--concurrency", type=int, default=4)
+    memory.add_argument("--response-kb", type=float, default=256, help="size of the stub's responses")
+    memory.add_argument(
+        "--byte-cap-kb", type=float, default=RESPONSE_BYTE_CAP / 1024,
+        help="read at most this much of each body (0: read whole responses, as before)",
+    )
+    memory.set_defaults(func=cmd_memory)
+
+    body = subparsers.add_parser(
+        "body", help="compare bytes on the wire and peak memory per request across body modes"
+    )
+    add_image_arguments(body)
+    body.add_argument("-n", "--requests", type=int, default=200)
+    body.set_defaults(func=cmd_body)
+
+    startup = subparsers.add_parser(
+        "startup", help="measure core import time and time to the GUI's first paint"
+    )
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.add_argument("--skip-gui", action="store_true", help="only measure the core import")
+    startup.set_defaults(func=cmd_startup)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"{parser.prog}: error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4110 @@
+# Qt-free core of the challan sender: payload and ID generation, transports,
+# send scheduling, resilience, the send journal and the headless load runners.
+# Importing it never loads Qt, and the heavier modules (requests, asyncio,
+# sqlite3, ...) are only loaded when something first uses them
+import importlib.util
+import sys
+from datetime import datetime, timedelta
+import random
+import string
+import json
+import array
+import base64
+import collections
+import csv
+import functools
+import hashlib
+import io
+import itertools
+import math
+import mmap
+import os
+import queue
+import re
+import socket
+import threading
+import time
+import types
+import urllib.parse
+import zlib
+
+
+class MissingModule(types.ModuleType):
+    # Stands in for an uninstalled dependency so only the code paths that use it fail
+    def __getattr__(self, attr):
+        raise ModuleNotFoundError(f"No module named {self.__name__!r}", name=self.__name__)
+
+
+# One lock for every lazy module: loading one can trigger loading another
+# (requests touches urllib3) on the same thread
+_lazy_lock = threading.RLock()
+_lazy_loading = set()
+
+
+class LazyModule(types.ModuleType):
+    # importlib's LazyLoader before 3.12.3 lets a second thread see the module
+    # half-executed; here the first access runs the module's code under a lock
+    # and the module only turns into a plain one once that code has finished
+    def __getattribute__(self, attr):
+        with _lazy_lock:
+            if type(self) is LazyModule and id(self) not in _lazy_loading:
+                _lazy_loading.add(id(self))
+                try:
+                    object.__getattribute__(self, "__spec__").loader.exec_module(self)
+                    self.__class__ = types.ModuleType
+                finally:
+                    _lazy_loading.discard(id(self))
+        return types.ModuleType.__getattribute__(self, attr)
+
+
+def lazy_import(name):
+    # The module object is created now but its code only runs on first attribute access
+    module = sys.modules.get(name)
+    if module is None:
+        try:
+            spec = importlib.util.find_spec(name)
+        except ModuleNotFoundError:
+            spec = None
+        if spec is None:
+            # Not registered in sys.modules, so a plain import elsewhere still fails normally
+            return MissingModule(name)
+        module = importlib.util.module_from_spec(spec)
+        module.__class__ = LazyModule
+        sys.modules[name] = module
+        parent, _, child = name.rpartition(".")
+        if parent:
+            # `import a.b` elsewhere expects the submodule as an attribute of its package
+            setattr(sys.modules[parent], child, module)
+    return module
+
+
+requests = lazy_import("requests")
+urllib3 = lazy_import("urllib3")
+asyncio = lazy_import("asyncio")
+ssl = lazy_import("ssl")
+sqlite3 = lazy_import("sqlite3")
+futures = lazy_import("concurrent.futures")
+multiprocessing = lazy_import("multiprocessing")
+cProfile = lazy_import("cProfile")
+pstats = lazy_import("pstats")
+tracemalloc = lazy_import("tracemalloc")
+gzip = lazy_import("gzip")
+
+URL_TYPES = [
+    ("live", "Live Challan URL", "https://itmschallan.parivahan.gov.in/pushws/api/echallan/pushdata", "4391"),
+    ("testing", "Testing Challan URL", "https://staging.parivahan.gov.in/pushws/api/echallan/pushdata", "9759"),
+    ("custom", "Custom / Local URL", None, "9759"),
+]
+
+STUB_PATH = "/pushws/api/echallan/pushdata"
+DEFAULT_CUSTOM_URL = f"http://127.0.0.1:8089{STUB_PATH}"
+
+IMAGE1 = "/9j/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8UHRofHh0aHBwgJC4nICIsIxwcKDcpLDAxNDQ0Hyc5PTgyPC4zNDL/2wBDAQkJCQwLDBgNDRgyIRwhMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjL/wAAUCAC1APAEASIAAhEBAxEBBCIA/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADgQBAAIRAxEEAAA/APn+iiigD5/ooooooooAKKKKWitfw9pI1zWrfT/N8rzdxLemFJ/XGM9s5wa9G174UrfXsJ8NpFaWyQYk+0yu+997nKldzEhdoPyqMjgHJxE6sIO0mXGlOavFBRVzS9NutY1S206zjMlzcyCONR3JrqvFHwv8UeGLqRJdMnurVMYuraMujcc9OR+NeRUV0GqeDNf0rVZdOl025lmQttaCJpEkUYyykDkfMv03AHB4rHubS4tJ2huYJIZVxuSRSrDIyMg89KpSi9mJwkt0cTRTmVkYqwKsOCCMEU2q1FFFMkKKKKKKKKACiiiiiiigAooooooooAKKKKKKKKACiiiiiiigAooooooooAKKKKWitLR9Ll1jUoLKLAEjANIQSI1zyx9h+vQcmvX9O0Ox8N2uy2+ZmJw8igSOMnBbH16fz61x3w6tYozcahKqM24Qx8nK45bjpzlfyNHj3X5muzYWzhUeMGYq3zc5+T245PqCO3XGfM5ciLWi5iWKGSeVIokZ5HYKqqMkk9AK998OfCrw94K8P/wDCSePHSWVFD/ZWP7uM9lx/G/t0rkfgN4fi1jx6b24QNFpsJnAPTzCcL+XJ/Cq3xp8UXut+O73Tmmb7Bp7+TDED8u4Abm9znNY/jLWItW1ZBbyFoYUKM3BVnJOSuB0xtHfoSODXL0UVslZWIOT8W+ID4m8R3WprAtvA52W8CKAIohwq4HHT9c1gUUUUUUUAFFFFFFFFABRRRRVm1tpbu6htoV3SzOqRrkDLE4Ayfeq1WbW5ltLqG5hbbLC6vG2AcMDkHB96He2g1a+oUUUV7B4Y8GDw1KblrqK6nljVX2x7fJPcAk/MCT1wPujiuttp5oH4JwK4ew+J2l3LKt1ZvZuWALbzJGF4yxIG7PXgLjOOQDx21ldWmoRNLZXMNxGrbC8ThxnrjI78j86+dxMq6nerGx72HdBR5aTPePgv8NtasfE1t4j1ew+z2aWzPb+Yw3MzDAO3qOCTzX0PXyf4W+OHijw7FHa3Zj1SzjAVUuOHUDsHH9c1694e+PHhLV9kd+82lTngi4Xcmf8AfH9QK1lu3kjH710fBw6sQRkYrHliWaP7Ne20NxHxujddyNjkZB6jvzU53I2atxKl3tKjDKvNQo89uV6nXTlGzTOv1XwJ4X1u9F3qOh2dxcAbd7Jgke+Ov41zOtfA/wAF6tCwt7F9OmI+WS1kIA/4Ccg13Xw40O/v7+41bV7Z7W2tpNkUKgF2PoAOSfwrznxr8N9a8IXcs9nH9q09yGF1ECQmeSV6Ee4rGv7W/W0M1jC0jDlHHzL6Buhq54X8dax4TuJYrG4/tHT3IKzxBmUn+Ijg/hVqDxRq2mzCG2u443XkrEhdD6hgQR9RWn4m02S5s7eGaMrLC7KxB5BHb6VxHiTwjfeHdRlvrRmns5GKRTRHhlP8AEOh/CuipUjTgtGeXUqRpzl7zCiiiuk5gooooAKKKKKAO0+Hvw/uvF+uR2lnJ9n06JmkklIy7Hoq+54r16vw80O7gW5srqS3kHKyRu6uv+6SDj6GvWtL+MPhfULdLm40+4tZVGWjuFVmH+8pOPxrnvEHwf1vRbhrvSpLqwuFwWjmUMxA6sDwfoa9eEW6SJVBGQRgg968v8X/CvW/Dl1Je2M1xqWnMSzQzKVZc/dU8H6V3nhfxBqHhnVIr2yk8y3dg0MgXcpx1U9D9K8+pWhVjzWdjqp4iVKNkFFFFekcwUUUUAFFFFABRRRQAUUUUAFFFFABRRRQAUUUUAFFFFABRRRQAUUUUAFFFFABRRRQAUUUUAFFFFABRRRQAUUUUAFFFFAH/9k="
+
+
+IDENTITY_FIELDS = ["userId", "districtId", "location", "district", "offCd"]
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def auto_dates(now=None):
+    now = now or datetime.now()
+    base_date = now - timedelta(days=2)
+    violation_time = base_date.strftime("%Y-%m-%d 10:14:45.0")
+    action_time = base_date.strftime("%Y-%m-%d 10:44:00.0")
+    return violation_time, action_time
+
+
+def random_ids():
+    transaction_number = (
+        f"REAMN{''.join(random.choices(string.digits, k=12))}A{''.join(random.choices(string.digits, k=4))}"
+    )
+    registration_number = f"DL4CQ{''.join(random.choices(string.digits, k=5))}"
+    equipment_id = f"GTFGF{''.join(random.choices(string.digits, k=5))}"
+    return transaction_number, registration_number, equipment_id
+
+
+def format_ids(transaction_digits, registration_digits, equipment_digits):
+    return (
+        f"REAMN{transaction_digits // 10000:012d}A{transaction_digits % 10000:04d}",
+        f"DL4CQ{registration_digits:05d}",
+        f"GTFGF{equipment_digits:05d}",
+    )
+
+
+# Exclusive lock on a sidecar "<path>.lock" file, held across processes. Every
+# IdGenerator sharing a state file (GUI, CLI runs, shard parents) takes it
+# around each read-advance-write of the high-water mark
+class StateFileLock:
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._fd = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 seconds; keep waiting
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if os.name == "nt":
+                import msvcrt
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+# Collision-free IDs: a sequence number is pushed through an affine permutation
+# of each field's digit space, so IDs look scattered but cannot repeat until the
+# space is used up (10^16 transaction numbers, 10^5 regn/equipment numbers).
+# The permutation and the high-water mark are persisted so later runs continue
+# where the last one stopped. Each reservation re-reads the mark under a file
+# lock, so generators in other processes never get overlapping blocks.
+class IdGenerator:
+    TRANSACTION_SPACE = 10 ** 16
+    SHORT_SPACE = 10 ** 5
+    RESERVE = 10000
+
+    def __init__(self, state_file=None, block_size=1024):
+        self.state_file = state_file
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._buffer = collections.deque()
+        if state_file:
+            with StateFileLock(state_file):
+                state = self._load_state()
+                if state is None:
+                    # Written now so every generator on this file shares one permutation
+                    state = self._new_state()
+                    self._write_state(state)
+        else:
+            state = self._new_state()
+        self._params = state["params"]
+        # [_next, _reserved) is the block this generator owns; nothing is reserved yet
+        self._next = self._reserved = state["next"]
+        self.first = self._next
+        self._issued = 0
+
+    def _new_state(self):
+        rng = random.SystemRandom()
+        return {
+            "next": 0,
+            "params": [
+                self._multiplier(rng, self.TRANSACTION_SPACE), rng.randrange(self.TRANSACTION_SPACE),
+                self._multiplier(rng, self.SHORT_SPACE), rng.randrange(self.SHORT_SPACE),
+                self._multiplier(rng, self.SHORT_SPACE), rng.randrange(self.SHORT_SPACE),
+            ],
+        }
+
+    @staticmethod
+    def _multiplier(rng, space):
+        while True:
+            multiplier = rng.randrange(1, space)
+            if math.gcd(multiplier, space) == 1:
+                return multiplier
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return None
+        with open(self.state_file, encoding="utf-8") as f:
+            state = json.load(f)
+        if not isinstance(state.get("next"), int) or len(state.get("params", [])) != 6:
+            raise ValueError(f"Invalid ID state file: {self.state_file}")
+        return state
+
+    def _write_state(self, state):
+        temp_file = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.state_file)
+
+    def _reserve(self, count):
+        # Claims [mark, mark + count + RESERVE) from the shared mark and returns its start
+        if not self.state_file:
+            start = self._reserved
+        else:
+            with StateFileLock(self.state_file):
+                state = self._load_state()
+                if state is None or state["params"] != self._params:
+                    raise ValueError(f"ID state file was replaced while in use: {self.state_file}")
+                start = max(state["next"], self._reserved)
+                self._write_state({"next": start + count + self.RESERVE, "params": self._params})
+        self._next = start
+        self._reserved = start + count + self.RESERVE
+        return start
+
+    def _claim(self, count):
+        with self._lock:
+            if self._next + count > self._reserved:
+                # The rest of the current block is skipped; a claim never straddles two blocks
+                self._reserve(count)
+            start = self._next
+            self._next += count
+            self._issued += count
+            return start
+
+    def next_block(self, count):
+        return format_id_block(self._params, self._claim(count), count)
+
+    def next_ids(self):
+        try:
+            return self._buffer.popleft()
+        except IndexError:
+            block = self.next_block(self.block_size)
+            self._buffer.extend(block[1:])
+            return block[0]
+
+    def claim_range(self, count):
+        # Hands out the next count sequence numbers as an IdRange; they are
+        # reserved in the state file before this returns
+        start = self._claim(count)
+        return IdRange(self._params, start, start + count, self.block_size)
+
+    def unclaim(self, start, stop):
+        # Hands [start, stop), the unused end of this generator's latest claim,
+        # back: to the shared mark when nothing was reserved after it, otherwise
+        # to this generator's next claims
+        with self._lock:
+            if self._next != stop:
+                return
+            self._next = start
+            self._issued -= stop - start
+            if not self.state_file:
+                return
+            with StateFileLock(self.state_file):
+                state = self._load_state()
+                if state is not None and state["params"] == self._params and state["next"] == self._reserved:
+                    self._write_state({"next": start, "params": self._params})
+                    self._reserved = start
+
+    @property
+    def issued(self):
+        return self._issued
+
+
+def format_id_block(params, start, count, step=1):
+    ta, tb, ra, rb, ea, eb = params
+    transaction_space = IdGenerator.TRANSACTION_SPACE
+    short_space = IdGenerator.SHORT_SPACE
+    return [
+        (
+            f"REAMN{t // 10000:012d}A{t % 10000:04d}",
+            f"DL4CQ{r:05d}",
+            f"GTFGF{e:05d}",
+        )
+        for t, r, e in (
+            ((ta * n + tb) % transaction_space, (ra * n + rb) % short_space, (ea * n + eb) % short_space)
+            for n in range(start, start + count * step, step)
+        )
+    ]
+
+
+# Every step-th sequence number of [start, stop) of an IdGenerator's sequence.
+# Shard processes each get one, so they issue IDs without sharing the generator
+# or its state file; a journaled run records its own so --resume can issue the
+# same IDs again, minus the transaction numbers in skip
+class IdRange:
+    def __init__(self, params, start, stop, block_size=1024, skip=frozenset(), step=1):
+        self.params = params
+        self.start = start
+        self.stop = stop
+        self.block_size = block_size
+        self.skip = skip
+        self.step = step
+        self._next = start
+        self._lock = threading.Lock()
+        self._buffer = collections.deque()
+
+    def __reduce__(self):
+        return IdRange, (self.params, self._next, self.stop, self.block_size, self.skip, self.step)
+
+    def __len__(self):
+        return len(range(self._next, self.stop, self.step))
+
+    @property
+    def position(self):
+        # Every number this range has issued is below this one
+        with self._lock:
+            return min(self._next, self.stop)
+
+    def interleave(self, parts):
+        # parts ranges that take turns through this one's numbers. The regn and
+        # equipment permutations repeat every SHORT_SPACE numbers, so ranges cut
+        # into blocks SHORT_SPACE apart would repeat each other's short IDs;
+        # interleaved ones share no ID until SHORT_SPACE numbers are used in all
+        return [
+            IdRange(self.params, self._next + index * self.step, self.stop, self.block_size, self.skip,
+                    self.step * parts)
+            for index in range(parts)
+        ]
+
+    def next_ids(self):
+        try:
+            return self._buffer.popleft()
+        except IndexError:
+            pass
+        # The block is formatted and buffered under the lock: otherwise a thread
+        # arriving between the claim and the extend would find the buffer empty
+        # and the range used up while IDs were still on their way in
+        with self._lock:
+            while True:
+                try:
+                    return self._buffer.popleft()
+                except IndexError:
+                    pass
+                start = self._next
+                count = min(self.block_size, len(range(start, self.stop, self.step)))
+                if count <= 0:
+                    raise IdRangeExhausted()
+                self._next += count * self.step
+                block = format_id_block(self.params, start, count, self.step)
+                if self.skip:
+                    block = [ids for ids in block if ids[0] not in self.skip]
+                if block:
+                    self._buffer.extend(block[1:])
+                    return block[0]
+
+
+DEFAULT_ID_STATE = os.path.join(os.path.expanduser("~"), ".yarc", "ids.json")
+_id_generators = {}
+_id_generators_lock = threading.Lock()
+
+
+def id_generator(state_file=DEFAULT_ID_STATE):
+    with _id_generators_lock:
+        generator = _id_generators.get(state_file)
+        if generator is None:
+            generator = _id_generators[state_file] = IdGenerator(state_file)
+        return generator
+
+
+def build_notice(offence_id, transaction_number, registration_number, equipment_id,
+                 identity, violation_time, action_time, image1=IMAGE1):
+    return {
+        "offenceId": offence_id,
+        "dpCd": "TP",
+        "latitude": 1.0,
+        "transactionNo": transaction_number,
+        "userId": identity["userId"],
+        "regnNo": registration_number,
+        "voilationSource": "OSV",
+        "voilationSourceCatg": "Over Speed Violation",
+        "stateCd": "HP",
+        "districtId": identity["districtId"],
+        "location": identity["location"],
+        "district": identity["district"],
+        "offCd": identity["offCd"],
+        "equipmentId": equipment_id,
+        "vendorName": "I2V",
+        "vehicleSpeed": 50,
+        "speedLimit": 40,
+        "vehicleWeight": 0,
+        "voilationTime": violation_time,
+        "actionTime": action_time,
+        "longitude": 1.0,
+        "image1": image1,
+    }
+
+
+def build_payload(notices):
+    return {"cctvNoticeData": list(notices)}
+
+
+EMPTY_PAYLOAD = json.dumps(build_payload([])).encode("utf-8")
+PAYLOAD_HEAD, PAYLOAD_TAIL = EMPTY_PAYLOAD[:-2], EMPTY_PAYLOAD[-2:]
+
+
+def batch_body(notices):
+    return PAYLOAD_HEAD + b", ".join(notices) + PAYLOAD_TAIL
+
+
+def batch_parts(notices):
+    # batch_body for notices given as parts (see PayloadTemplate.render_notice_parts)
+    parts = [PAYLOAD_HEAD]
+    for index, notice in enumerate(notices):
+        if index:
+            parts.append(b", ")
+        parts.extend(notice)
+    parts.append(PAYLOAD_TAIL)
+    return tuple(parts)
+
+
+# Values json.dumps writes out unchanged: printable ASCII without quotes or
+# backslashes (DEL is escaped too). Anything else takes the template's slow path
+JSON_PLAIN = re.compile(rb'[\x20\x21\x23-\x5b\x5d-\x7e]*')
+
+
+# Pre-serialized payload template: static fields are encoded once, per-request
+# fields are spliced into fixed-width slots of a copy of the encoded buffer
+class PayloadTemplate:
+    DYNAMIC_FIELDS = ["transactionNo", "regnNo", "equipmentId", "voilationTime", "actionTime"]
+
+    def __init__(self, offence_id, identity, image1=IMAGE1):
+        self.identity = dict(identity)
+        sample = dict(zip(self.DYNAMIC_FIELDS, format_ids(0, 0, 0) + auto_dates()))
+        markers = {
+            field: ("`%d" % i).ljust(len(sample[field]), "`")
+            for i, field in enumerate(self.DYNAMIC_FIELDS)
+        }
+        notice = build_notice(
+            offence_id,
+            markers["transactionNo"],
+            markers["regnNo"],
+            markers["equipmentId"],
+            identity,
+            markers["voilationTime"],
+            markers["actionTime"],
+            image1,
+        )
+        encoded = json.dumps(build_payload([notice])).encode("utf-8")
+        self._buffer = encoded
+        self._slots = []
+        self._chunks = []
+        position = 0
+        for field in self.DYNAMIC_FIELDS:
+            marker = b'"' + markers[field].encode("ascii") + b'"'
+            start = encoded.index(marker, position) + 1
+            end = start + len(marker) - 2
+            self._slots.append((start, end))
+            self._chunks.append(encoded[position:start])
+            position = end
+        image_key = b'"image1": "'
+        image_start = encoded.index(image_key, position) + len(image_key)
+        image_end = encoded.index(b'"', image_start)
+        self._chunks.append(encoded[position:image_start])
+        self._prefix = encoded[:image_start]
+        self._image = encoded[image_start:image_end]
+        self._suffix = encoded[image_end:]
+        self._notice_start = len(PAYLOAD_HEAD)
+        self._notice_tail = len(PAYLOAD_TAIL)
+
+    def render(self, transaction_number, registration_number, equipment_id, violation_time, action_time,
+               image1=None):
+        values = [
+            value.encode("utf-8")
+            for value in (transaction_number, registration_number, equipment_id, violation_time, action_time)
+        ]
+        if isinstance(image1, str):
+            image1 = image1.encode("ascii")
+        buffer = bytearray(self._buffer if image1 is None else self._prefix)
+        for (start, end), value in zip(self._slots, values):
+            if len(value) != end - start or not JSON_PLAIN.fullmatch(value):
+                return self._render_slow(values, image1)
+            buffer[start:end] = value
+        if image1 is None:
+            return bytes(buffer)
+        return b"".join((buffer, image1, self._suffix))
+
+    def _render_slow(self, values, image1=None):
+        parts = [self._chunks[0]]
+        for value, chunk in zip(values, self._chunks[1:]):
+            parts.append(json.dumps(value.decode("utf-8"))[1:-1].encode("utf-8"))
+            parts.append(chunk)
+        parts.append(self._image if image1 is None else image1)
+        parts.append(self._suffix)
+        return b"".join(parts)
+
+    def render_notice(self, *values, image1=None):
+        return self.render(*values, image1=image1)[self._notice_start:-self._notice_tail]
+
+    def render_parts(self, transaction_number, registration_number, equipment_id, violation_time, action_time,
+                     image1=None):
+        # The payload as (head, image, tail) for senders that stream it rather than
+        # join it; the image buffer is passed through without being copied
+        values = [
+            value.encode("utf-8")
+            for value in (transaction_number, registration_number, equipment_id, violation_time, action_time)
+        ]
+        if isinstance(image1, str):
+            image1 = image1.encode("ascii")
+        head = bytearray(self._prefix)
+        for (start, end), value in zip(self._slots, values):
+            if len(value) != end - start or not JSON_PLAIN.fullmatch(value):
+                return (self._render_slow(values, image1),)
+            head[start:end] = value
+        return bytes(head), self._image if image1 is None else image1, self._suffix
+
+    def render_notice_parts(self, *values, image1=None):
+        parts = self.render_parts(*values, image1=image1)
+        if len(parts) == 1:
+            return (parts[0][self._notice_start:-self._notice_tail],)
+        head, image, tail = parts
+        return head[self._notice_start:], image, tail[:-self._notice_tail]
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_template(offence_id, identity_items, image1):
+    return PayloadTemplate(offence_id, dict(identity_items), image1)
+
+
+def compile_template(offence_id, identity, image1=IMAGE1):
+    return _compile_template(offence_id, tuple(sorted(identity.items())), image1)
+
+
+class IdentitiesExhausted(Exception):
+    pass
+
+
+# Ends a run the same way as running out of identities
+class IdRangeExhausted(IdentitiesExhausted):
+    pass
+
+
+class NoticeFactory:
+    # With identities (an iterator of identity dicts, e.g. an IdentityImport), every
+    # notice takes the next identity and IdentitiesExhausted ends the run
+    def __init__(self, offence_id, identity, images=None, ids=None, identities=None):
+        self.offence_id = offence_id
+        self.template = compile_template(offence_id, identity) if identities is None else None
+        self.images = images
+        self.ids = ids if ids is not None else id_generator()
+        self.identities = identities
+        self.identities_lock = threading.Lock()
+        self.violation_time, self.action_time = auto_dates()
+
+    def next_template(self):
+        if self.identities is None:
+            return self.template
+        with self.identities_lock:
+            identity = next(self.identities, None)
+        if identity is None:
+            raise IdentitiesExhausted()
+        return compile_template(self.offence_id, identity)
+
+    def render(self):
+        template = self.next_template()
+        image1 = self.images.next_image() if self.images is not None else None
+        return template.render(*self.ids.next_ids(), self.violation_time, self.action_time, image1=image1)
+
+    def render_payload(self):
+        template = self.next_template()
+        ids = self.ids.next_ids()
+        image1 = self.images.next_image() if self.images is not None else None
+        return ids, template.render(*ids, self.violation_time, self.action_time, image1=image1)
+
+    def render_notice(self):
+        template = self.next_template()
+        ids = self.ids.next_ids()
+        image1 = self.images.next_image() if self.images is not None else None
+        return ids, template.render_notice(*ids, self.violation_time, self.action_time, image1=image1)
+
+    def render_payload_parts(self):
+        template = self.next_template()
+        ids = self.ids.next_ids()
+        image1 = self.images.next_image() if self.images is not None else None
+        return ids, template.render_parts(*ids, self.violation_time, self.action_time, image1=image1)
+
+    def render_send(self):
+        # render_payload_parts plus the fields a SendCapture records for the notice
+        template = self.next_template()
+        ids = self.ids.next_ids()
+        image_name, image1 = self.images.next_named() if self.images is not None else (None, None)
+        parts = template.render_parts(*ids, self.violation_time, self.action_time, image1=image1)
+        fields = capture_fields(
+            self.offence_id, template.identity, [ids + (self.violation_time, self.action_time, image_name)]
+        )
+        return ids, parts, fields
+
+
+# Multi-notice batching: notices accumulate until the batch reaches max_count
+# notices, max_bytes of body or has been open for max_wait seconds
+class NoticeBatch:
+    def __init__(self, transaction_numbers, body, reason):
+        self.transaction_numbers = transaction_numbers
+        self.body = body
+        self.reason = reason
+
+    def __len__(self):
+        return len(self.transaction_numbers)
+
+
+class NoticeBatcher:
+    def __init__(self, on_batch, max_count=50, max_bytes=1024 * 1024, max_wait=1.0):
+        self.on_batch = on_batch
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.max_wait = max_wait
+        self._transaction_numbers = []
+        self._notices = []
+        self._bytes = len(EMPTY_PAYLOAD)
+        self._deadline = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._timer = threading.Thread(target=self._timer_loop, name="yarc-batch-timer", daemon=True)
+        self._timer.start()
+
+    def add(self, transaction_number, notice):
+        batches = []
+        with self._cond:
+            if self._notices and self._bytes + len(notice) + 2 > self.max_bytes:
+                batches.append(self._take("bytes"))
+            if not self._notices:
+                self._deadline = time.monotonic() + self.max_wait
+                self._cond.notify()
+            self._transaction_numbers.append(transaction_number)
+            self._notices.append(notice)
+            self._bytes += len(notice) + 2
+            if len(self._notices) >= self.max_count:
+                batches.append(self._take("count"))
+            elif self._bytes >= self.max_bytes:
+                batches.append(self._take("bytes"))
+        for batch in batches:
+            self.on_batch(batch)
+
+    def _take(self, reason):
+        batch = NoticeBatch(self._transaction_numbers, batch_body(self._notices), reason)
+        self._transaction_numbers = []
+        self._notices = []
+        self._bytes = len(EMPTY_PAYLOAD)
+        self._deadline = None
+        return batch
+
+    def _timer_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and (self._deadline is None or time.monotonic() < self._deadline):
+                    timeout = None if self._deadline is None else self._deadline - time.monotonic()
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+                batch = self._take("timer")
+            self.on_batch(batch)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            batch = self._take("flush") if self._notices else None
+            self._cond.notify()
+        self._timer.join()
+        if batch is not None:
+            self.on_batch(batch)
+
+
+def map_batch_response(transaction_numbers, parsed):
+    # Map a batched pushdata response back to its notices: per-item results are
+    # matched by transactionNo, then by position; otherwise every notice gets the whole body
+    items = None
+    if isinstance(parsed, list):
+        items = parsed
+    elif isinstance(parsed, dict):
+        items = next((value for value in parsed.values() if isinstance(value, list)), None)
+    if items is not None:
+        by_transaction = {
+            item["transactionNo"]: item
+            for item in items
+            if isinstance(item, dict) and "transactionNo" in item
+        }
+        if by_transaction:
+            return {number: by_transaction.get(number) for number in transaction_numbers}
+        if len(items) == len(transaction_numbers):
+            return dict(zip(transaction_numbers, items))
+    return {number: parsed for number in transaction_numbers}
+
+
+# Evidence image corpus: files are memory-mapped and base64-encoded on demand,
+# encoded forms live in an LRU cache bounded by total size
+class ImageCorpus:
+    EXTENSIONS = (".jpg", ".jpeg")
+
+    def __init__(self, directory, cache_bytes=64 * 1024 * 1024, order="round-robin", seed=None):
+        self.directory = directory
+        self.paths = sorted(
+            entry.path for entry in os.scandir(directory)
+            if entry.is_file() and entry.name.lower().endswith(self.EXTENSIONS)
+        )
+        if not self.paths:
+            raise ValueError(f"No JPEG images found in {directory}")
+        self._known = set(self.paths)
+        if order not in ("round-robin", "random"):
+            raise ValueError(f"Unknown image order: {order}")
+        self.order = order
+        self.cache_bytes = cache_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = collections.OrderedDict()
+        self._cached_bytes = 0
+        self._counter = itertools.count()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def next_image(self):
+        return self.next_named()[1]
+
+    def next_named(self):
+        # (file name, encoded image); captures refer to images by name
+        if self.order == "random":
+            with self._lock:
+                index = self._random.randrange(len(self.paths))
+        else:
+            index = next(self._counter) % len(self.paths)
+        path = self.paths[index]
+        return os.path.basename(path), self.encoded(path)
+
+    def named(self, name):
+        # The encoded image with this file name, or None if the corpus has none
+        path = os.path.join(self.directory, os.path.basename(name))
+        return self.encoded(path) if path in self._known else None
+
+    def encoded(self, path):
+        with self._lock:
+            data = self._cache.get(path)
+            if data is not None:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return data
+            self.misses += 1
+        data = self._encode(path)
+        if len(data) <= self.cache_bytes:
+            with self._lock:
+                if path not in self._cache:
+                    self._cache[path] = data
+                    self._cached_bytes += len(data)
+                while self._cached_bytes > self.cache_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_bytes -= len(evicted)
+                    self.evictions += 1
+        return data
+
+    @staticmethod
+    def _encode(path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return base64.b64encode(mapped)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "images": len(self.paths),
+                "cached": len(self._cache),
+                "cached_bytes": self._cached_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Evidence images for shard processes: the parent base64-encodes the whole corpus
+# once into a shared memory block, and each shard serves memoryview slices of it
+# without copying. Pickling sends only the block's name and the slice index
+class SharedImages:
+    def __init__(self, name, index, order="round-robin", seed=None, owner=False, names=None):
+        from multiprocessing import shared_memory
+        self.name = name
+        self.index = index
+        self.names = names or [None] * len(index)
+        self.order = order
+        self.seed = seed
+        self.owner = owner
+        self.served = 0
+        self._memory = shared_memory.SharedMemory(name=name)
+        self._buffer = self._memory.buf
+        self._counter = itertools.count()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        from multiprocessing import shared_memory
+        encoded = [ImageCorpus._encode(path) for path in corpus.paths]
+        size = sum(len(data) for data in encoded)
+        if size > corpus.cache_bytes:
+            raise ValueError(
+                f"Encoded images need {size / 1048576:.1f} MB of shared memory, over the "
+                f"{corpus.cache_bytes / 1048576:.1f} MB image cache limit"
+            )
+        memory = shared_memory.SharedMemory(create=True, size=max(1, size))
+        index = []
+        offset = 0
+        for data in encoded:
+            memory.buf[offset:offset + len(data)] = data
+            index.append((offset, len(data)))
+            offset += len(data)
+        name = memory.name
+        memory.close()
+        return cls(name, index, corpus.order, owner=True, names=[os.path.basename(path) for path in corpus.paths])
+
+    def __reduce__(self):
+        return SharedImages, (self.name, self.index, self.order, self.seed, False, self.names)
+
+    def __len__(self):
+        return len(self.index)
+
+    def next_image(self):
+        return self.next_named()[1]
+
+    def next_named(self):
+        with self._lock:
+            if self.order == "random":
+                position = self._random.randrange(len(self.index))
+            else:
+                position = next(self._counter) % len(self.index)
+            self.served += 1
+        offset, length = self.index[position]
+        return self.names[position], self._buffer[offset:offset + length]
+
+    def stats(self):
+        size = sum(length for _, length in self.index)
+        return {
+            "images": len(self.index),
+            "cached": len(self.index),
+            "cached_bytes": size,
+            "hits": self.served,
+            "misses": 0,
+            "evictions": 0,
+            "hit_rate": 1.0 if self.served else 0.0,
+        }
+
+    def close(self):
+        self._buffer = None
+        self._memory.close()
+        if self.owner:
+            self._memory.unlink()
+
+
+# Latency metrics: every send is recorded into fixed-size log-bucketed
+# histograms, one per URL type and phase, plus status class counters
+class LatencyHistogram:
+    def __init__(self, min_value=1e-5, max_value=120.0, growth=1.02):
+        self.min_value = min_value
+        self.max_value = max_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.counts = [0] * (int(math.ceil(math.log(max_value / min_value) / self._log_growth)) + 2)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        if value < self.min_value:
+            return 0
+        return min(len(self.counts) - 1, int(math.log(value / self.min_value) / self._log_growth) + 1)
+
+    def record(self, value):
+        self.counts[self._bucket(value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if index == len(self.counts) - 1:
+                    # The overflow bucket has no upper bound of its own
+                    return self.max
+                upper = self.min_value * self.growth ** index
+                return max(self.min, min(self.max, upper))
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class Metrics:
+    # queue is the wait between a send's scheduled time and its dispatch (rate mode)
+    PHASES = ["queue", "dns", "connect", "tls", "ttfb", "total"]
+    QUANTILES = [50, 90, 99, 99.9]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.status_counts = {}
+
+    # Shard processes send their metrics back pickled; the lock is not sent
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def observe(self, url_type, status_code, total, timings=None):
+        key = status_class(status_code) if status_code is not None else "error"
+        with self.lock:
+            self.status_counts[(url_type, key)] = self.status_counts.get((url_type, key), 0) + 1
+            phases = dict(timings or {})
+            phases["total"] = total
+            for phase, value in phases.items():
+                histogram = self.histograms.get((url_type, phase))
+                if histogram is None:
+                    histogram = self.histograms[(url_type, phase)] = LatencyHistogram()
+                histogram.record(value)
+
+    def merge(self, other):
+        with self.lock:
+            for key, count in other.status_counts.items():
+                self.status_counts[key] = self.status_counts.get(key, 0) + count
+            for key, histogram in other.histograms.items():
+                if key not in self.histograms:
+                    self.histograms[key] = LatencyHistogram()
+                self.histograms[key].merge(histogram)
+
+    def histogram(self, url_type, phase="total"):
+        with self.lock:
+            return self.histograms.get((url_type, phase)) or LatencyHistogram()
+
+    def _ordered_histograms(self):
+        order = {phase: index for index, phase in enumerate(self.PHASES)}
+        return sorted(self.histograms.items(), key=lambda item: (item[0][0], order.get(item[0][1], len(order))))
+
+    def to_csv(self):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(
+            ["url_type", "metric", "count", "mean_ms", "min_ms"]
+            + [f"p{q:g}_ms" for q in self.QUANTILES]
+            + ["max_ms"]
+        )
+        with self.lock:
+            for (url_type, phase), histogram in self._ordered_histograms():
+                writer.writerow(
+                    [url_type, phase, histogram.count, f"{histogram.mean * 1000:.3f}", f"{histogram.min * 1000:.3f}"]
+                    + [f"{histogram.percentile(q) * 1000:.3f}" for q in self.QUANTILES]
+                    + [f"{histogram.max * 1000:.3f}"]
+                )
+            for (url_type, key), count in sorted(self.status_counts.items()):
+                writer.writerow([url_type, f"status_{key}", count] + [""] * (len(self.QUANTILES) + 3))
+        return output.getvalue()
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP yarc_request_duration_seconds Pushdata request latency by phase.",
+            "# TYPE yarc_request_duration_seconds summary",
+        ]
+        with self.lock:
+            for (url_type, phase), histogram in self._ordered_histograms():
+                labels = f'url_type="{url_type}",phase="{phase}"'
+                for q in self.QUANTILES:
+                    lines.append(
+                        f'yarc_request_duration_seconds{{{labels},quantile="{q / 100:g}"}} {histogram.percentile(q):.6f}'
+                    )
+                lines.append(f"yarc_request_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"yarc_request_duration_seconds_count{{{labels}}} {histogram.count}")
+            lines.append("# HELP yarc_requests_total Pushdata requests by status class.")
+            lines.append("# TYPE yarc_requests_total counter")
+            for (url_type, key), count in sorted(self.status_counts.items()):
+                lines.append(f'yarc_requests_total{{url_type="{url_type}",status_class="{key}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_csv()
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+
+
+def status_class(status_code):
+    return f"{status_code // 100}xx"
+
+
+# Fixed-size lock-free ring of recent send results. Writers claim a slot with
+# next() on an itertools.count, which is atomic under the GIL, and fill it; the
+# claim is the only state writers share. Each slot records its claim index, so
+# the single reader can tell a result it has not read yet from a stale one
+class ResultRing:
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self._claims = itertools.count()
+        self.read = 0
+
+    def push(self, status_code, latency):
+        index = next(self._claims)
+        self.slots[index % self.capacity] = (index, time.perf_counter(), status_code, latency)
+
+    def drain(self):
+        # Returns (results, dropped). Scans forward from the last read index and
+        # stops at a slot whose writer has claimed it but not filled it yet. A
+        # slot already refilled by a later lap means the writers got a whole ring
+        # ahead: everything a lap behind that slot is counted as dropped. At most
+        # a ring's worth is returned per call, so busy writers cannot keep it going
+        index = self.read
+        results = []
+        while len(results) < self.capacity:
+            slot = self.slots[index % self.capacity]
+            if slot is None or slot[0] < index:
+                break
+            if slot[0] == index:
+                results.append(slot)
+                index += 1
+            else:
+                index = max(index + 1, slot[0] - self.capacity + 1)
+        dropped = index - self.read - len(results)
+        self.read = index
+        return results, dropped
+
+
+# Per-second buckets of drained results: rolling throughput and status-class
+# rates over `window` seconds and mean latency per second for `history` seconds.
+# A snapshot touches at most `history` buckets, however many sends were made
+class RollingStats:
+    CLASSES = ["2xx", "3xx", "4xx", "5xx", "error"]
+
+    def __init__(self, window=5, history=60):
+        self.window = window
+        self.history = history
+        self.buckets = collections.deque()  # [second, count, {status code: count}, latency sum]
+        self.started = None
+        self.total = 0
+        self.dropped = 0
+
+    def add(self, results, dropped=0):
+        self.dropped += dropped
+        if not results:
+            return
+        if self.started is None:
+            self.started = results[0][1]
+        bucket = None
+        for _, finished, status_code, latency in results:
+            second = int(finished)
+            if bucket is None or bucket[0] != second:
+                bucket = self._bucket(second)
+            # Counted by status code here; snapshot() folds codes into classes
+            bucket[1] += 1
+            bucket[2][status_code] = bucket[2].get(status_code, 0) + 1
+            bucket[3] += latency
+        self.total += len(results)
+        while self.buckets and self.buckets[0][0] <= self.buckets[-1][0] - self.history:
+            self.buckets.popleft()
+
+    def _bucket(self, second):
+        if self.buckets and self.buckets[-1][0] == second:
+            return self.buckets[-1]
+        if not self.buckets or self.buckets[-1][0] < second:
+            self.buckets.append([second, 0, {}, 0.0])
+            return self.buckets[-1]
+        # A late result from an earlier second goes into that second's bucket,
+        # inserted in order if it had none. One older than every bucket kept is
+        # folded into the oldest, so the buckets still account for it
+        for position in range(len(self.buckets) - 1, -1, -1):
+            if self.buckets[position][0] == second:
+                return self.buckets[position]
+            if self.buckets[position][0] < second:
+                self.buckets.insert(position + 1, [second, 0, {}, 0.0])
+                return self.buckets[position + 1]
+        return self.buckets[0]
+
+    def snapshot(self, now=None):
+        now = time.perf_counter() if now is None else now
+        since = now - self.window
+        count = 0
+        classes = dict.fromkeys(self.CLASSES, 0)
+        for second, bucket_count, bucket_codes, _ in self.buckets:
+            if second + 1 > since:
+                count += bucket_count
+                for status_code, value in bucket_codes.items():
+                    key = status_class(status_code) if status_code is not None else "error"
+                    classes[key] = classes.get(key, 0) + value
+        # The first second of a run counts as a whole one so a single send is not a spike
+        span = max(1.0, min(self.window, now - self.started)) if self.started is not None else self.window
+        means = {bucket[0]: bucket[3] / bucket[1] for bucket in self.buckets if bucket[1]}
+        latest = int(now)
+        return {
+            "rps": count / span,
+            "total": self.total,
+            "dropped": self.dropped,
+            "rates": {key: value / count if count else 0.0 for key, value in classes.items()},
+            "latency": [means.get(second) for second in range(latest - self.history + 1, latest + 1)],
+        }
+
+
+SPARK_BLOCKS = "\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+
+
+def sparkline(values):
+    # One block character per value scaled to the largest; missing values are blank
+    present = [value for value in values if value is not None]
+    top = max(present) if present else 0.0
+    if top <= 0:
+        return "".join(" " if value is None else SPARK_BLOCKS[0] for value in values)
+    last = len(SPARK_BLOCKS) - 1
+    return "".join(
+        " " if value is None else SPARK_BLOCKS[min(last, int(value / top * last + 0.5))]
+        for value in values
+    )
+
+
+# Opt-in phase profiling. Send paths time their phases and hand them to the
+# active profiler if there is one; with profiling off that costs a perf_counter()
+# call and a None check per phase. Spans are appended to a list, which is safe
+# from any thread under the GIL, and exported in the Chrome trace event format
+# (chrome://tracing, Perfetto, speedscope)
+_profiler = None
+
+
+def active_profiler():
+    return _profiler
+
+
+class Profiler:
+    PHASES = ["build", "send", "parse", "format", "render", "dashboard"]
+
+    def __init__(self, cpu=False, memory=False):
+        self.cpu = cpu
+        self.memory = memory
+        self.spans = []
+        self.thread_names = {}
+        self.profiles = []
+        self.origin = None
+        self.stopped = None
+        self.memory_top = None
+        self.memory_peak = None
+
+    def start(self):
+        global _profiler
+        self.origin = time.perf_counter()
+        if self.memory:
+            tracemalloc.start()
+        if self.cpu:
+            # cProfile only sees the thread that enables it, so every thread
+            # started from now on enables a profile of its own on its first event
+            threading.setprofile(self._profile_thread)
+            self._profile_thread()
+        _profiler = self
+        return self
+
+    def _profile_thread(self, *args):
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        self.profiles.append(profile)
+        profile.enable()
+
+    def stop(self):
+        global _profiler
+        if _profiler is self:
+            _profiler = None
+        self.stopped = time.perf_counter()
+        if self.cpu:
+            threading.setprofile(None)
+            for profile in self.profiles:
+                profile.disable()
+        if self.memory:
+            _, self.memory_peak = tracemalloc.get_traced_memory()
+            self.memory_top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            tracemalloc.stop()
+
+    def span(self, name, start, end=None, args=None):
+        thread = threading.current_thread()
+        if thread.ident not in self.thread_names:
+            self.thread_names[thread.ident] = thread.name
+        self.spans.append((name, thread.ident, start, (end or time.perf_counter()) - start, args))
+
+    def phases(self):
+        histograms = {}
+        for name, _, _, duration, _ in self.spans:
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = LatencyHistogram()
+            histogram.record(duration)
+        order = {phase: index for index, phase in enumerate(self.PHASES)}
+        return sorted(histograms.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))
+
+    def summary(self, top=15):
+        lines = [f"{'Phase':<12} {'count':>8} {'total ms':>10} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}"]
+        for name, histogram in self.phases():
+            lines.append(
+                f"{name:<12} {histogram.count:>8} {histogram.sum * 1000:>10.1f} {histogram.mean * 1000:>9.3f} "
+                f"{histogram.percentile(50) * 1000:>9.3f} {histogram.percentile(99) * 1000:>9.3f}"
+            )
+        if self.profiles:
+            output = io.StringIO()
+            stats = pstats.Stats(*self.profiles, stream=output)
+            stats.sort_stats("cumulative").print_stats(top)
+            lines.append(output.getvalue().rstrip())
+        if self.memory_top is not None:
+            lines.append(f"Peak traced memory: {self.memory_peak / 1048576:.1f} MiB; largest allocation sites:")
+            lines.extend(f"  {statistic}" for statistic in self.memory_top)
+        return "\n".join(lines)
+
+    def trace_events(self):
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+            for ident, name in self.thread_names.items()
+        ]
+        for name, ident, start, duration, args in self.spans:
+            event = {
+                "name": name, "cat": "yarc", "ph": "X", "pid": pid, "tid": ident,
+                "ts": round((start - self.origin) * 1e6, 3), "dur": round(duration * 1e6, 3),
+            }
+            if args:
+                event["args"] = args
+            events.append(event)
+        return events
+
+    def write(self, path):
+        # The trace goes to `path`, the text summary next to it and, with
+        # cpu profiling, the merged cProfile stats to `path`.prof
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+        with open(path + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.summary() + "\n")
+        if self.profiles:
+            pstats.Stats(*self.profiles).dump_stats(path + ".prof")
+
+
+def phase_args(timings):
+    # Trace event arguments for a send's connection phases, in milliseconds
+    if not timings:
+        return None
+    return {f"{phase}_ms": round(seconds * 1000, 3) for phase, seconds in timings.items()}
+
+
+def env_flag(name):
+    return os.environ.get(name, "") not in ("", "0")
+
+
+def profiler_from_env():
+    # YARC_PROFILE=trace.json turns profiling on, YARC_PROFILE_CPU=1 and
+    # YARC_PROFILE_MEMORY=1 add cProfile and tracemalloc
+    path = os.environ.get("YARC_PROFILE")
+    if not path:
+        return None, None
+    return Profiler(cpu=env_flag("YARC_PROFILE_CPU"), memory=env_flag("YARC_PROFILE_MEMORY")), path
+
+
+# Per-phase timings of the current request on this thread, filled in by the
+# counting connection classes below
+_phase_timings = threading.local()
+
+
+def record_phase(phase, seconds):
+    timings = getattr(_phase_timings, "current", None)
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+# Resolved addresses are kept for DNS_TTL seconds, shared by both transports.
+# getaddrinfo does not report the record's own TTL, so this is a fixed bound
+DNS_TTL = 60.0
+
+
+class DnsCache:
+    def __init__(self, ttl=DNS_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, host, port):
+        with self.lock:
+            entry = self.entries.get((host, port))
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def store(self, host, port, addresses):
+        with self.lock:
+            self.entries[(host, port)] = (time.monotonic() + self.ttl, list(addresses))
+        return addresses
+
+    def resolve(self, host, port):
+        addresses = self.lookup(host, port)
+        if addresses is None:
+            addresses = self.store(host, port, socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+        return addresses
+
+    def prefer(self, host, port, address):
+        # Move the address that last connected to the front, so dual-stack hosts
+        # do not retry a refused address on every new connection
+        with self.lock:
+            entry = self.entries.get((host, port))
+            if entry is not None and entry[1] and entry[1][0] != address:
+                self.entries[(host, port)] = (entry[0], sorted(entry[1], key=lambda item: item != address))
+
+    def forget(self, host, port):
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+@functools.lru_cache(maxsize=None)
+def dns_cache():
+    return DnsCache()
+
+
+# TLS sessions are kept per server name and offered on the next handshake with
+# that server, so reconnects and pool growth resume instead of doing a full
+# handshake. TLS 1.3 tickets arrive after the handshake, so the session is read
+# from the newest live connection when the next one is wrapped
+@functools.lru_cache(maxsize=None)
+def resuming_context_class():
+    class ResumingSSLContext(ssl.SSLContext):
+        def __init__(self, protocol):
+            self.lock = threading.Lock()
+            self.sessions = {}
+            self.latest = {}
+
+        def session(self, server_hostname):
+            with self.lock:
+                connection = self.latest.get(server_hostname)
+                try:
+                    session = connection.session if connection is not None else None
+                except (AttributeError, ValueError):
+                    session = None
+                if session is not None:
+                    self.sessions[server_hostname] = session
+                return self.sessions.get(server_hostname)
+
+        def remember(self, server_hostname, connection):
+            with self.lock:
+                self.latest[server_hostname] = connection
+
+        def wrap_socket(self, sock, *args, session=None, **kwargs):
+            server_hostname = kwargs.get("server_hostname")
+            connection = super().wrap_socket(
+                sock, *args, session=session or self.session(server_hostname), **kwargs
+            )
+            self.remember(server_hostname, connection)
+            return connection
+
+        def wrap_bio(self, incoming, outgoing, *args, session=None, **kwargs):
+            server_hostname = kwargs.get("server_hostname")
+            connection = super().wrap_bio(
+                incoming, outgoing, *args, session=session or self.session(server_hostname), **kwargs
+            )
+            self.remember(server_hostname, connection)
+            return connection
+
+    return ResumingSSLContext
+
+
+def tls_context(cafile=None, check_hostname=True):
+    context = resuming_context_class()(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = check_hostname
+    if cafile:
+        context.load_verify_locations(cafile)
+    else:
+        context.load_default_certs()
+    return context
+
+
+def settle_tls(sock, timeout):
+    # TLS 1.3 servers send session tickets just after the handshake. A connection
+    # opened ahead of use reads them here: until then it looks readable, which the
+    # pool takes for a dropped connection, and there is no ticket to resume with.
+    # Returns False when the server closed or sent data, i.e. it is not reusable
+    if getattr(sock, "version", lambda: None)() != "TLSv1.3":
+        return True
+    previous = sock.gettimeout()
+    wait = timeout
+    try:
+        while urllib3.util.wait.wait_for_read(sock, timeout=wait):
+            sock.setblocking(False)
+            try:
+                sock.recv(1)
+            except ssl.SSLWantReadError:
+                wait = 0
+                continue
+            return False
+    except OSError:
+        return False
+    finally:
+        sock.settimeout(previous)
+    return True
+
+
+# Request body modes, chosen per URL type. "buffered" joins a payload's parts
+# into one bytes object; "stream" sends the parts in BODY_CHUNK slices with a
+# Content-Length, so the image goes out of its cached encoded buffer; "gzip"
+# compresses the slices as they are sent, with chunked transfer encoding and
+# Content-Encoding: gzip. A URL type whose server refuses gzip (411 or 415) is
+# switched to "stream" and the send is repeated uncompressed
+BODY_MODES = ["buffered", "stream", "gzip"]
+DEFAULT_BODY_MODES = {url_type: "buffered" for url_type, _, _, _ in URL_TYPES}
+BODY_CHUNK = 64 * 1024
+# Base64 images gain almost all of their compression from entropy coding, so a
+# fast level and a 4 KB window lose ~1% of ratio against the defaults while
+# cutting the compressor's state from ~256 KB to ~32 KB per request
+GZIP_LEVEL = 1
+GZIP_WBITS = 12
+GZIP_MEM_LEVEL = 5
+GZIP_CHUNK = 16 * 1024
+GZIP_REFUSED = frozenset([411, 415])
+GZIP_HEADERS = dict(JSON_HEADERS, **{"Content-Encoding": "gzip"})
+
+
+class StreamedBody:
+    def __init__(self, parts, chunk=BODY_CHUNK):
+        self.parts = parts
+        self.chunk = chunk
+        self.size = sum(memoryview(part).nbytes for part in parts)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for part in self.parts:
+            view = memoryview(part).cast("B")
+            for start in range(0, len(view), self.chunk):
+                yield view[start:start + self.chunk]
+
+
+# No __len__, so requests sends it chunked
+class GzipBody:
+    def __init__(self, parts, level=GZIP_LEVEL):
+        self.parts = parts
+        self.level = level
+
+    def __iter__(self):
+        # wbits + 16 selects the gzip container
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS + 16, GZIP_MEM_LEVEL)
+        # Smaller slices keep zlib's output buffers small
+        for chunk in StreamedBody(self.parts, GZIP_CHUNK):
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def encode_body(parts, mode="buffered"):
+    if mode == "gzip":
+        return GzipBody(parts), GZIP_HEADERS
+    if mode == "stream":
+        return StreamedBody(parts), JSON_HEADERS
+    return b"".join(parts), JSON_HEADERS
+
+
+class BodyModes:
+    def __init__(self, modes=None):
+        self.modes = dict(DEFAULT_BODY_MODES, **(modes or {}))
+        self.fallbacks = {}
+        self.lock = threading.Lock()
+
+    def __reduce__(self):
+        return BodyModes, (self.modes,)
+
+    def mode(self, url_type):
+        return self.modes.get(url_type, "buffered")
+
+    def set(self, url_type, mode):
+        if mode not in BODY_MODES:
+            raise ValueError(f"Unknown body mode: {mode}")
+        with self.lock:
+            self.modes[url_type] = mode
+
+    def refused(self, url_type):
+        with self.lock:
+            if self.modes.get(url_type) == "gzip":
+                self.modes[url_type] = "stream"
+                self.fallbacks[url_type] = self.fallbacks.get(url_type, 0) + 1
+
+    def stats(self, url_type):
+        with self.lock:
+            return {"mode": self.modes.get(url_type, "buffered"), "fallbacks": self.fallbacks.get(url_type, 0)}
+
+
+def post_parts(session, url, parts, url_type=None, body_modes=None, **kwargs):
+    # One POST of a payload given as parts, in the URL type's body mode
+    mode = body_modes.mode(url_type) if body_modes is not None else "buffered"
+    body, headers = encode_body(parts, mode)
+    response = session.post(url, data=body, headers=headers, **kwargs)
+    if mode == "gzip" and response.status_code in GZIP_REFUSED:
+        response.close()
+        body_modes.refused(url_type)
+        body, headers = encode_body(parts, "stream")
+        response = session.post(url, data=body, headers=headers, **kwargs)
+    return response
+
+
+# Pooled keep-alive HTTP sessions, one per URL type
+class ConnectionCounters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.prewarmed = 0
+        self.tls_resumed = 0
+        self.bytes_sent = 0
+
+    def add_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def add_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def add_prewarmed(self):
+        with self.lock:
+            self.prewarmed += 1
+
+    def add_tls_resumed(self):
+        with self.lock:
+            self.tls_resumed += 1
+
+    def add_sent(self, size):
+        with self.lock:
+            self.bytes_sent += size
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                # A send on a pre-warmed connection did not pay for opening it
+                "reused": max(0, self.requests - self.connections + self.prewarmed),
+                "prewarmed": self.prewarmed,
+                "tls_resumed": self.tls_resumed,
+                # Request line, headers and body as written to the socket, before TLS
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+# The DNS cache and pre-warming reach into urllib3 2.x and requests >= 2.32.2
+# internals; on older releases sends fall back to urllib3's own connect and
+# pre-warming does nothing
+@functools.lru_cache(maxsize=None)
+def transport_features():
+    connection = urllib3.connection.HTTPConnection
+    dns_cache = hasattr(urllib3.exceptions, "NameResolutionError") and hasattr(connection, "is_connected")
+    prewarm = (
+        dns_cache
+        and hasattr(requests.adapters.HTTPAdapter, "get_connection_with_tls_context")
+        and hasattr(urllib3.HTTPConnectionPool, "_get_conn")
+        and hasattr(urllib3.HTTPConnectionPool, "_put_conn")
+    )
+    return {"dns_cache": dns_cache, "prewarm": prewarm}
+
+
+def counting_pool_class(pool_class, counters):
+    connection_class = pool_class.ConnectionCls
+    tls = pool_class.scheme == "https"
+
+    def _new_conn(self):
+        # Connects to the cached addresses of the host in turn; self.host stays
+        # the name, which TLS uses for SNI and certificate checks
+        host, port = self._dns_host, self.port
+        start = time.perf_counter()
+        try:
+            addresses = dns_cache().resolve(host, port)
+        except socket.gaierror as e:
+            raise urllib3.exceptions.NameResolutionError(self.host, self, e) from e
+        record_phase("dns", time.perf_counter() - start)
+        start = time.perf_counter()
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address[4][0]
+                try:
+                    sock = connection_class._new_conn(self)
+                except urllib3.exceptions.ConnectTimeoutError:
+                    if index == len(addresses) - 1:
+                        dns_cache().forget(host, port)
+                        raise
+                else:
+                    dns_cache().prefer(host, port, address)
+                    break
+        finally:
+            self._dns_host = host
+        self.connect_time = time.perf_counter() - start
+        record_phase("connect", self.connect_time)
+        return sock
+
+    def connect(self):
+        counters.add_connection()
+        self.connect_time = 0.0
+        start = time.perf_counter()
+        connection_class.connect(self)
+        if tls:
+            record_phase("tls", time.perf_counter() - start - self.connect_time)
+            if getattr(self.sock, "session_reused", False):
+                counters.add_tls_resumed()
+
+    def send(self, data):
+        connection_class.send(self, data)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            counters.add_sent(memoryview(data).nbytes)
+
+    methods = {"connect": connect, "send": send}
+    if transport_features()["dns_cache"]:
+        methods["_new_conn"] = _new_conn
+    counting_connection = type("Counting" + connection_class.__name__, (connection_class,), methods)
+    return type("Counting" + pool_class.__name__, (pool_class,), {"ConnectionCls": counting_connection})
+
+
+# Built on first use so that importing this module does not load requests
+@functools.lru_cache(maxsize=None)
+def counting_adapter_class():
+    class CountingAdapter(requests.adapters.HTTPAdapter):
+        def __init__(self, counters, ssl_context=None, **kwargs):
+            self.counters = counters
+            self.ssl_context = ssl_context
+            super().__init__(**kwargs)
+
+        def init_poolmanager(self, *args, **kwargs):
+            if self.ssl_context is not None:
+                kwargs["ssl_context"] = self.ssl_context
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": counting_pool_class(urllib3.HTTPConnectionPool, self.counters),
+                "https": counting_pool_class(urllib3.HTTPSConnectionPool, self.counters),
+            }
+
+        def cert_verify(self, conn, url, verify, cert):
+            super().cert_verify(conn, url, verify, cert)
+            # The shared context already holds the default bundle; naming it again
+            # would make every new connection parse the whole bundle
+            if self.ssl_context is not None and conn.ca_certs == requests.utils.DEFAULT_CA_BUNDLE_PATH:
+                conn.ca_certs = None
+
+        def send(self, request, **kwargs):
+            self.counters.add_request()
+            timings = _phase_timings.current = {}
+            start = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            finally:
+                _phase_timings.current = None
+            timings["ttfb"] = time.perf_counter() - start
+            response.timings = timings
+            return response
+
+    return CountingAdapter
+
+
+class SessionPool:
+    def __init__(self, pool_size=10, keep_alive=True):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.counters = {}
+        self.ssl_context = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, url_type):
+        with self._lock:
+            session = self._sessions.get(url_type)
+            if session is None:
+                if self.ssl_context is None:
+                    self.ssl_context = tls_context(requests.utils.DEFAULT_CA_BUNDLE_PATH, check_hostname=False)
+                counters = self.counters.setdefault(url_type, ConnectionCounters())
+                adapter = counting_adapter_class()(
+                    counters, self.ssl_context, pool_connections=1, pool_maxsize=self.pool_size, pool_block=True
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                if not self.keep_alive:
+                    session.headers["Connection"] = "close"
+                self._sessions[url_type] = session
+            return session
+
+    def post(self, url_type, url, **kwargs):
+        return self.session(url_type).post(url, **kwargs)
+
+    def prewarm(self, url_type, url, connections=1):
+        # Resolves, connects and handshakes in the background and leaves the
+        # connections idle in the pool for the next sends. Connections that are
+        # already open and alive are kept as they are, so calling this on a timer
+        # keeps a warm standby without opening more. Returns a futures.Future of
+        # the first new connection's phase timings
+        future = futures.Future()
+
+        def run():
+            try:
+                future.set_result(self._prewarm(url_type, url, connections))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="yarc-prewarm", daemon=True).start()
+        return future
+
+    def _prewarm(self, url_type, url, connections):
+        if not transport_features()["prewarm"]:
+            return None
+        session = self.session(url_type)
+        adapter = session.get_adapter(url)
+        verify = session.merge_environment_settings(url, {}, None, None, None)["verify"]
+        started = time.perf_counter()
+        try:
+            pool = adapter.get_connection_with_tls_context(requests.Request("POST", url).prepare(), verify)
+            adapter.cert_verify(pool, url, verify, None)
+        except (requests.RequestException, ValueError, OSError):
+            return None
+        taken = []
+        try:
+            while len(taken) < min(connections, self.pool_size):
+                taken.append(pool._get_conn(timeout=0))
+        except (urllib3.exceptions.EmptyPoolError, urllib3.exceptions.ClosedPoolError):
+            # Every connection is out sending, or the pool is being closed
+            pass
+        cold = [conn for conn in taken if not conn.is_connected]
+        timings = {}
+
+        def connect(conn, timings):
+            _phase_timings.current = timings
+            try:
+                conn.connect()
+                # Tickets come about a round trip after the handshake
+                if settle_tls(conn.sock, min(1.0, max(0.05, 2 * timings.get("tls", 0.0)))):
+                    adapter.counters.add_prewarmed()
+                else:
+                    conn.close()
+            except (urllib3.exceptions.HTTPError, OSError):
+                conn.close()
+            finally:
+                _phase_timings.current = None
+
+        try:
+            # The first connection fills the DNS cache and the TLS session the
+            # others resume from
+            if cold:
+                connect(cold[0], timings)
+            threads = [threading.Thread(target=connect, args=(conn, {}), daemon=True) for conn in cold[1:]]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for conn in taken:
+                pool._put_conn(conn)
+        profiler = _profiler
+        if profiler is not None:
+            profiler.span("prewarm", started, args=dict(phase_args(timings) or {}, connections=len(cold)))
+        return timings
+
+    def stats(self, url_type=None):
+        if url_type is not None:
+            counters = self.counters.get(url_type)
+            return (counters or ConnectionCounters()).snapshot()
+        return {key: counters.snapshot() for key, counters in self.counters.items()}
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# asyncio transport engine
+class AsyncTransportError(Exception):
+    pass
+
+
+class AsyncResponse:
+    # complete is False when the body was cut at the client's byte cap; body_size
+    # is then the announced length, or None when the server did not send one
+    def __init__(self, url, status_code, reason, headers, content, elapsed, timings=None, complete=True,
+                 body_size=None):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+        self.timings = timings or {}
+        self.complete = complete
+        self.body_size = len(content) if complete else body_size
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncHTTPClient:
+    def __init__(self, max_connections=100, keep_alive=True):
+        self.max_connections = max_connections
+        self.keep_alive = keep_alive
+        self.counters = ConnectionCounters()
+        self.ssl_context = tls_context()
+        self._idle = {}
+        self._slots = None
+
+    async def post(self, url, body, headers=None, timeout=40, byte_cap=None):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            try:
+                return await asyncio.wait_for(self._post(url, body, headers or {}, byte_cap), timeout)
+            except asyncio.TimeoutError:
+                raise AsyncTransportError(f"Request to {url} timed out after {timeout} seconds")
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                raise AsyncTransportError(str(e) or type(e).__name__) from e
+
+    async def post_parts(self, url, parts, url_type=None, body_modes=None, timeout=40, byte_cap=None):
+        # One POST of a payload given as parts, in the URL type's body mode
+        mode = body_modes.mode(url_type) if body_modes is not None else "buffered"
+        headers = {"Content-Encoding": "gzip"} if mode == "gzip" else None
+        response = await self.post(url, encode_body(parts, mode)[0], headers, timeout, byte_cap)
+        if mode == "gzip" and response.status_code in GZIP_REFUSED:
+            body_modes.refused(url_type)
+            response = await self.post(url, encode_body(parts, "stream")[0], None, timeout, byte_cap)
+        return response
+
+    @staticmethod
+    def _endpoint(url):
+        parts = urllib.parse.urlsplit(url)
+        tls = parts.scheme == "https"
+        host = parts.hostname
+        port = parts.port or (443 if tls else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        host_header = host if parts.port is None else f"{host}:{port}"
+        return tls, host, port, path, host_header
+
+    async def prewarm(self, url, connections=1, timeout=10):
+        # Opens connections to url and parks them idle, topping up to
+        # connections live ones; returns the first new connection's phase timings
+        tls, host, port, _, _ = self._endpoint(url)
+        key = (tls, host, port)
+        live = []
+        for reader, writer in self._idle.get(key, []):
+            if writer.is_closing() or reader.at_eof():
+                writer.close()
+            else:
+                live.append((reader, writer))
+        self._idle[key] = live
+        missing = min(connections, self.max_connections) - len(live)
+        timings = {}
+
+        async def connect(timings):
+            try:
+                reader, writer, _ = await asyncio.wait_for(
+                    self._acquire(key, host, port, tls, timings, fresh=True), timeout
+                )
+            except (OSError, asyncio.TimeoutError):
+                return
+            self.counters.add_prewarmed()
+            self._release(key, reader, writer)
+
+        if missing > 0:
+            # The first connection fills the DNS cache and the TLS session the
+            # others resume from
+            await connect(timings)
+            await asyncio.gather(*(connect({}) for _ in range(missing - 1)))
+        return timings
+
+    async def _post(self, url, body, headers, byte_cap=None):
+        tls, host, port, path, host_header = self._endpoint(url)
+        head = [
+            f"POST {path} HTTP/1.1",
+            f"Host: {host_header}",
+            "User-Agent: yarc",
+            "Accept: */*",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}" if hasattr(body, "__len__") else "Transfer-Encoding: chunked",
+            f"Connection: {'keep-alive' if self.keep_alive else 'close'}",
+        ]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        head = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1")
+
+        key = (tls, host, port)
+        self.counters.add_request()
+        timings = {}
+        start = time.perf_counter()
+        reader, writer, reused = await self._acquire(key, host, port, tls, timings)
+        try:
+            sent = time.perf_counter()
+            try:
+                await self._send(writer, head, body)
+                status_line = await reader.readline()
+            except OSError:
+                if not reused:
+                    raise
+                status_line = b""
+            if not status_line and reused:
+                # The server closed an idle keep-alive connection before answering;
+                # retry once on a fresh one. Once any of a response has arrived the
+                # server may have acted on the request, so failures are not retried
+                writer.close()
+                reader, writer, _ = await self._acquire(key, host, port, tls, timings, fresh=True)
+                sent = time.perf_counter()
+                await self._send(writer, head, body)
+                status_line = await reader.readline()
+            status_code, reason, response_headers, content, reusable, complete, body_size = (
+                await self._read_response(reader, status_line, sent, timings, byte_cap)
+            )
+        except BaseException:
+            writer.close()
+            raise
+        elapsed = timedelta(seconds=time.perf_counter() - start)
+        if reusable and self.keep_alive:
+            self._release(key, reader, writer)
+        else:
+            writer.close()
+        return AsyncResponse(
+            url, status_code, reason, response_headers, content, elapsed, timings, complete, body_size
+        )
+
+    async def _send(self, writer, head, body):
+        # Bytes bodies go out with the head in one write; streamed bodies are
+        # written chunk by chunk, with chunked framing when they have no length
+        if isinstance(body, (bytes, bytearray)):
+            writer.write(head + body)
+            await writer.drain()
+            self.counters.add_sent(len(head) + len(body))
+            return
+        writer.write(head)
+        size = len(head)
+        chunked = not hasattr(body, "__len__")
+        for chunk in body:
+            if not chunk:
+                continue
+            if chunked:
+                chunk = b"%x\r\n%b\r\n" % (len(chunk), chunk)
+            writer.write(chunk)
+            size += memoryview(chunk).nbytes
+            await writer.drain()
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            size += 5
+        await writer.drain()
+        self.counters.add_sent(size)
+
+    async def _acquire(self, key, host, port, tls, timings, fresh=False):
+        idle = self._idle.get(key)
+        while idle and not fresh:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        self.counters.add_connection()
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        addresses = dns_cache().lookup(host, port)
+        if addresses is None:
+            addresses = dns_cache().store(
+                host, port, await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            )
+        timings["dns"] = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            sock, address = await self._connect(loop, addresses)
+        except OSError:
+            dns_cache().forget(host, port)
+            raise
+        dns_cache().prefer(host, port, address)
+        timings["connect"] = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(
+                sock=sock,
+                ssl=self.ssl_context if tls else None,
+                server_hostname=host if tls else None,
+            )
+        except BaseException:
+            sock.close()
+            raise
+        if tls:
+            timings["tls"] = time.perf_counter() - start
+            if writer.get_extra_info("ssl_object").session_reused:
+                self.counters.add_tls_resumed()
+        return reader, writer, False
+
+    @staticmethod
+    async def _connect(loop, addresses):
+        error = None
+        for address in addresses:
+            family, type_, proto, _, sockaddr = address
+            sock = socket.socket(family, type_, proto)
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                await loop.sock_connect(sock, sockaddr)
+                return sock, address
+            except OSError as e:
+                sock.close()
+                error = e
+            except BaseException:
+                sock.close()
+                raise
+        raise error or OSError("No addresses to connect to")
+
+    def _release(self, key, reader, writer):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_connections:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+    async def _read_response(self, reader, status_line, sent, timings, byte_cap=None):
+        while True:
+            if not status_line:
+                raise asyncio.IncompleteReadError(b"", None)
+            timings.setdefault("ttfb", time.perf_counter() - sent)
+            version, _, rest = status_line.decode("latin-1").strip().partition(" ")
+            code, _, reason = rest.partition(" ")
+            status_code = int(code)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if status_code >= 200:
+                break
+            status_line = await reader.readline()
+        reusable = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        # With a byte cap, reading stops once the body passes it; the rest of the
+        # body is left unread, so the connection cannot be reused
+        complete = True
+        body_size = None
+        if status_code in (204, 304):
+            content = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            received = 0
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+                received += size
+                if byte_cap and received > byte_cap:
+                    complete = False
+                    break
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            body_size = int(headers["content-length"])
+            if byte_cap and body_size > byte_cap:
+                content = await reader.readexactly(byte_cap)
+                complete = False
+            else:
+                content = await reader.readexactly(body_size)
+        elif byte_cap:
+            chunks = []
+            received = 0
+            while received <= byte_cap:
+                chunk = await reader.read(64 * 1024)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+            content = b"".join(chunks)
+            complete = received <= byte_cap
+            reusable = False
+        else:
+            content = await reader.read()
+            reusable = False
+        if not complete:
+            content = content[:byte_cap]
+            reusable = False
+        return status_code, reason, headers, content, reusable, complete, body_size
+
+    def stats(self):
+        return self.counters.snapshot()
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+class AsyncEngine:
+    def __init__(self, max_in_flight=200, keep_alive=True):
+        self.max_in_flight = max_in_flight
+        self.client = AsyncHTTPClient(max_connections=max_in_flight, keep_alive=keep_alive)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="yarc-asyncio", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        # Runs coroutine on the engine's loop; callable from any thread, returns a futures.Future
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def post(self, url, payload, timeout=40, prepare=None, byte_cap=None, url_type=None, body_modes=None):
+        # Returns a futures.Future. prepare, when given, turns the response
+        # into the future's result; it runs in the default executor so slow decoding
+        # never stalls the event loop. payload may be a tuple of parts, sent in
+        # url_type's body mode
+        return self.submit(self.request(url, payload, timeout, prepare, byte_cap, url_type, body_modes))
+
+    async def request(self, url, payload, timeout=40, prepare=None, byte_cap=None, url_type=None, body_modes=None):
+        # post() for callers already running on the engine's loop
+        if isinstance(payload, tuple):
+            parts = payload
+        else:
+            parts = (payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8"),)
+        return await self._post(url, parts, timeout, prepare, byte_cap, url_type, body_modes)
+
+    def prewarm(self, url, connections=1):
+        return asyncio.run_coroutine_threadsafe(self.client.prewarm(url, connections), self.loop)
+
+    async def _post(self, url, parts, timeout, prepare, byte_cap, url_type, body_modes):
+        response = await self.client.post_parts(url, parts, url_type, body_modes, timeout, byte_cap)
+        if prepare is not None:
+            response = await asyncio.get_running_loop().run_in_executor(None, prepare, response)
+        return response
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.client.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+SEND_WORKERS = 4
+SEND_QUEUE_SIZE = 64
+
+
+# Fixed pool of sender threads fed from a bounded queue. submit() raises queue.Full
+# when the queue is full (or blocks, if asked to), which is the backpressure
+# signal for whoever is producing sends
+class SendScheduler:
+    def __init__(self, send, workers=4, queue_size=64, on_change=None, on_error=None):
+        self.send = send
+        self.jobs = queue.Queue(queue_size)
+        self.on_change = on_change
+        self.on_error = on_error
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.threads = [
+            threading.Thread(target=self._run, name=f"yarc-sender-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, job, block=False, timeout=None):
+        self.jobs.put(job, block, timeout)
+        self._changed()
+
+    def depth(self):
+        return self.jobs.qsize()
+
+    def join(self):
+        # Returns once every job submitted so far has been sent
+        self.jobs.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queued": self.jobs.qsize(),
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "workers": len(self.threads),
+                "capacity": self.jobs.maxsize,
+            }
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            with self.lock:
+                self.in_flight += 1
+            self._changed()
+            try:
+                self.send(job)
+            except Exception as e:
+                # Whatever send did not handle goes to on_error; the worker lives on
+                # so the pool keeps its size and the queue keeps draining
+                if self.on_error is not None:
+                    self.on_error(job, e)
+                else:
+                    print(f"Send failed: {type(e).__name__}: {e}", file=sys.stderr)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+                    self.completed += 1
+                self.jobs.task_done()
+                self._changed()
+
+    def close(self, timeout=5):
+        # Pending jobs are discarded; jobs already being sent are allowed to finish
+        while True:
+            try:
+                self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            self.jobs.task_done()
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+
+
+# Resilience: separate connect/read timeouts, jittered exponential backoff,
+# a circuit breaker per URL type and optional hedged duplicates for endpoints
+# known to deduplicate transactionNo
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+# Not a requests.RequestException, so that defining it does not load requests;
+# callers catch it alongside requests.RequestException
+class CircuitOpenError(IOError):
+    pass
+
+
+class RetryPolicy:
+    # 500 is not retried: the server may already have stored the notice. Of the
+    # transport errors only those before any byte was sent are retried: a connect
+    # timeout, or a connection that could not be made or resolved. A reset, abort
+    # or read timeout may come after the server took the notice
+    def __init__(self, retries=2, backoff=0.2, max_backoff=5.0, statuses=RETRY_STATUSES):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def delay(self, retry):
+        # Full jitter: uniform between zero and the exponential ceiling
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+
+    def retryable_error(self, error):
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        if not isinstance(error, requests.ConnectionError):
+            return False
+        # requests wraps urllib3's MaxRetryError, whose reason is the underlying failure
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, urllib3.exceptions.NewConnectionError):
+                # NameResolutionError is a NewConnectionError
+                return True
+            reason = getattr(error, "reason", None)
+            if reason is None and error.args and isinstance(error.args[0], BaseException):
+                reason = error.args[0]
+            error = reason if isinstance(reason, BaseException) else error.__cause__
+        return False
+
+
+class CircuitBreaker:
+    # closed -> open after failure_threshold consecutive failures; open -> half-open
+    # after reset_after seconds, letting a single probe through; the probe's result
+    # closes or re-opens the circuit
+    def __init__(self, failure_threshold=5, reset_after=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half-open"
+                return True
+            return False
+
+    def retry_in(self):
+        with self.lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+
+    def record(self, ok):
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.state = "closed"
+                return
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class ResiliencePolicy:
+    def __init__(self, connect_timeout=10.0, read_timeout=40.0, retry=None, failure_threshold=5,
+                 reset_after=30.0, hedge_after=None, max_hedges=16, idempotent=()):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry = retry or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.hedge_after = hedge_after
+        # URL types whose endpoint is known to deduplicate transactionNo; the
+        # only ones hedged, since the duplicate carries the same numbers
+        self.idempotent = frozenset(idempotent)
+        self.lock = threading.Lock()
+        self.breakers = {}
+        self.counts = collections.Counter()
+        self.hedges = None
+        if hedge_after is not None:
+            self.hedges = futures.ThreadPoolExecutor(max_workers=max_hedges * 4)
+
+    def breaker(self, url_type):
+        with self.lock:
+            breaker = self.breakers.get(url_type)
+            if breaker is None:
+                breaker = self.breakers[url_type] = CircuitBreaker(self.failure_threshold, self.reset_after)
+            return breaker
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def _count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def send(self, url_type, transaction_numbers, attempt):
+        # attempt(timeout) performs one request and returns something with a
+        # status_code; timeout is a (connect, read) tuple
+        breaker = self.breaker(url_type) if self.failure_threshold else None
+        retry = 0
+        while True:
+            self._admit(url_type, breaker)
+            hedged = False
+            try:
+                if self.hedges is not None and url_type in self.idempotent:
+                    response, hedged = self._send_hedged(attempt)
+                else:
+                    response = attempt(self.timeout)
+            except (requests.RequestException, AsyncTransportError) as e:
+                if not self._retry_error(breaker, retry, e, hedged):
+                    raise
+            else:
+                if not self._retry_response(breaker, retry, response, hedged):
+                    return response
+            self._count("retries")
+            time.sleep(self.retry.delay(retry))
+            retry += 1
+
+    async def send_async(self, url_type, transaction_numbers, attempt):
+        # send() for coroutine attempts on an event loop; there is no hedging here
+        breaker = self.breaker(url_type) if self.failure_threshold else None
+        retry = 0
+        while True:
+            self._admit(url_type, breaker)
+            try:
+                response = await attempt(self.timeout)
+            except (requests.RequestException, AsyncTransportError) as e:
+                if not self._retry_error(breaker, retry, e):
+                    raise
+            else:
+                if not self._retry_response(breaker, retry, response):
+                    return response
+            self._count("retries")
+            await asyncio.sleep(self.retry.delay(retry))
+            retry += 1
+
+    def _admit(self, url_type, breaker):
+        if breaker is not None and not breaker.allow():
+            self._count("failed_fast")
+            raise CircuitOpenError(
+                f"Circuit open for {url_type}: failing fast for another {breaker.retry_in():.1f} seconds"
+            )
+
+    def _retry_error(self, breaker, retry, error, hedged=False):
+        if breaker is not None:
+            breaker.record(False)
+        # Never retry once a hedge went out: either copy may have landed
+        return not hedged and retry < self.retry.retries and self.retry.retryable_error(error)
+
+    def _retry_response(self, breaker, retry, response, hedged=False):
+        status_code = response.status_code
+        if breaker is not None:
+            breaker.record(status_code < 500 and status_code != 429)
+        return not hedged and retry < self.retry.retries and status_code in self.retry.statuses
+
+    def _send_hedged(self, attempt):
+        # Returns (response, hedged). The primary's result is preferred: the hedge's
+        # only stands when it is a 2xx and the primary is still out or has failed,
+        # so a duplicate rejection of the hedge is never the outcome
+        primary = self.hedges.submit(attempt, self.timeout)
+        try:
+            return primary.result(timeout=self.hedge_after), False
+        except futures.TimeoutError:
+            pass
+        hedge = self.hedges.submit(self._hedge, attempt, primary)
+        futures.wait((primary, hedge), return_when=futures.FIRST_COMPLETED)
+        if primary.done() and primary.exception() is None:
+            return primary.result(), not hedge.cancel()
+        if primary.done():
+            futures.wait((hedge,))
+        if hedge.done() and hedge.exception() is None and 200 <= hedge.result().status_code < 300:
+            self._count("hedge_wins")
+            return hedge.result(), True
+        return primary.result(), True
+
+    def _hedge(self, attempt, primary):
+        # A hedge that only gets a thread once the primary has answered is not sent
+        if primary.done() and primary.exception() is None:
+            return None
+        self._count("hedges")
+        return attempt(self.timeout)
+
+    def close(self):
+        if self.hedges is not None:
+            self.hedges.shutdown(wait=False, cancel_futures=True)
+
+
+# Append-only journal of every send in SQLite (WAL mode). record() only queues;
+# a writer thread hashes payloads and commits whatever has queued up since its
+# last commit in one transaction, so the commit rate adapts to the send rate
+DEFAULT_JOURNAL = os.path.join(os.path.expanduser("~"), ".yarc", "journal.sqlite3")
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sends (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    transaction_no TEXT NOT NULL,
+    regn_no TEXT,
+    payload_hash TEXT,
+    url_type TEXT,
+    url TEXT,
+    status INTEGER,
+    latency REAL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS sends_transaction_no ON sends (transaction_no);
+CREATE INDEX IF NOT EXISTS sends_run_status ON sends (run_id, status);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    id_params TEXT,
+    id_start INTEGER,
+    id_stop INTEGER
+);
+"""
+
+JOURNAL_COLUMNS = [
+    "run_id", "transaction_no", "regn_no", "payload_hash", "url_type", "url", "status", "latency", "sent_at"
+]
+
+
+class SendJournal:
+    def __init__(self, path=DEFAULT_JOURNAL, max_batch=5000, synchronous="NORMAL"):
+        self.path = path
+        self.max_batch = max_batch
+        self.synchronous = synchronous
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        connection.executescript(JOURNAL_SCHEMA)
+        connection.close()
+        self.records = queue.SimpleQueue()
+        self.rows = 0
+        self.commits = 0
+        # Rows lost to failed commits, and the last error
+        self.failed = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="yarc-journal", daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        return connection
+
+    def record(self, run_id, transaction_numbers, registration_numbers, payload, url_type, url, status, latency):
+        self.records.put((
+            run_id, transaction_numbers, registration_numbers, payload, url_type, url, status, latency, time.time()
+        ))
+
+    def _rows(self, record):
+        run_id, transaction_numbers, registration_numbers, payload, url_type, url, status, latency, sent_at = record
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        elif not isinstance(payload, (bytes, tuple)):
+            payload = json.dumps(payload).encode("utf-8")
+        if isinstance(payload, tuple):
+            # Parts hash to the same digest as the joined payload
+            digest = hashlib.blake2b(digest_size=16)
+            for part in payload:
+                digest.update(part)
+            payload_hash = digest.hexdigest()
+        else:
+            payload_hash = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        registration_numbers = registration_numbers or [None] * len(transaction_numbers)
+        return [
+            (run_id, transaction_number, registration_number, payload_hash, url_type, url, status, latency, sent_at)
+            for transaction_number, registration_number in zip(transaction_numbers, registration_numbers)
+        ]
+
+    def _run(self):
+        connection = None
+        insert = f"INSERT INTO sends ({', '.join(JOURNAL_COLUMNS)}) VALUES ({', '.join('?' * len(JOURNAL_COLUMNS))})"
+        stopping = False
+        while not stopping:
+            batch = [self.records.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            rows = []
+            flushed = []
+            for record in batch:
+                if record is None:
+                    stopping = True
+                elif isinstance(record, threading.Event):
+                    flushed.append(record)
+                else:
+                    rows.extend(self._rows(record))
+            try:
+                if rows:
+                    if connection is None:
+                        connection = self._connect()
+                    with connection:
+                        connection.executemany(insert, rows)
+                    self.rows += len(rows)
+                    self.commits += 1
+            except sqlite3.Error as e:
+                # Disk full, or a lock held past the timeout: the batch is lost, but
+                # the writer keeps going and flushes still return
+                self.failed += len(rows)
+                if self.error is None:
+                    print(f"Send journal: commit failed, sends are not being journaled: {e}", file=sys.stderr)
+                self.error = e
+            finally:
+                for event in flushed:
+                    event.set()
+        if connection is not None:
+            connection.close()
+
+    def flush(self, timeout=None):
+        # Returns once everything recorded before the call is committed
+        event = threading.Event()
+        self.records.put(event)
+        return event.wait(timeout)
+
+    def lookup(self, transaction_no):
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                f"SELECT {', '.join(JOURNAL_COLUMNS)} FROM sends WHERE transaction_no = ? ORDER BY id",
+                (transaction_no,),
+            )
+            return [dict(zip(JOURNAL_COLUMNS, row)) for row in cursor]
+        finally:
+            connection.close()
+
+    def succeeded(self, run_id):
+        connection = self._connect()
+        try:
+            (count,) = connection.execute(
+                "SELECT COUNT(*) FROM sends WHERE run_id = ? AND status BETWEEN 200 AND 299", (run_id,)
+            ).fetchone()
+            return count
+        finally:
+            connection.close()
+
+    def succeeded_numbers(self, run_id):
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                "SELECT DISTINCT transaction_no FROM sends WHERE run_id = ? AND status BETWEEN 200 AND 299", (run_id,)
+            )
+            return frozenset(row[0] for row in cursor)
+        finally:
+            connection.close()
+
+    def start_run(self, run_id, ids):
+        # Records the IdRange a run draws from; written at once, not through the writer thread
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO runs (run_id, id_params, id_start, id_stop) VALUES (?, ?, ?, ?)",
+                    (run_id, json.dumps(ids.params), ids.start, ids.stop),
+                )
+        finally:
+            connection.close()
+
+    def run_ids(self, run_id, skip=frozenset()):
+        # The IdRange start_run recorded for run_id (skipping skip), or None
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT id_params, id_start, id_stop FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        params, start, stop = row
+        return IdRange(json.loads(params), start, stop, skip=skip)
+
+    def close(self):
+        self.records.put(None)
+        self.thread.join()
+
+
+def open_journal(path):
+    # The GUI keeps sending when the journal cannot be opened
+    if not path:
+        return None
+    try:
+        return SendJournal(path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Send journal disabled: {e}", file=sys.stderr)
+        return None
+
+
+# Send capture: one JSON line per send with its notices' fields, the URL type,
+# the wall-clock send time, status and latency, for replaying the traffic later.
+# Images are recorded by file name, not content. Paths ending in .gz are written
+# gzip-compressed. Every record carries its run's ID, so runs appended to one
+# file can be told apart and replayed one at a time
+CAPTURE_NOTICE_FIELDS = ["transactionNo", "regnNo", "equipmentId", "voilationTime", "actionTime", "image"]
+
+
+def capture_fields(offence_id, identity, notices, identities=None):
+    # notices are (transactionNo, regnNo, equipmentId, voilationTime, actionTime, image name)
+    # tuples. identities, when given, are the notices' own identities; those that
+    # differ from identity are recorded on the notice
+    fields = {
+        "offenceId": offence_id,
+        "identity": identity,
+        "notices": [dict(zip(CAPTURE_NOTICE_FIELDS, notice)) for notice in notices],
+    }
+    for notice, own in zip(fields["notices"], identities or []):
+        if own != identity:
+            notice["identity"] = own
+    return fields
+
+
+class SendCapture:
+    def __init__(self, path, append=False, run_id=None):
+        self.path = path
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        if not append and os.path.exists(path) and os.path.getsize(path) > 0:
+            raise ValueError(
+                f"{path} already holds a capture; use --append to add this run to it, or choose another file"
+            )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        mode = "a" if append else "w"
+        if path.endswith(".gz"):
+            self.file = gzip.open(path, mode + "t", encoding="utf-8")
+        else:
+            # Line buffered, so a process that dies mid-run keeps what it captured
+            self.file = open(path, mode, encoding="utf-8", buffering=1)
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def record(self, fields, url_type, sent_at, status, latency):
+        line = json.dumps(
+            dict(
+                fields, run=self.run_id, url_type=url_type, at=round(sent_at, 6), status=status,
+                latency=round(latency, 6),
+            )
+        )
+        with self.lock:
+            # Sends still finishing after an interrupted run are not captured
+            if self.file.closed:
+                return
+            self.file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def open_capture(path):
+    # Like open_journal: the GUI keeps sending when the capture cannot be opened.
+    # Each GUI session is appended as a run of its own
+    if not path:
+        return None
+    try:
+        return SendCapture(path, append=True)
+    except OSError as e:
+        print(f"Send capture disabled: {e}", file=sys.stderr)
+        return None
+
+
+def check_capture_record(record):
+    # Everything run_replay reads from a record, so a truncated or hand-edited
+    # line is refused here rather than failing inside a sender thread
+    check_capture_identity(record.get("identity"), "identity")
+    notices = record.get("notices")
+    if not isinstance(notices, list) or not notices:
+        raise ValueError("no notices")
+    for index, notice in enumerate(notices):
+        if not isinstance(notice, dict):
+            raise ValueError(f"notice {index} is not an object")
+        for field in ("voilationTime", "actionTime"):
+            if not isinstance(notice.get(field), str):
+                raise ValueError(f"notice {index} has no {field}")
+        if not isinstance(notice.get("image"), (str, type(None))):
+            raise ValueError(f"notice {index} has an invalid image name")
+        if "identity" in notice:
+            check_capture_identity(notice["identity"], f"notice {index} identity")
+
+
+def check_capture_identity(identity, name):
+    if not isinstance(identity, dict):
+        raise ValueError(f"{name} is not an object")
+    missing = [field for field in IDENTITY_FIELDS if field not in identity]
+    if missing:
+        raise ValueError(f"{name} has no {', '.join(missing)}")
+
+
+def read_capture(path, run_id=None):
+    # The sends of one captured run in send order: run_id's, or by default the
+    # run appended last. Records written before runs were recorded form one run
+    opener = gzip.open if path.endswith(".gz") else open
+    runs = {}
+    with opener(path, "rt", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("not an object")
+                record["at"] = float(record["at"])
+                check_capture_record(record)
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{number}: invalid capture record ({e})")
+            last = record.get("run")
+            runs.setdefault(last, []).append(record)
+    if not runs:
+        return []
+    if run_id is None:
+        run_id = last
+    elif run_id not in runs:
+        raise ValueError(f"{path} has no run {run_id} (runs: {', '.join(str(run) for run in runs)})")
+    records = runs[run_id]
+    records.sort(key=lambda record: record["at"])
+    return records
+
+
+# Response decoding, pretty-printing and status HTML are prepared on the worker
+# side; the GUI thread only receives a ready-to-display ResponseView
+FORMAT_LIMIT = 512 * 1024
+
+# Bodies are read from the stream up to RESPONSE_BYTE_CAP bytes; anything past
+# that is never buffered, and the connection is closed instead of drained
+RESPONSE_BYTE_CAP = 1024 * 1024
+SUMMARY_FIELDS = 8
+SUMMARY_VALUE_CHARS = 80
+
+STATUS_STYLES = {
+    2: ("green", "#d4edda", "Success"),
+    3: ("orange", "#fff3cd", "Redirection"),
+    4: ("darkred", "#f8d7da", "Client Error"),
+}
+SERVER_ERROR_STYLE = ("darkred", "#f5c6cb", "Server Error")
+
+# The response viewer shows one row per line, with long lines wrapped at
+# VIEW_LINE_WIDTH characters so a compact multi-megabyte body is not one row
+VIEW_LINE_WIDTH = 200
+
+
+def status_html(status_code):
+    status_color, status_background_color, label = STATUS_STYLES.get(status_code // 100, SERVER_ERROR_STYLE)
+    return f"""
+        <div style="
+            padding: 15px; 
+            margin-bottom: 20px; 
+            border: 3px solid {status_color}; 
+            background-color: {status_background_color}; 
+            border-radius: 8px;
+            font-size: 20px;
+            font-weight: bold;
+            text-align: center;
+            color: {status_color};
+            ">
+            Response Status: {status_code} - {label}
+        </div>
+        """
+
+
+def line_starts(text, width=VIEW_LINE_WIDTH):
+    starts = array.array("L", [0])
+    pos = 0
+    end = len(text)
+    while True:
+        newline = text.find("\n", pos, pos + width)
+        pos = newline + 1 if newline != -1 else pos + width
+        if pos >= end:
+            return starts
+        starts.append(pos)
+
+
+class CappedResponse:
+    # The parts of a streamed requests.Response that prepare_response_view reads,
+    # with at most byte_cap bytes of the body; the response is closed afterwards
+    def __init__(self, response, byte_cap=RESPONSE_BYTE_CAP):
+        self.status_code = response.status_code
+        self.elapsed = response.elapsed
+        self.timings = getattr(response, "timings", None)
+        # requests would guess a missing charset by scanning the whole body
+        self.encoding = response.encoding or "utf-8"
+        chunks = []
+        size = 0
+        self.complete = True
+        try:
+            for chunk in response.iter_content(64 * 1024):
+                chunks.append(chunk)
+                size += len(chunk)
+                if byte_cap and size > byte_cap:
+                    self.complete = False
+                    break
+        finally:
+            response.close()
+        self.content = b"".join(chunks)
+        if not self.complete:
+            self.content = self.content[:byte_cap]
+        length = response.headers.get("content-length", "")
+        if self.complete:
+            self.body_size = size
+        elif length.isdigit() and "content-encoding" not in response.headers:
+            self.body_size = int(length)
+        else:
+            self.body_size = None
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+
+def fetch_response_view(session, url, payload, timeout=40, transaction_numbers=None, byte_cap=RESPONSE_BYTE_CAP,
+                        url_type=None, body_modes=None):
+    # One pushdata POST reduced to a ResponseView without buffering more than byte_cap bytes of body
+    if isinstance(payload, tuple):
+        response = post_parts(session, url, payload, url_type, body_modes, timeout=timeout, stream=True)
+    elif isinstance(payload, bytes):
+        response = session.post(url, data=payload, headers=JSON_HEADERS, timeout=timeout, stream=True)
+    else:
+        response = session.post(url, json=payload, timeout=timeout, stream=True)
+    return prepare_response_view(CappedResponse(response, byte_cap), transaction_numbers)
+
+
+def response_summary(parsed):
+    # The scalar top-level fields of a parsed body, for showing next to the status
+    if isinstance(parsed, list):
+        return {"items": len(parsed)}
+    if not isinstance(parsed, dict):
+        return None
+    summary = {}
+    for key, value in parsed.items():
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            if isinstance(value, str) and len(value) > SUMMARY_VALUE_CHARS:
+                value = value[:SUMMARY_VALUE_CHARS] + "..."
+            summary[key] = value
+            if len(summary) >= SUMMARY_FIELDS:
+                break
+    return summary
+
+
+class ResponseView:
+    # The compact record of one response that reaches the GUI thread: status,
+    # timings, the (possibly truncated) display text and a parsed summary
+    def __init__(self, status_code, elapsed, timings, status_html, body_text, body_size, truncated,
+                 itemised=None, summary=None):
+        self.status_code = status_code
+        self.elapsed = elapsed
+        self.timings = timings
+        self.status_html = status_html
+        self.body_text = body_text
+        self.body_size = body_size
+        self.truncated = truncated
+        self.itemised = itemised
+        self.summary = summary
+        self.lines = line_starts(body_text)
+
+    def line(self, row):
+        start = self.lines[row]
+        end = self.lines[row + 1] if row + 1 < len(self.lines) else len(self.body_text)
+        return self.body_text[start:end].rstrip("\n")
+
+
+def prepare_response_view(response, transaction_numbers=None, format_limit=FORMAT_LIMIT):
+    # response is a requests.Response, an AsyncResponse or a CappedResponse; the
+    # last two can carry a partial body (complete=False, body_size=None if unknown)
+    content = response.content
+    complete = getattr(response, "complete", True)
+    body_size = getattr(response, "body_size", len(content))
+    parsed = None
+    truncated = False
+    parsing = formatting = time.perf_counter()
+    if complete and len(content) <= format_limit:
+        try:
+            parsed = json.loads(content)
+            formatting = time.perf_counter()
+            body_text = json.dumps(parsed, indent=4)
+        except ValueError:
+            body_text = response.text
+    else:
+        truncated = True
+        total = f"{body_size} bytes in total" if body_size is not None else f"more than {len(content)} bytes"
+        body_text = (
+            content[:format_limit].decode("utf-8", errors="replace")
+            + f"\n\n... truncated, {total} (formatting skipped)"
+        )
+    profiler = _profiler
+    if profiler is not None:
+        profiler.span("parse", parsing, formatting, {"bytes": len(content)})
+        profiler.span("format", formatting)
+    itemised = None
+    if transaction_numbers and len(transaction_numbers) > 1:
+        results = map_batch_response(transaction_numbers, parsed)
+        itemised = sum(
+            1 for number in transaction_numbers
+            if results[number] is not None and results[number] is not parsed
+        )
+    return ResponseView(
+        response.status_code,
+        response.elapsed.total_seconds(),
+        getattr(response, "timings", None),
+        status_html(response.status_code),
+        body_text,
+        body_size if body_size is not None else len(content),
+        truncated,
+        itemised,
+        response_summary(parsed),
+    )
+
+
+# One queued send; session is used by the worker-thread engine, engine by asyncio
+class SendJob:
+    def __init__(self, url_type, url, payload, transaction_numbers, session=None, engine=None,
+                 registration_numbers=None, fields=None):
+        self.url_type = url_type
+        self.url = url
+        self.payload = payload
+        self.transaction_numbers = transaction_numbers
+        self.registration_numbers = registration_numbers
+        self.session = session or requests
+        self.engine = engine
+        # The capture_fields of the job's notices, when sends are captured
+        self.fields = fields
+        self.started = None
+        self.finished = None
+
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+
+# Headless batch/load mode
+def url_type_info(url_type):
+    for entry in URL_TYPES:
+        if entry[0] == url_type:
+            return entry
+    raise ValueError(f"Unknown URL type: {url_type}")
+
+
+def resolve_endpoint(url_type, url=None):
+    _, _, default_url, offence_id = url_type_info(url_type)
+    url = url or default_url
+    if not url:
+        raise ValueError(f"URL type '{url_type}' needs --url")
+    return url, offence_id
+
+
+def load_identity(identity_file=None, defaults=None, **overrides):
+    identity = dict(defaults or {})
+    if identity_file:
+        with open(identity_file, encoding="utf-8") as f:
+            identity.update(json.load(f))
+    for field, value in overrides.items():
+        if value is not None:
+            identity[field] = value
+    missing = [field for field in IDENTITY_FIELDS if not str(identity.get(field, "")).strip()]
+    if missing:
+        raise ValueError(f"Missing identity fields: {', '.join(missing)}")
+    return {field: str(identity[field]) for field in IDENTITY_FIELDS}
+
+
+# Bulk identity import. Rows are validated with the GUI's rules: the numeric
+# fields accept what QIntValidator(0, 9999) accepts, and location/district get
+# the same first-letter capitalisation as capitalize_first_letter
+IDENTITY_NUMERIC_FIELDS = ["userId", "districtId", "offCd"]
+IDENTITY_TEXT_FIELDS = ["location", "district"]
+IDENTITY_NUMBER = re.compile(r"\d{1,4}", re.ASCII)
+
+
+def capitalize_first(text):
+    return text[0].upper() + text[1:] if text else text
+
+
+def validate_identity(row):
+    identity = {}
+    problems = []
+    for field in IDENTITY_FIELDS:
+        value = row.get(field)
+        value = "" if value is None else str(value)
+        if field in IDENTITY_NUMERIC_FIELDS:
+            if not IDENTITY_NUMBER.fullmatch(value):
+                problems.append(f"{field} must be a whole number from 0 to 9999, got {value!r}")
+        elif not value.strip():
+            problems.append(f"{field} is empty")
+        else:
+            value = capitalize_first(value)
+        identity[field] = value
+    if problems:
+        raise ValueError("; ".join(problems))
+    return identity
+
+
+# What errors="surrogateescape" decodes bytes that are not UTF-8 to
+UNDECODABLE = re.compile("[\udc80-\udcff]")
+
+
+class IdentityImport:
+    # Streams identities from a CSV (header row with the identity field names) or
+    # JSONL file. Malformed rows are counted, passed to on_error and skipped;
+    # only the first MAX_KEPT_ERRORS are kept for the report
+    MAX_KEPT_ERRORS = 20
+
+    def __init__(self, path, file_format=None, on_error=None):
+        self.path = path
+        self.file_format = file_format or ("jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv")
+        if self.file_format not in ("csv", "jsonl"):
+            raise ValueError(f"Unknown identity file format: {self.file_format}")
+        self.on_error = on_error
+        self.valid = 0
+        self.malformed = 0
+        self.errors = []
+        # Opened here so a missing or unreadable file is reported before any send.
+        # Undecodable bytes come through as lone surrogates, so a bad row is
+        # rejected with its line number instead of ending the whole import
+        self._file = open(path, encoding="utf-8", errors="surrogateescape", newline="")
+        self._rows = self._read(self._file)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for line_number, row in self._rows:
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError("row is not an object")
+                identity = validate_identity(row)
+            except ValueError as e:
+                self._reject(line_number, str(e))
+                continue
+            self.valid += 1
+            return identity
+        raise StopIteration
+
+    def _reject(self, line_number, message):
+        self.malformed += 1
+        if len(self.errors) < self.MAX_KEPT_ERRORS:
+            self.errors.append((line_number, message))
+        if self.on_error is not None:
+            self.on_error(line_number, message)
+
+    def _read(self, f):
+        with f:
+            if self.file_format == "csv":
+                reader = csv.DictReader(f)
+                while True:
+                    try:
+                        row = next(reader)
+                    except StopIteration:
+                        return
+                    except csv.Error as e:
+                        # DictReader only copies the line number over after a good row
+                        self._reject(reader.reader.line_num, f"invalid CSV: {e}")
+                        continue
+                    if any(isinstance(value, str) and UNDECODABLE.search(value) for value in row.values()):
+                        self._reject(reader.line_num, "invalid UTF-8")
+                        continue
+                    yield reader.line_num, row
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                if UNDECODABLE.search(line):
+                    self._reject(line_number, "invalid UTF-8")
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    self._reject(line_number, f"invalid JSON: {e}")
+                    continue
+                yield line_number, row
+
+    def close(self):
+        self._rows.close()
+        self._file.close()
+
+    def summary(self):
+        lines = [f"Identities:   {self.valid} imported, {self.malformed} malformed rows skipped ({self.path})"]
+        lines.extend(f"  line {line_number}: {message}" for line_number, message in self.errors)
+        if self.malformed > len(self.errors):
+            lines.append(f"  ... {self.malformed - len(self.errors)} more")
+        return "\n".join(lines)
+
+
+def format_image_stats(stats):
+    return (
+        f"Images:       {stats['images']} in corpus, {stats['cached']} cached "
+        f"({stats['cached_bytes'] / 1048576:.1f} MB), {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['evictions']} evictions ({stats['hit_rate']:.0%} hit rate)"
+    )
+
+
+class LoadStats:
+    def __init__(self, url_type="", metrics=None):
+        self.url_type = url_type
+        self.metrics = metrics or Metrics()
+        self.lock = threading.Lock()
+        self.status_counts = {}
+        self.errors = 0
+        self.count = 0
+        self.started = None
+        self.stopped = None
+        self.connections = None
+        self.images = None
+        self.batches = 0
+        self.notices = 0
+        self.itemised = 0
+        self.rate = None
+        self.resilience = None
+        # (latency, phase timings) of the first send to complete; it pays for
+        # whatever DNS, connect and TLS work pre-warming did not already do
+        self.first = None
+        self.dns = None
+        self.shards = None
+        # (shard, sent, share) for shards of a --requests run that sent less than their share
+        self.short_shards = None
+        self.body = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def merge(self, other):
+        self.metrics.merge(other.metrics)
+        with self.lock:
+            self.count += other.count
+            self.errors += other.errors
+            for key, count in other.status_counts.items():
+                self.status_counts[key] = self.status_counts.get(key, 0) + count
+            self.batches += other.batches
+            self.notices += other.notices
+            self.itemised += other.itemised
+            if self.first is None:
+                self.first = other.first
+            if other.body:
+                fallbacks = (self.body or {}).get("fallbacks", 0) + other.body["fallbacks"]
+                self.body = dict(other.body, fallbacks=fallbacks)
+            for name in ("connections", "resilience", "dns"):
+                counts = getattr(other, name)
+                if counts:
+                    merged = dict(getattr(self, name) or {})
+                    for key, value in counts.items():
+                        merged[key] = merged.get(key, 0) + value
+                    setattr(self, name, merged)
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+        self.dns = dns_cache().stats()
+
+    def record(self, status_code, latency, timings=None):
+        self.metrics.observe(self.url_type, status_code, latency, timings)
+        with self.lock:
+            self.count += 1
+            if self.first is None:
+                self.first = (latency, timings or {})
+            key = status_class(status_code)
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    def record_error(self, latency):
+        self.metrics.observe(self.url_type, None, latency)
+        with self.lock:
+            self.count += 1
+            self.errors += 1
+            if self.first is None:
+                self.first = (latency, {})
+
+    def record_batch(self, notices, itemised):
+        with self.lock:
+            self.batches += 1
+            self.notices += notices
+            self.itemised += itemised
+
+    @property
+    def total(self):
+        return self.count
+
+    @property
+    def elapsed(self):
+        return (self.stopped or time.perf_counter()) - self.started
+
+    def summary(self):
+        ok = self.status_counts.get("2xx", 0)
+        elapsed = self.elapsed
+        throughput = self.total / elapsed if elapsed > 0 else 0.0
+        statuses = " ".join(f"{key}={count}" for key, count in sorted(self.status_counts.items()))
+        lines = [
+            f"Requests:     {self.total} ({ok} ok, {self.total - ok - self.errors} non-2xx, {self.errors} errors)",
+            f"Status:       {statuses or '-'}",
+            f"Duration:     {elapsed:.2f} s",
+            f"Throughput:   {throughput:.1f} req/s",
+        ]
+        for phase in Metrics.PHASES:
+            histogram = self.metrics.histogram(self.url_type, phase)
+            if not histogram.count:
+                continue
+            label = "Latency (ms):" if phase == "total" else f"  {phase}:"
+            lines.append(
+                f"{label:<14}min {histogram.min * 1000:.1f}  mean {histogram.mean * 1000:.1f}  "
+                + "  ".join(f"p{q:g} {histogram.percentile(q) * 1000:.1f}" for q in Metrics.QUANTILES)
+                + f"  max {histogram.max * 1000:.1f}"
+            )
+        if self.first is not None:
+            latency, timings = self.first
+            phases = "  ".join(
+                f"{phase} {timings[phase] * 1000:.1f}" for phase in Metrics.PHASES if phase in timings
+            )
+            lines.append(f"First send:   {latency * 1000:.1f} ms" + (f"  ({phases})" if phases else ""))
+        if self.batches:
+            lines.append(
+                f"Notices:      {self.notices} in {self.batches} batches "
+                f"({self.notices / self.batches:.1f}/batch, {self.notices / elapsed:.1f} notices/s, "
+                f"{self.itemised} with per-notice results)"
+            )
+        if self.rate:
+            lines.append(
+                f"Rate:         target {self.rate['target']:.1f} req/s, achieved {self.total / elapsed:.1f} req/s "
+                f"over {self.rate['scheduled']} scheduled sends, {self.rate['dropped']} dropped "
+                f"(peak {self.rate['peak_in_flight']} of {self.rate['max_in_flight']} in flight)"
+            )
+        if self.resilience:
+            lines.append(
+                f"Resilience:   {self.resilience.get('retries', 0)} retries, "
+                f"{self.resilience.get('hedges', 0)} hedged ({self.resilience.get('hedge_wins', 0)} won by the hedge), "
+                f"{self.resilience.get('failed_fast', 0)} failed fast"
+            )
+        if self.shards:
+            lines.append(
+                f"Shards:       {len(self.shards)} processes, "
+                + " / ".join(f"{rate:.1f}" for rate in self.shards) + " req/s each"
+            )
+        if self.short_shards:
+            lines.append(
+                "Short shares: "
+                + ", ".join(f"shard {index} sent {sent} of {share}" for index, sent, share in self.short_shards)
+            )
+        if self.connections:
+            lines.append(
+                f"Connections:  {self.connections['connections']} opened "
+                f"({self.connections.get('prewarmed', 0)} pre-warmed), {self.connections['reused']} reused, "
+                f"{self.connections.get('tls_resumed', 0)} TLS sessions resumed"
+            )
+        if self.dns:
+            lines.append(f"DNS cache:    {self.dns['hits']} hits, {self.dns['misses']} misses")
+        if self.connections and self.connections.get("bytes_sent"):
+            sent = self.connections["bytes_sent"]
+            line = f"Sent:         {sent / 1e6:.2f} MB ({sent / max(1, self.total):.0f} bytes/request)"
+            if self.body:
+                line += f", {self.body['mode']} bodies"
+                if self.body["fallbacks"]:
+                    line += " (gzip refused by the server, fell back to stream)"
+            lines.append(line)
+        if self.images:
+            lines.append(format_image_stats(self.images))
+        return "\n".join(lines)
+
+
+# Open-loop send rates; each profile maps seconds since start to requests/second
+def parse_rate_profile(spec):
+    # R, constant:R, ramp:FROM:TO:SECONDS, step:R1,R2,...:SECONDS. The returned
+    # rate(elapsed) function carries the profile's highest rate as .peak
+    kind, _, params = spec.partition(":")
+    if not params:
+        kind, params = "constant", spec
+    try:
+        if kind == "constant":
+            rate = float(params)
+            if rate > 0:
+                return with_peak(lambda elapsed: rate, rate)
+        elif kind == "ramp":
+            start, end, seconds = (float(value) for value in params.split(":"))
+            if seconds > 0 and max(start, end) > 0 and min(start, end) >= 0:
+                return with_peak(lambda elapsed: start + (end - start) * min(elapsed / seconds, 1.0), max(start, end))
+        elif kind == "step":
+            rates, seconds = params.split(":")
+            rates = [float(value) for value in rates.split(",")]
+            seconds = float(seconds)
+            if seconds > 0 and rates and min(rates) >= 0 and max(rates) > 0:
+                return with_peak(lambda elapsed: rates[min(int(elapsed // seconds), len(rates) - 1)], max(rates))
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid rate profile: {spec}")
+
+
+def with_peak(profile, peak):
+    profile.peak = peak
+    return profile
+
+
+def rate_capacity(rate, timeout, minimum=1):
+    # Sends an open-loop profile can have in flight: every send due within one
+    # timeout of its peak rate may still be waiting for its response
+    profile = parse_rate_profile(rate) if isinstance(rate, str) else rate
+    return max(minimum, math.ceil(profile.peak * timeout))
+
+
+# Open-loop dispatch of scheduled sends: a job goes to a thread the moment it is
+# due, whether or not earlier sends have finished. Threads are started as needed
+# up to max_in_flight; a job that comes due while that many are in flight is
+# dropped and counted rather than holding up the ones behind it
+class OpenLoopDispatcher:
+    def __init__(self, send, max_in_flight):
+        self.send = send
+        self.max_in_flight = max_in_flight
+        self.executor = futures.ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="yarc-open-loop")
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.dropped = 0
+
+    def dispatch(self, job):
+        with self.lock:
+            if self.in_flight >= self.max_in_flight:
+                self.dropped += 1
+                return False
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        self.executor.submit(self._run, job)
+        return True
+
+    def drop(self, count=1):
+        with self.lock:
+            self.dropped += count
+
+    def _run(self, job):
+        try:
+            self.send(job)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def close(self):
+        # Waits for the sends already dispatched
+        self.executor.shutdown(wait=True)
+
+    def stats(self):
+        with self.lock:
+            return {"dropped": self.dropped, "peak_in_flight": self.peak, "max_in_flight": self.max_in_flight}
+
+
+# Token bucket refilled at rate(t) with room for a single token: every send is
+# due the moment its token lands. Due times depend only on the profile, never on
+# how quickly earlier sends completed, so the load stays open-loop
+class RateSchedule:
+    IDLE_STEP = 0.01
+
+    def __init__(self, rate, duration=None, total=None):
+        self.rate = rate
+        self.duration = duration
+        self.total = total
+        self.scheduled = 0
+        self.offset = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.total is not None and self.scheduled >= self.total:
+            raise StopIteration
+        tokens = 0.0
+        while tokens < 1.0:
+            if self.duration is not None and self.offset >= self.duration:
+                raise StopIteration
+            rate = self.rate(self.offset)
+            if rate <= 0:
+                self.offset += self.IDLE_STEP
+                continue
+            # Refill until the token lands, but never step past a profile change by more than IDLE_STEP
+            step = min((1.0 - tokens) / rate, self.IDLE_STEP)
+            tokens += rate * step
+            self.offset += step
+        self.scheduled += 1
+        return self.offset
+
+    def target_rate(self):
+        return self.scheduled / self.offset if self.offset > 0 else 0.0
+
+
+def policy_post(policy, session, url_type, url, transaction_numbers, body, timeout, body_modes=None):
+    # One pushdata POST, through the resilience policy when one is given. A body
+    # given as a tuple of parts is sent in url_type's body mode
+    def attempt(timeout):
+        if isinstance(body, tuple):
+            return post_parts(session, url, body, url_type, body_modes, timeout=timeout)
+        return session.post(url, data=body, headers=JSON_HEADERS, timeout=timeout)
+
+    if policy is None:
+        return attempt(timeout)
+    return policy.send(url_type, transaction_numbers, attempt)
+
+
+def profile_send(building, start, response=None):
+    # Spans for building one send's body and for sending it, when profiling is on
+    profiler = _profiler
+    if profiler is not None:
+        profiler.span("build", building, start)
+        profiler.span("send", start, args=phase_args(getattr(response, "timings", None)))
+
+
+def run_load(url_type, identity, total=None, concurrency=1, duration=None, timeout=40, sessions=None,
+             images=None, ids=None, url=None, policy=None, journal=None, run_id=None, identities=None,
+             body_modes=None, capture=None):
+    url, offence_id = resolve_endpoint(url_type, url)
+    sessions = sessions or SessionPool(pool_size=concurrency)
+    body_modes = body_modes or BodyModes()
+    session = sessions.session(url_type)
+    if total is None and duration is None and identities is None:
+        total = 1
+    factory = NoticeFactory(offence_id, identity, images, ids, identities)
+    stats = LoadStats(url_type)
+    counter = itertools.count()
+    deadline = None
+
+    def send_loop():
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if total is not None and next(counter) >= total:
+                return
+            building = time.perf_counter()
+            try:
+                (transaction_number, registration_number, _), body, fields = factory.render_send()
+            except IdentitiesExhausted:
+                return
+            sent_at = time.time()
+            start = time.perf_counter()
+            response = None
+            try:
+                response = policy_post(
+                    policy, session, url_type, url, [transaction_number], body, timeout, body_modes
+                )
+            except (requests.RequestException, CircuitOpenError):
+                status_code = None
+                stats.record_error(time.perf_counter() - start)
+            else:
+                status_code = response.status_code
+                stats.record(status_code, time.perf_counter() - start, response.timings)
+            profile_send(building, start, response)
+            if journal is not None:
+                journal.record(
+                    run_id, [transaction_number], [registration_number], body, url_type, url, status_code,
+                    time.perf_counter() - start,
+                )
+            if capture is not None:
+                capture.record(fields, url_type, sent_at, status_code, time.perf_counter() - start)
+
+    stats.start()
+    if duration is not None:
+        deadline = stats.started + duration
+    threads = [threading.Thread(target=send_loop, daemon=True) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats.stop()
+    stats.connections = sessions.stats(url_type)
+    stats.resilience = policy.stats() if policy is not None else None
+    stats.images = images.stats() if images is not None else None
+    stats.body = body_modes.stats(url_type)
+    return stats
+
+
+def run_load_batched(url_type, identity, total=None, concurrency=1, duration=None, timeout=40, sessions=None,
+                     images=None, max_count=50, max_bytes=1024 * 1024, max_wait=1.0, results_file=None,
+                     ids=None, url=None, policy=None, journal=None, run_id=None, identities=None):
+    url, offence_id = resolve_endpoint(url_type, url)
+    if total is None and duration is None and identities is None:
+        total = 1
+    sessions = sessions or SessionPool(pool_size=concurrency)
+    session = sessions.session(url_type)
+    factory = NoticeFactory(offence_id, identity, images, ids, identities)
+    stats = LoadStats(url_type)
+    batches = queue.Queue(maxsize=max(1, concurrency) * 2)
+    results_lock = threading.Lock()
+    registrations = {}
+
+    def record_results(batch, status_code, parsed, latency):
+        if journal is not None:
+            journal.record(
+                run_id,
+                batch.transaction_numbers,
+                [registrations.pop(number, None) for number in batch.transaction_numbers],
+                batch.body,
+                url_type,
+                url,
+                status_code,
+                latency,
+            )
+        results = map_batch_response(batch.transaction_numbers, parsed)
+        itemised = sum(
+            1 for number in batch.transaction_numbers
+            if results[number] is not None and results[number] is not parsed
+        )
+        stats.record_batch(len(batch), itemised)
+        if results_file is not None:
+            lines = "".join(
+                json.dumps({"transactionNo": number, "status": status_code, "result": results[number]}) + "\n"
+                for number in batch.transaction_numbers
+            )
+            with results_lock:
+                results_file.write(lines)
+
+    def send_loop():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            start = time.perf_counter()
+            try:
+                response = policy_post(
+                    policy, session, url_type, url, batch.transaction_numbers, batch.body, timeout
+                )
+            except (requests.RequestException, CircuitOpenError) as e:
+                stats.record_error(time.perf_counter() - start)
+                record_results(batch, None, str(e), time.perf_counter() - start)
+                continue
+            latency = time.perf_counter() - start
+            stats.record(response.status_code, latency, response.timings)
+            parsing = time.perf_counter()
+            try:
+                parsed = response.json()
+            except ValueError:
+                parsed = response.text
+            profiler = _profiler
+            if profiler is not None:
+                profiler.span("send", start, parsing, phase_args(response.timings))
+                profiler.span("parse", parsing)
+            record_results(batch, response.status_code, parsed, latency)
+
+    threads = [threading.Thread(target=send_loop, daemon=True) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    batcher = NoticeBatcher(batches.put, max_count=max_count, max_bytes=max_bytes, max_wait=max_wait)
+    stats.start()
+    deadline = stats.started + duration if duration is not None else None
+    produced = 0
+    while (total is None or produced < total) and (deadline is None or time.perf_counter() < deadline):
+        building = time.perf_counter()
+        try:
+            (transaction_number, registration_number, _), notice = factory.render_notice()
+        except IdentitiesExhausted:
+            break
+        if journal is not None:
+            registrations[transaction_number] = registration_number
+        batcher.add(transaction_number, notice)
+        produced += 1
+        if _profiler is not None:
+            _profiler.span("build", building)
+    batcher.close()
+    for _ in threads:
+        batches.put(None)
+    for thread in threads:
+        thread.join()
+    stats.stop()
+    stats.connections = sessions.stats(url_type)
+    stats.resilience = policy.stats() if policy is not None else None
+    stats.images = images.stats() if images is not None else None
+    return stats
+
+
+def run_load_async(url_type, identity, total=None, concurrency=1, duration=None, timeout=40, keep_alive=True,
+                   images=None, ids=None, url=None, journal=None, run_id=None, identities=None, prewarm=False,
+                   body_modes=None, capture=None):
+    url, offence_id = resolve_endpoint(url_type, url)
+    body_modes = body_modes or BodyModes()
+    if total is None and duration is None and identities is None:
+        total = 1
+    factory = NoticeFactory(offence_id, identity, images, ids, identities)
+    stats = LoadStats(url_type)
+    client = AsyncHTTPClient(max_connections=concurrency, keep_alive=keep_alive)
+    counter = itertools.count()
+
+    async def send_loop(deadline):
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if total is not None and next(counter) >= total:
+                return
+            building = time.perf_counter()
+            try:
+                (transaction_number, registration_number, _), body, fields = factory.render_send()
+            except IdentitiesExhausted:
+                return
+            sent_at = time.time()
+            start = time.perf_counter()
+            response = None
+            try:
+                response = await client.post_parts(url, body, url_type, body_modes, timeout)
+            except AsyncTransportError:
+                status_code = None
+                stats.record_error(time.perf_counter() - start)
+            else:
+                status_code = response.status_code
+                stats.record(status_code, time.perf_counter() - start, response.timings)
+            profile_send(building, start, response)
+            if journal is not None:
+                journal.record(
+                    run_id, [transaction_number], [registration_number], body, url_type, url, status_code,
+                    time.perf_counter() - start,
+                )
+            if capture is not None:
+                capture.record(fields, url_type, sent_at, status_code, time.perf_counter() - start)
+
+    async def run():
+        if prewarm:
+            await client.prewarm(url, concurrency)
+        stats.start()
+        deadline = stats.started + duration if duration is not None else None
+        try:
+            await asyncio.gather(*(send_loop(deadline) for _ in range(max(1, concurrency))))
+        finally:
+            client.close()
+        stats.stop()
+
+    asyncio.run(run())
+    stats.connections = client.stats()
+    stats.images = images.stats() if images is not None else None
+    stats.body = body_modes.stats(url_type)
+    return stats
+
+
+# Sharded load: each shard process builds and sends its share of the notices
+# with an ID range of its own, so payload encoding and TLS use every core
+SHARD_ID_RANGE = 10 ** 9
+SHARD_START_TIMEOUT = 60
+
+
+def run_shard(index, ready, results, engine, options, policy_options=None, pool_size=None, keep_alive=True,
+              prewarm=False):
+    try:
+        policy = None
+        if engine == "asyncio":
+            runner = functools.partial(run_load_async, keep_alive=keep_alive, prewarm=prewarm)
+        else:
+            policy = ResiliencePolicy(**policy_options) if policy_options is not None else None
+            sessions = SessionPool(pool_size=pool_size or options["concurrency"], keep_alive=keep_alive)
+            if prewarm:
+                sessions.prewarm(
+                    options["url_type"], resolve_endpoint(options["url_type"], options["url"])[0],
+                    options["concurrency"],
+                ).result()
+            runner = functools.partial(run_load, sessions=sessions, policy=policy)
+        ready.wait(SHARD_START_TIMEOUT)
+        stats = runner(**options)
+        if policy is not None:
+            policy.close()
+    except BaseException as e:
+        results.put((index, None, f"{type(e).__name__}: {e}", None))
+        # Releases the parent and the other shards if this one never got to the start
+        ready.abort()
+        raise
+    results.put((index, stats, None, options["ids"].position))
+
+
+def run_load_sharded(url_type, identity, processes=2, total=None, concurrency=1, duration=None, timeout=40,
+                     images=None, ids=None, url=None, engine="threads", policy_options=None, pool_size=None,
+                     keep_alive=True, prewarm=False, body_modes=None):
+    # concurrency is per shard. Images are an ImageCorpus, moved into shared memory
+    # for the run; the shard processes are spawned, so nothing else is inherited
+    url, _ = resolve_endpoint(url_type, url)
+    if total is None and duration is None:
+        total = 1
+    if total is not None:
+        shares = [total // processes + (1 if index < total % processes else 0) for index in range(processes)]
+    else:
+        shares = [None] * processes
+    ids = ids if ids is not None else id_generator()
+    # Interleaved, the first total % processes shards get the extra numbers, as in shares.
+    # A run bounded by duration claims SHARD_ID_RANGE per shard and afterwards
+    # hands back whatever the shards did not get to
+    claimed = ids.claim_range(total if total is not None else SHARD_ID_RANGE * processes)
+    ranges = claimed.interleave(processes)
+    shared = SharedImages.from_corpus(images) if images is not None else None
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(processes + 1)
+    results = context.Queue()
+    shards = []
+    try:
+        for index, (share, id_range) in enumerate(zip(shares, ranges)):
+            options = {
+                "url_type": url_type, "identity": identity, "total": share, "concurrency": concurrency,
+                "duration": duration, "timeout": timeout, "images": shared, "ids": id_range, "url": url,
+                "body_modes": body_modes,
+            }
+            shard = context.Process(
+                target=run_shard,
+                args=(index, ready, results, engine, options, policy_options, pool_size, keep_alive, prewarm),
+                name=f"yarc-shard-{index}",
+                daemon=True,
+            )
+            shard.start()
+            shards.append(shard)
+        stats = LoadStats(url_type)
+        collected = {}
+        try:
+            ready.wait(SHARD_START_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+        stats.start()
+        while len(collected) < processes:
+            try:
+                index, shard_stats, error, position = results.get(timeout=1)
+            except queue.Empty:
+                if not any(shard.is_alive() for shard in shards):
+                    break
+                continue
+            collected[index] = (shard_stats, error, position)
+        stats.stop()
+    finally:
+        for shard in shards:
+            shard.join(timeout=5)
+            if shard.is_alive():
+                shard.terminate()
+        if shared is not None:
+            shared.close()
+    failures = [
+        f"shard {index}: {collected[index][1] if index in collected else 'exited without a result'}"
+        for index in range(processes)
+        if index not in collected or collected[index][0] is None
+    ]
+    if failures:
+        raise RuntimeError("Sharded run failed (" + "; ".join(failures) + ")")
+    if total is None:
+        ids.unclaim(max(position for _, _, position in collected.values()), claimed.stop)
+    stats.dns = None
+    stats.shards = []
+    stats.short_shards = []
+    images_served = 0
+    for index in range(processes):
+        shard_stats = collected[index][0]
+        stats.merge(shard_stats)
+        stats.shards.append(shard_stats.total / shard_stats.elapsed if shard_stats.elapsed > 0 else 0.0)
+        if shares[index] is not None and shard_stats.total < shares[index]:
+            stats.short_shards.append((index, shard_stats.total, shares[index]))
+        if shard_stats.images:
+            images_served += shard_stats.images["hits"]
+    if shared is not None:
+        stats.images = dict(shared.stats(), hits=images_served, hit_rate=1.0 if images_served else 0.0)
+    return stats
+
+
+def run_load_rate(url_type, identity, rate, duration=None, total=None, concurrency=1, timeout=40, sessions=None,
+                  images=None, ids=None, url=None, policy=None, journal=None, run_id=None, identities=None,
+                  body_modes=None, capture=None, max_in_flight=None):
+    # Sends are dispatched at their scheduled time whether or not earlier ones have
+    # finished, and latency runs from the scheduled time, so a stalled server shows
+    # up in the tail instead of silently lowering the send rate. Up to max_in_flight
+    # sends (default: rate_capacity, and at least concurrency) may be outstanding;
+    # sends due beyond that, or still unsent at the deadline, are counted as dropped
+    url, offence_id = resolve_endpoint(url_type, url)
+    if total is None and duration is None and identities is None:
+        raise ValueError("A rate profile needs --requests, --duration or --identities")
+    profile = parse_rate_profile(rate)
+    max_in_flight = max_in_flight or rate_capacity(profile, timeout, concurrency)
+    sessions = sessions or SessionPool(pool_size=max_in_flight)
+    session = sessions.session(url_type)
+    body_modes = body_modes or BodyModes()
+    factory = NoticeFactory(offence_id, identity, images, ids, identities)
+    stats = LoadStats(url_type)
+    schedule = RateSchedule(profile, duration, total)
+    exhausted = threading.Event()
+
+    def send(due):
+        dispatched = time.perf_counter()
+        try:
+            (transaction_number, registration_number, _), body, fields = factory.render_send()
+        except IdentitiesExhausted:
+            exhausted.set()
+            return
+        start = time.perf_counter()
+        response = None
+        try:
+            response = policy_post(
+                policy, session, url_type, url, [transaction_number], body, timeout, body_modes
+            )
+        except (requests.RequestException, CircuitOpenError):
+            status_code = None
+            stats.record_error(time.perf_counter() - due)
+        else:
+            status_code = response.status_code
+            timings = dict(response.timings, queue=dispatched - due)
+            stats.record(status_code, time.perf_counter() - due, timings)
+        profile_send(dispatched, start, response)
+        if journal is not None:
+            journal.record(
+                run_id, [transaction_number], [registration_number], body, url_type, url, status_code,
+                time.perf_counter() - due,
+            )
+        if capture is not None:
+            # The scheduled time, so a replay keeps the profile's arrivals
+            capture.record(
+                fields, url_type, wall_start + (due - stats.started), status_code, time.perf_counter() - due
+            )
+
+    dispatcher = OpenLoopDispatcher(send, max_in_flight)
+    stats.start()
+    wall_start = time.time()
+    deadline = stats.started + duration if duration is not None else None
+    try:
+        for offset in schedule:
+            if exhausted.is_set():
+                break
+            due = stats.started + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if deadline is not None and time.perf_counter() >= deadline + schedule.IDLE_STEP:
+                # Nothing is sent after the deadline (give or take a sleep overshooting
+                # the last due time); the rest of the schedule is dropped
+                dispatcher.drop(1 + sum(1 for _ in schedule))
+                break
+            dispatcher.dispatch(due)
+    finally:
+        dispatcher.close()
+    stats.stop()
+    stats.rate = dict(dispatcher.stats(), target=schedule.target_rate(), scheduled=schedule.scheduled)
+    stats.connections = sessions.stats(url_type)
+    stats.resilience = policy.stats() if policy is not None else None
+    stats.images = images.stats() if images is not None else None
+    stats.body = body_modes.stats(url_type)
+    return stats
+
+
+def replay_capacity(records, speed, timeout, minimum=1):
+    # The most captured sends due within one timeout of each other at speed,
+    # which is as many as a replay can have in flight at once
+    if speed <= 0:
+        return minimum
+    most = 0
+    first = 0
+    for last, record in enumerate(records):
+        while (record["at"] - records[first]["at"]) / speed > timeout:
+            first += 1
+        most = max(most, last - first + 1)
+    return max(minimum, most)
+
+
+def run_replay(records, url_type, speed=1.0, concurrency=32, timeout=40, sessions=None, images=None, ids=None,
+               url=None, policy=None, body_modes=None, capture=None, max_in_flight=None):
+    # Re-sends captured notices (see read_capture) to url_type. Every notice gets
+    # fresh IDs and the target URL type's offence ID; identities, dates and images
+    # (matched by name in images, or the next one when the name is unknown) are
+    # kept. Sends are due at their captured offsets divided by speed and are
+    # dispatched open-loop as in run_load_rate, with up to max_in_flight (default:
+    # replay_capacity) outstanding and latency running from the due time; speed 0
+    # sends as fast as concurrency senders allow
+    url, offence_id = resolve_endpoint(url_type, url)
+    max_in_flight = max_in_flight or replay_capacity(records, speed, timeout, concurrency)
+    sessions = sessions or SessionPool(pool_size=max_in_flight)
+    session = sessions.session(url_type)
+    body_modes = body_modes or BodyModes()
+    ids = ids if ids is not None else id_generator()
+    stats = LoadStats(url_type)
+
+    def send(job):
+        due, record = job
+        dispatched = time.perf_counter()
+        notices = []
+        captured = []
+        identities = []
+        for notice in record["notices"]:
+            template = compile_template(offence_id, notice.get("identity", record["identity"]))
+            identities.append(template.identity)
+            new_ids = ids.next_ids()
+            image_name = image1 = None
+            if images is not None:
+                image_name = notice.get("image")
+                image1 = images.named(image_name) if image_name else None
+                if image1 is None:
+                    image_name, image1 = images.next_named()
+            notices.append(template.render_notice_parts(
+                *new_ids, notice["voilationTime"], notice["actionTime"], image1=image1
+            ))
+            captured.append(new_ids + (notice["voilationTime"], notice["actionTime"], image_name))
+        transaction_numbers = [notice[0] for notice in captured]
+        due = dispatched if due is None else due
+        sent_at = time.time() - (time.perf_counter() - due)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = policy_post(
+                policy, session, url_type, url, transaction_numbers, batch_parts(notices), timeout, body_modes
+            )
+        except (requests.RequestException, CircuitOpenError):
+            status_code = None
+            stats.record_error(time.perf_counter() - due)
+        else:
+            status_code = response.status_code
+            stats.record(status_code, time.perf_counter() - due, dict(response.timings, queue=start - due))
+        profile_send(dispatched, start, response)
+        if capture is not None:
+            fields = capture_fields(offence_id, record["identity"], captured, identities)
+            capture.record(fields, url_type, sent_at, status_code, time.perf_counter() - due)
+
+    first = records[0]["at"] if records else 0.0
+    if speed <= 0:
+        senders = SendScheduler(send, workers=max(1, concurrency), queue_size=max(1, concurrency) * 4)
+        stats.start()
+        for record in records:
+            senders.submit((None, record), block=True)
+        senders.join()
+        senders.close(timeout=timeout)
+        stats.stop()
+    else:
+        dispatcher = OpenLoopDispatcher(send, max_in_flight)
+        stats.start()
+        try:
+            for record in records:
+                due = stats.started + (record["at"] - first) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                dispatcher.dispatch((due, record))
+        finally:
+            dispatcher.close()
+        stats.stop()
+        span = (records[-1]["at"] - first) / speed if records else 0.0
+        stats.rate = dict(
+            dispatcher.stats(), target=len(records) / span if span > 0 else 0.0, scheduled=len(records)
+        )
+    stats.connections = sessions.stats(url_type)
+    stats.resilience = policy.stats() if policy is not None else None
+    stats.images = images.stats() if images is not None else None
+    stats.body = body_modes.stats(url_type)
+    return stats
+
+
+def compare_replay(records, stats):
+    # Status classes and latency of the captured sends next to the replay's, with
+    # the largest gap between the two latency distributions (the Kolmogorov-Smirnov
+    # statistic, taken over the histogram buckets)
+    original = LatencyHistogram()
+    statuses = {}
+    for record in records:
+        key = status_class(record["status"]) if record.get("status") is not None else "errors"
+        statuses[key] = statuses.get(key, 0) + 1
+        if record.get("latency") is not None:
+            original.record(record["latency"])
+    replay = stats.metrics.histogram(stats.url_type)
+    replayed = dict(stats.status_counts, errors=stats.errors)
+    span = records[-1]["at"] - records[0]["at"] if records else 0.0
+    lines = [
+        f"Captured:     {len(records)} sends over {span:.2f} s, replayed in {stats.elapsed:.2f} s",
+        f"{'':<14}{'original':>12}{'replay':>12}{'change':>10}",
+    ]
+
+    def row(label, before, after, spec="d"):
+        change = f"{(after - before) / before:+.1%}" if before else ""
+        lines.append(f"{label:<14}{before:>12{spec}}{after:>12{spec}}{change:>10}")
+
+    for key in sorted(set(statuses) | {key for key, count in replayed.items() if count}):
+        row(key, statuses.get(key, 0), replayed.get(key, 0))
+    for q in Metrics.QUANTILES:
+        row(f"p{q:g} ms", original.percentile(q) * 1000, replay.percentile(q) * 1000, ".1f")
+    row("mean ms", original.mean * 1000, replay.mean * 1000, ".1f")
+    row("max ms", (original.max or 0.0) * 1000, (replay.max or 0.0) * 1000, ".1f")
+    if original.count and replay.count:
+        gap = 0.0
+        before = after = 0
+        for original_count, replay_count in zip(original.counts, replay.counts):
+            before += original_count
+            after += replay_count
+            gap = max(gap, abs(before / original.count - after / replay.count))
+        lines.append(f"Latency KS:   {gap:.3f} (0 = same distribution, 1 = disjoint)")
+    return "\n".join(lines)
+
+
+def run_load_thread_per_request(url_type, identity, total, concurrency=1, timeout=40, url=None, ids=None):
+    # The GUI's original model: a new thread and a fresh connection for every send
+    url, offence_id = resolve_endpoint(url_type, url)
+    ids = ids if ids is not None else id_generator()
+    violation_time, action_time = auto_dates()
+    stats = LoadStats(url_type)
+    slots = threading.BoundedSemaphore(max(1, concurrency))
+
+    def send(payload):
+        start = time.perf_counter()
+        try:
+            response = requests.post(url, json=payload, timeout=timeout)
+        except requests.RequestException:
+            stats.record_error(time.perf_counter() - start)
+        else:
+            stats.record(response.status_code, time.perf_counter() - start)
+        finally:
+            slots.release()
+
+    stats.start()
+    threads = []
+    for _ in range(total):
+        slots.acquire()
+        payload = build_payload([
+            build_notice(offence_id, *ids.next_ids(), identity, violation_time, action_time)
+        ])
+        thread = threading.Thread(target=send, args=(payload,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    stats.stop()
+    return stats
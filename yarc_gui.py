@@ -0,0 +1,1208 @@
+import sys
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QTextEdit, QLabel,
+    QFrame, QScrollArea, QComboBox, QDialog, QProgressBar, QSizePolicy, QFileDialog,
+    QSpinBox, QListView, QGraphicsOpacityEffect
+)
+from PyQt5.QtGui import QIcon, QIntValidator, QFontDatabase
+from PyQt5.QtCore import (
+    Qt, QPropertyAnimation, QVariantAnimation, QAbstractAnimation, QEasingCurve, QObject, QTimer,
+    pyqtSignal, QAbstractListModel, QModelIndex
+)
+import html
+import os
+import queue
+import threading
+import time
+#import resources_rc  # Uncomment if you are using a resource file
+from yarc_core import (
+    URL_TYPES, BODY_MODES, DEFAULT_CUSTOM_URL, RESPONSE_BYTE_CAP, SEND_WORKERS, SEND_QUEUE_SIZE,
+    SERVER_ERROR_STYLE, STATUS_STYLES, AsyncEngine, AsyncTransportError, BodyModes, CircuitOpenError, IdentityImport,
+    ImageCorpus, LatencyHistogram, Metrics, ResiliencePolicy, ResultRing, RollingStats, active_profiler,
+    phase_args, profiler_from_env, sparkline,
+    SendJob, SendScheduler, SessionPool, auto_dates, batch_parts, capitalize_first, capture_fields, compile_template,
+    fetch_response_view, id_generator, open_capture, open_journal, prepare_response_view, requests, asyncio,
+)
+
+DASHBOARD_HZ = 10
+STANDBY_INTERVAL_MS = 30000
+
+
+class ResponseLineModel(QAbstractListModel):
+    # Rows are exposed a chunk at a time through canFetchMore/fetchMore, and
+    # each row's text is sliced from the body only when the view paints it
+    FETCH_ROWS = 2000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.view = None
+        self.loaded = 0
+
+    def set_view(self, view):
+        self.beginResetModel()
+        self.view = view
+        self.loaded = min(len(view.lines), self.FETCH_ROWS) if view is not None else 0
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.view is not None and self.loaded < len(self.view.lines)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.view is None:
+            return
+        count = min(len(self.view.lines) - self.loaded, self.FETCH_ROWS)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid() and self.view is not None:
+            return self.view.line(index.row())
+        return None
+
+
+class ResponseViewer(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Full Response Body")
+        self.setGeometry(200, 200, 600, 400)
+        self.setModal(False)
+
+        layout = QVBoxLayout()
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.model = ResponseLineModel(self)
+        self.line_view = QListView()
+        self.line_view.setModel(self.model)
+        self.line_view.setUniformItemSizes(True)
+        self.line_view.setSelectionMode(QListView.ExtendedSelection)
+        self.line_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.line_view)
+
+        self.close_button = QPushButton("Close")
+        self.close_button.clicked.connect(self.hide)
+        layout.addWidget(self.close_button)
+
+        self.setLayout(layout)
+
+    def show_view(self, view):
+        self.model.set_view(view)
+        self.line_view.scrollToTop()
+        summary = f"{view.body_size} bytes, {len(view.lines)} lines"
+        if view.truncated:
+            summary += " (truncated, formatting skipped)"
+        self.summary_label.setText(summary)
+        self.show()
+        self.raise_()
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_C and event.modifiers() & Qt.ControlModifier:
+            rows = sorted(index.row() for index in self.line_view.selectionModel().selectedIndexes())
+            QApplication.clipboard().setText("\n".join(self.model.view.line(row) for row in rows))
+        else:
+            super().keyPressEvent(event)
+
+
+# Shared animation layer. Each (target, property) pair owns one animation that is
+# retargeted instead of stacked, fades go through an opacity effect rather than a
+# stylesheet per frame, and a probe animation records the spacing of animation
+# ticks as frame times while anything is moving
+class Animator(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.animations = {}
+        self.frames = LatencyHistogram()
+        self.last_frame = None
+        self.probe = QVariantAnimation(self)
+        self.probe.setStartValue(0.0)
+        self.probe.setEndValue(1.0)
+        self.probe.setDuration(1000)
+        self.probe.setLoopCount(-1)
+        self.probe.valueChanged.connect(self.frame)
+
+    def animation(self, target, name, duration):
+        key = (target, name)
+        animation = self.animations.get(key)
+        if animation is None:
+            animation = QPropertyAnimation(target, name, target)
+            animation.setEasingCurve(QEasingCurve.OutCubic)
+            animation.finished.connect(self.animation_finished)
+            target.destroyed.connect(lambda: self.animations.pop(key, None))
+            self.animations[key] = animation
+        animation.stop()
+        animation.setDuration(duration)
+        return animation
+
+    def start(self, animation):
+        animation.start()
+        if self.probe.state() != QAbstractAnimation.Running:
+            self.last_frame = None
+            self.probe.start()
+
+    def animation_finished(self):
+        if not any(animation.state() == QAbstractAnimation.Running for animation in self.animations.values()):
+            self.probe.stop()
+
+    def frame(self):
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frames.record(now - self.last_frame)
+        self.last_frame = now
+
+    def fade_in(self, widget, duration=500):
+        effect = widget.graphicsEffect()
+        if not isinstance(effect, QGraphicsOpacityEffect):
+            effect = QGraphicsOpacityEffect(widget)
+            widget.setGraphicsEffect(effect)
+        effect.setEnabled(True)
+        animation = self.animation(effect, b"opacity", duration)
+        if not animation.property("disables_effect"):
+            # A live effect renders the widget offscreen on every repaint, so it
+            # is switched off once the widget is fully opaque
+            animation.finished.connect(lambda: effect.setEnabled(False))
+            animation.setProperty("disables_effect", True)
+        animation.setStartValue(0.0)
+        animation.setEndValue(1.0)
+        self.start(animation)
+
+    def cancel(self, target, name):
+        animation = self.animations.get((target, name))
+        if animation is not None:
+            animation.stop()
+            self.animation_finished()
+
+    def scroll_target(self, scroll_bar):
+        # Where the scroll bar is heading, so repeated wheel steps accumulate
+        animation = self.animations.get((scroll_bar, b"value"))
+        if animation is not None and animation.state() == QAbstractAnimation.Running:
+            return animation.endValue()
+        return scroll_bar.value()
+
+    def scroll_to(self, scroll_bar, value, duration=250):
+        value = max(scroll_bar.minimum(), min(scroll_bar.maximum(), int(value)))
+        animation = self.animation(scroll_bar, b"value", duration)
+        if scroll_bar.value() == value:
+            return
+        animation.setStartValue(scroll_bar.value())
+        animation.setEndValue(value)
+        self.start(animation)
+
+    def frame_stats(self):
+        frames = self.frames
+        return {
+            "frames": frames.count,
+            "p50_ms": frames.percentile(50) * 1000,
+            "p99_ms": frames.percentile(99) * 1000,
+            "max_ms": (frames.max or 0.0) * 1000,
+        }
+
+
+class SmoothTextEdit(QTextEdit):
+    def __init__(self, parent=None, animator=None):
+        super().__init__(parent)
+        self.animator = animator or Animator(self)
+        self.scroll_duration = 250
+
+    def smooth_scroll(self, value):
+        self.animator.scroll_to(self.verticalScrollBar(), value, self.scroll_duration)
+
+    def setText(self, text):
+        super().setText(text)
+        self.smooth_scroll(self.verticalScrollBar().maximum())
+
+    def mousePressEvent(self, event):
+        super().mousePressEvent(event)
+        self.last_mouse_pos = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            delta = event.pos() - self.last_mouse_pos
+            scroll_bar = self.verticalScrollBar()
+            self.animator.cancel(scroll_bar, b"value")
+            scroll_bar.setValue(scroll_bar.value() - delta.y())
+            self.last_mouse_pos = event.pos()
+        super().mouseMoveEvent(event)
+
+    def wheelEvent(self, event):
+        scroll_step = event.angleDelta().y() / 120
+        self.smooth_scroll(self.animator.scroll_target(self.verticalScrollBar()) - scroll_step * 10)
+
+
+# Sender pool for the GUI; signals are emitted from the pool threads (or the
+# asyncio engine's loop) and delivered to the GUI thread by Qt
+class SendPool(QObject):
+    response_received = pyqtSignal(object, object)  # job, ResponseView
+    error = pyqtSignal(object, str)
+    changed = pyqtSignal()
+
+    def __init__(self, workers=4, queue_size=64, policy=None, journal=None, byte_cap=RESPONSE_BYTE_CAP,
+                 body_modes=None, capture=None):
+        super().__init__()
+        self.policy = policy or ResiliencePolicy()
+        self.journal = journal
+        self.capture = capture
+        self.byte_cap = byte_cap
+        self.body_modes = body_modes or BodyModes()
+        self.queue_size = queue_size
+        self.scheduler = SendScheduler(
+            self.send, workers, queue_size, on_change=self.changed.emit, on_error=self.failed
+        )
+        # asyncio jobs bypass the pool threads, which would cap them at the pool
+        # size; they wait on a per-engine semaphore on the engine's loop instead
+        self.lock = threading.Lock()
+        self.async_counts = {"queued": 0, "in_flight": 0, "completed": 0}
+        self.async_limit = None
+        self.gates = {}
+        # Read by the GUI's dashboard timer rather than signalled per result
+        self.results = ResultRing()
+
+    def submit(self, job):
+        if job.engine is None:
+            self.scheduler.submit(job)
+            return
+        with self.lock:
+            counts = self.async_counts
+            if counts["queued"] + counts["in_flight"] >= job.engine.max_in_flight + self.queue_size:
+                raise queue.Full()
+            counts["queued"] += 1
+            self.async_limit = job.engine.max_in_flight
+        job.engine.submit(self.send_async(job))
+        self.changed.emit()
+
+    def stats(self):
+        stats = self.scheduler.stats()
+        with self.lock:
+            counts = self.async_counts
+            if counts["queued"] or counts["in_flight"]:
+                stats["workers"] = self.async_limit
+            stats["queued"] += counts["queued"]
+            stats["in_flight"] += counts["in_flight"]
+            stats["completed"] += counts["completed"]
+        return stats
+
+    def attempt(self, job, timeout):
+        return fetch_response_view(
+            job.session, job.url, job.payload, timeout, job.transaction_numbers, self.byte_cap, job.url_type,
+            self.body_modes,
+        )
+
+    def attempt_async(self, job, timeout):
+        # The asyncio client has a single deadline covering connect and read
+        return job.engine.request(
+            job.url,
+            job.payload,
+            timeout=sum(timeout),
+            prepare=lambda response: prepare_response_view(response, job.transaction_numbers),
+            byte_cap=self.byte_cap,
+            url_type=job.url_type,
+            body_modes=self.body_modes,
+        )
+
+    def send(self, job):
+        job.started = time.perf_counter()
+        try:
+            view = self.policy.send(job.url_type, job.transaction_numbers, lambda timeout: self.attempt(job, timeout))
+        except (requests.RequestException, AsyncTransportError, CircuitOpenError) as e:
+            self.failed(job, e)
+        else:
+            self.received(job, view)
+
+    async def send_async(self, job):
+        gate = self.gates.get(job.engine)
+        if gate is None:
+            # Only touched from this engine's loop
+            gate = self.gates[job.engine] = asyncio.Semaphore(job.engine.max_in_flight)
+        try:
+            async with gate:
+                self.count_async("queued", "in_flight")
+                job.started = time.perf_counter()
+                try:
+                    view = await self.policy.send_async(
+                        job.url_type, job.transaction_numbers, lambda timeout: self.attempt_async(job, timeout)
+                    )
+                except Exception as e:
+                    # Not only transport errors: anything else would skip the count below
+                    self.failed(job, e)
+                else:
+                    self.received(job, view)
+                self.count_async("in_flight", "completed")
+        except asyncio.CancelledError:
+            # The engine was closed under a waiting or in-flight job
+            self.count_async("queued" if job.started is None else "in_flight", "completed")
+            raise
+
+    def count_async(self, source, target):
+        with self.lock:
+            self.async_counts[source] -= 1
+            self.async_counts[target] += 1
+        self.changed.emit()
+
+    def received(self, job, view):
+        job.finished = time.perf_counter()
+        profiler = active_profiler()
+        if profiler is not None:
+            profiler.span("send", job.started, job.finished, phase_args(view.timings))
+        self.results.push(view.status_code, job.elapsed())
+        self.journal_send(job, view.status_code)
+        self.response_received.emit(job, view)
+
+    def failed(self, job, error):
+        job.finished = time.perf_counter()
+        self.results.push(None, job.elapsed())
+        self.journal_send(job, None)
+        self.error.emit(job, f"An error occurred: {str(error)}")
+
+    def journal_send(self, job, status_code):
+        if self.journal is not None:
+            self.journal.record(
+                None, job.transaction_numbers, job.registration_numbers, job.payload, job.url_type, job.url,
+                status_code, job.elapsed(),
+            )
+        if self.capture is not None and job.fields is not None:
+            self.capture.record(job.fields, job.url_type, time.time() - job.elapsed(), status_code, job.elapsed())
+
+    def close(self):
+        self.scheduler.close()
+        self.policy.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self.capture is not None:
+            self.capture.close()
+
+
+class ChallanSender(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.sessions = SessionPool()
+        self.engine = None
+        # Opt-in, as on the command line: YARC_JOURNAL=journal.sqlite3 journals every
+        # send and YARC_CAPTURE=sends.jsonl records every send for the replay command
+        self.send_pool = SendPool(
+            SEND_WORKERS, SEND_QUEUE_SIZE, journal=open_journal(os.environ.get("YARC_JOURNAL")),
+            capture=open_capture(os.environ.get("YARC_CAPTURE")),
+        )
+        self.send_pool.response_received.connect(self.on_response_received)
+        self.send_pool.error.connect(self.on_request_error)
+        self.send_pool.changed.connect(self.on_queue_changed)
+        self.images = None
+        self.identities = None
+        self.batch_transactions = []
+        self.metrics = Metrics()
+        self.response_viewer = None
+        self.animator = Animator(self)
+        # Restarting a zero-interval single shot timer coalesces the scroll
+        # requests of responses that arrive within the same event loop pass
+        self.scroll_timer = QTimer(self)
+        self.scroll_timer.setSingleShot(True)
+        self.scroll_timer.setInterval(0)
+        self.scroll_timer.timeout.connect(lambda: self.scroll_to_widget(self.request_details))
+        # While sends are outstanding the widgets are refreshed at DASHBOARD_HZ
+        # from the result ring and the latest response, not once per response.
+        # A response or error that arrives more than a tick after the last one
+        # shown is still shown at once
+        self.rolling = RollingStats()
+        self.dashboard_timer = QTimer(self)
+        self.dashboard_timer.setInterval(1000 // DASHBOARD_HZ)
+        self.dashboard_timer.timeout.connect(self.refresh_dashboard)
+        self.idle_since = None
+        # Keeps an idle connection open to the selected endpoint between sends.
+        # Nothing is pre-connected until the user picks an endpoint, so launching
+        # the app never opens connections to the production URL by itself
+        self.endpoint_chosen = False
+        self.standby_timer = QTimer(self)
+        self.standby_timer.setInterval(STANDBY_INTERVAL_MS)
+        self.standby_timer.timeout.connect(self.prewarm)
+        self.prewarming = {}
+        self.first_sends = {}
+        self.pending_response = None
+        self.pending_error = None
+        self.shown_at = float("-inf")
+        self.first_paint = None
+        self.profiler, self.profile_path = profiler_from_env()
+        if self.profiler is not None:
+            self.profiler.start()
+        self.init_ui()
+        self.set_auto_dates()
+        self.update_random_ids()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint is None:
+            self.first_paint = time.perf_counter()
+            # Used by the startup benchmark: report the first paint and exit
+            if os.environ.get("YARC_EXIT_AFTER_FIRST_PAINT"):
+                print(f"first-paint {self.first_paint}", flush=True)
+                QTimer.singleShot(0, QApplication.instance().quit)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        QTimer.singleShot(0, self.center)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        QTimer.singleShot(0, self.center)
+
+    def closeEvent(self, event):
+        self.send_pool.close()
+        if self.engine is not None:
+            self.engine.close()
+        self.sessions.close()
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler.write(self.profile_path)
+            self.profiler = None
+        super().closeEvent(event)
+
+    def center(self):
+        screen_geometry = QApplication.desktop().availableGeometry()
+        widget_geometry = self.geometry()
+        x = (screen_geometry.width() - widget_geometry.width()) / 2
+        y = (screen_geometry.height() - widget_geometry.height()) / 2
+        self.move(int(x), int(y))
+
+    def init_ui(self):
+        self.setWindowTitle("Challan Checker")
+        self.setWindowIcon(QIcon(":/logo.png"))  # If using a resource file
+        self.resize(800, 695)
+        self.center()
+
+        self.main_layout = QVBoxLayout()
+        self.setLayout(self.main_layout)
+
+        self.header_label = QLabel("Challan Checker for Himachal Pradesh")
+        self.header_label.setStyleSheet(
+            """
+            font-size: 24px;
+            font-weight: bold;
+            color: #007bff;
+            padding: 10px;
+            border-bottom: 2px solid #007bff;
+            background-color: #f0f8ff;
+            text-align: center;
+            width: 100%;
+        """
+        )
+        self.main_layout.addWidget(self.header_label)
+
+        self.container_widget = QWidget()
+        self.container_layout = QVBoxLayout(self.container_widget)
+        self.container_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.scroll_area = QScrollArea()
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_area.setWidget(self.container_widget)
+        self.main_layout.addWidget(self.scroll_area)
+
+        self.setStyleSheet(
+            """
+            QWidget {
+                background-color: #f0f0f0;
+                font-size: 14px;
+            }
+            QLabel {
+                color: #333;
+                font-weight: bold;
+                width: 150px;
+                text-align: right;
+                margin-right: 10px;
+            }
+            QLabel#url-label {
+                font-size: 16px;
+                color: #007bff;
+                background-color: #f0f8ff;
+                padding: 5px;
+                border: 1px solid #007bff;
+                border-radius: 5px;
+            }
+            QLineEdit, QTextEdit {
+                padding: 10px;
+                border-radius: 5px;
+                border: 1px solid #aaa;
+                font-size: 14px;
+                background-color: #f9f9f9;
+                min-width: 300px;
+            }
+            QTextEdit {
+                min-height: 100px;
+                max-height: 300px;
+            }
+            QPushButton {
+                background-color: #007bff;
+                color: white;
+                border-radius: 5px;
+                padding: 10px;
+                border: none;
+                font-size: 14px;
+                margin-top: 10px;
+            }
+            QPushButton:hover {
+                background-color: #0056b3;
+            }
+            QFrame {
+                border-radius: 5px;
+                padding: 10px;
+                margin: 10px 0;
+                border: 1px solid #ddd;
+            }
+            #url-frame {
+                background-color: #e6f7ff;
+                border-bottom: 4px solid #66cdaa;
+            }
+            #details-frame {
+                background-color: #fff5e6;
+                border-bottom: 4px solid #ff9900;
+            }
+            #response-frame {
+                background-color: #e6ffe6;
+                border-bottom: 4px solid #00cc66;
+            }
+            #dashboard-frame {
+                background-color: #eef4ff;
+                border-bottom: 4px solid #3366cc;
+            }
+            #progress-frame {
+                background-color: #f0f0f0;
+            }
+            QComboBox {
+                padding: 5px 10px;
+                border-radius: 5px;
+                border: 1px solid #aaa;
+                background-color: #f9f9f9;
+                font-size: 16px;
+            }
+            QComboBox::drop-down {
+                subcontrol-origin: padding;
+                subcontrol-position: top right;
+                width: 15px;
+                border-left-width: 1px;
+                border-left-color: #ddd;
+                border-left-style: solid;
+            }
+            QComboBox::down-arrow {
+                image: url(:/down-arrow.png);
+            }
+            QComboBox QAbstractItemView {
+                border: 1px solid #ddd;
+                background-color: #ffffff;
+                selection-background-color: #007bff;
+                selection-color: white;
+                font-size: 20px;
+                font-weight: bold;
+            }
+            QComboBox::item {
+                padding: 5px 10px;
+            }
+            QComboBox::item:selected {
+                background-color: #007bff;
+                color: white;
+            }
+            QLabel#copyright {
+                color: #007bff;
+                font-size: 12px;
+                font-family: 'Arial', sans-serif;
+                font-style: italic;
+                text-align: right;
+                margin-right: 10px;
+                margin-bottom: 10px;
+                background-color: #f0f0f0;
+                padding: 5px;
+                border-radius: 5px;
+                border: 1px solid #007bff;
+            }
+            QScrollBar:vertical {
+                border: 1px solid #ddd;
+                background: #f1f1f1;
+                width: 16px;
+            }
+            QScrollBar::handle:vertical {
+                background: #007bff;
+                border-radius: 5px;
+            }
+            QScrollBar::handle:vertical:hover {
+                background: #0056b3;
+            }
+            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
+                border: 1px solid #ddd;
+                background: #f1f1f1;
+                height: 10px;
+            }
+            QScrollBar::add-line:vertical {
+                border-bottom: 1px solid #ddd;
+                border-top-left-radius: 5px;
+                border-top-right-radius: 5px;
+            }
+            QScrollBar::sub-line:vertical {
+                border-top: 1px solid #ddd;
+                border-bottom-left-radius: 5px;
+                border-bottom-right-radius: 5px;
+            }
+        """
+        )
+
+        # URL Type Selection
+        self.url_type_frame = QFrame()
+        self.url_type_frame.setObjectName("url-frame")
+        self.url_type_layout = QHBoxLayout()
+        self.url_type_frame.setLayout(self.url_type_layout)
+        self.url_type_label = QLabel("Select URL Type:")
+        self.url_type_label.setObjectName("url-label")
+        self.url_type_combo = QComboBox()
+        self.url_type_combo.addItems([label for _, label, _, _ in URL_TYPES])
+        self.url_type_combo.currentIndexChanged.connect(self.update_url)
+        self.url_type_combo.activated.connect(self.choose_endpoint)
+        self.url_type_layout.addWidget(self.url_type_label)
+        self.url_type_layout.addWidget(self.url_type_combo)
+        self.custom_url_input = QLineEdit(DEFAULT_CUSTOM_URL)
+        self.custom_url_input.hide()
+        self.custom_url_input.editingFinished.connect(self.choose_endpoint)
+        self.url_type_layout.addWidget(self.custom_url_input)
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItems(["Worker threads", "asyncio"])
+        self.engine_combo.currentIndexChanged.connect(self.prewarm)
+        self.url_type_layout.addWidget(QLabel("Engine:"))
+        self.url_type_layout.addWidget(self.engine_combo)
+        # Per URL type; shows the selected type's mode, which a gzip refusal turns into stream
+        self.body_mode_combo = QComboBox()
+        self.body_mode_combo.addItems(BODY_MODES)
+        self.body_mode_combo.currentTextChanged.connect(
+            lambda mode: self.send_pool.body_modes.set(URL_TYPES[self.url_type_combo.currentIndex()][0], mode)
+        )
+        self.url_type_layout.addWidget(QLabel("Body:"))
+        self.url_type_layout.addWidget(self.body_mode_combo)
+        self.batch_size_spin = QSpinBox()
+        self.batch_size_spin.setRange(1, 500)
+        self.url_type_layout.addWidget(QLabel("Notices per Send:"))
+        self.url_type_layout.addWidget(self.batch_size_spin)
+        self.container_layout.addWidget(self.url_type_frame)
+
+        # User Details Frame
+        self.details_frame = QFrame()
+        self.details_frame.setObjectName("details-frame")
+        self.details_layout = QVBoxLayout()
+        self.details_frame.setLayout(self.details_layout)
+
+        self.user_id_input = QLineEdit()
+        self.district_id_input = QLineEdit()
+        self.location_input = QLineEdit()
+        self.district_input = QLineEdit()
+        self.off_code_input = QLineEdit()
+        int_validator = QIntValidator(0, 9999, self)
+
+        self.user_id_input.setValidator(int_validator)
+        self.district_id_input.setValidator(int_validator)
+        self.off_code_input.setValidator(int_validator)
+
+        fields = [
+            ("User ID:", self.user_id_input),
+            ("District ID:", self.district_id_input),
+            ("Location:", self.location_input),
+            ("District:", self.district_input),
+            ("RTO circle Number:", self.off_code_input),
+        ]
+        for label_text, field in fields:
+            field_layout = QHBoxLayout()
+            label = QLabel(label_text)
+            field_layout.addWidget(label)
+            field_layout.addWidget(field)
+            field_layout.setStretch(1, 1)
+            field_layout.setContentsMargins(0, 0, 0, 0)
+            self.details_layout.addLayout(field_layout)
+
+        self.image_dir_input = QLineEdit()
+        self.image_dir_input.setPlaceholderText("Built-in sample image")
+        self.image_browse_button = QPushButton("Browse...")
+        self.image_browse_button.clicked.connect(self.choose_image_dir)
+        image_layout = QHBoxLayout()
+        image_layout.addWidget(QLabel("Evidence Images:"))
+        image_layout.addWidget(self.image_dir_input)
+        image_layout.addWidget(self.image_browse_button)
+        image_layout.setStretch(1, 1)
+        image_layout.setContentsMargins(0, 0, 0, 0)
+        self.details_layout.addLayout(image_layout)
+
+        self.identity_file_input = QLineEdit()
+        self.identity_file_input.setPlaceholderText("Use the fields above")
+        self.identity_browse_button = QPushButton("Browse...")
+        self.identity_browse_button.clicked.connect(self.choose_identity_file)
+        identity_file_layout = QHBoxLayout()
+        identity_file_layout.addWidget(QLabel("Identity File:"))
+        identity_file_layout.addWidget(self.identity_file_input)
+        identity_file_layout.addWidget(self.identity_browse_button)
+        identity_file_layout.setStretch(1, 1)
+        identity_file_layout.setContentsMargins(0, 0, 0, 0)
+        self.details_layout.addLayout(identity_file_layout)
+
+        self.container_layout.addWidget(self.details_frame)
+
+        # Dashboard Frame
+        self.dashboard_frame = QFrame()
+        self.dashboard_frame.setObjectName("dashboard-frame")
+        self.dashboard_layout = QVBoxLayout()
+        self.dashboard_frame.setLayout(self.dashboard_layout)
+        self.throughput_label = QLabel()
+        self.status_rates_label = QLabel()
+        self.status_rates_label.setTextFormat(Qt.RichText)
+        self.sparkline_label = QLabel()
+        self.sparkline_label.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.dashboard_layout.addWidget(self.throughput_label)
+        self.dashboard_layout.addWidget(self.status_rates_label)
+        self.dashboard_layout.addWidget(self.sparkline_label)
+        self.container_layout.addWidget(self.dashboard_frame)
+        self.render_dashboard(self.rolling.snapshot())
+
+        # Response Frame
+        self.response_frame = QFrame()
+        self.response_frame.setObjectName("response-frame")
+        self.response_layout = QVBoxLayout()
+        self.response_frame.setLayout(self.response_layout)
+
+        self.request_details = SmoothTextEdit(animator=self.animator)
+        self.request_details.setReadOnly(True)
+        self.response_body = SmoothTextEdit(animator=self.animator)
+        self.response_body.setReadOnly(True)
+
+        self.response_layout.addWidget(QLabel("Request Details:"))
+        self.response_layout.addWidget(self.request_details)
+        self.response_layout.addWidget(QLabel("Response Body:"))
+        self.response_layout.addWidget(self.response_body)
+
+        self.export_metrics_button = QPushButton("Export Metrics")
+        self.export_metrics_button.clicked.connect(self.export_metrics)
+        self.response_layout.addWidget(self.export_metrics_button)
+
+        self.container_layout.addWidget(self.response_frame)
+
+        # Progress Bar
+        self.progress_frame = QFrame()
+        self.progress_frame.setObjectName("progress-frame")
+        self.progress_frame.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.progress_layout = QVBoxLayout()
+        self.progress_frame.setLayout(self.progress_layout)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setTextVisible(False)
+
+        self.progress_layout.addWidget(self.progress_bar)
+        self.progress_frame.hide()
+
+        self.container_layout.addWidget(self.progress_frame)
+
+        # Send Queue
+        send_layout = QHBoxLayout()
+        self.send_count_spin = QSpinBox()
+        self.send_count_spin.setRange(1, 10000)
+        send_layout.addWidget(QLabel("Challans:"))
+        send_layout.addWidget(self.send_count_spin)
+        self.queue_status_label = QLabel()
+        send_layout.addWidget(self.queue_status_label)
+        send_layout.setStretch(2, 1)
+        self.main_layout.addLayout(send_layout)
+
+        # Send Button
+        self.send_button = QPushButton("Send Challan")
+        self.send_button.clicked.connect(self.send_challan)
+        self.main_layout.addWidget(self.send_button)
+        self.update_queue_status()
+
+        # Copyright Notice
+        self.copyright_label = QLabel("@with love by sahyam")
+        self.copyright_label.setObjectName("copyright")
+        self.main_layout.addWidget(self.copyright_label)
+
+        # Apply fade effects
+        for frame in [self.url_type_frame, self.details_frame, self.response_frame]:
+            self.animator.fade_in(frame)
+        self.capitalize_first_letter()
+        self.location_input.textChanged.connect(self.capitalize_first_letter)
+        self.district_input.textChanged.connect(self.capitalize_first_letter)
+
+    def capitalize_first_letter(self):
+        for field in [self.location_input, self.district_input]:
+            text = field.text()
+            if text:
+                capitalized_text = capitalize_first(text)
+                if text != capitalized_text:
+                    field.setText(capitalized_text)
+
+    def set_auto_dates(self):
+        self.violation_time, self.action_time = auto_dates()
+
+    def update_random_ids(self):
+        self.transaction_number, self.registration_number, self.equipment_id = id_generator().next_ids()
+
+    def update_url(self):
+        index = self.url_type_combo.currentIndex()
+        self.url_type, _, self.url, self.offence_id = URL_TYPES[index]
+        self.custom_url_input.setVisible(self.url is None)
+        if self.url is None:
+            self.url = self.custom_url_input.text().strip()
+        self.session = self.sessions.session(self.url_type)
+        self.body_mode_combo.blockSignals(True)
+        self.body_mode_combo.setCurrentText(self.send_pool.body_modes.mode(self.url_type))
+        self.body_mode_combo.blockSignals(False)
+
+    def choose_endpoint(self):
+        # The user picked an endpoint: pre-connect to it now and keep a warm standby
+        self.endpoint_chosen = True
+        if not self.standby_timer.isActive():
+            self.standby_timer.start()
+        self.prewarm()
+
+    def prewarm(self):
+        # Resolves and connects to the selected endpoint in the background so the
+        # first send does not pay for it; skipped while the same one still runs
+        if not self.endpoint_chosen:
+            return
+        self.update_url()
+        target = (self.use_async_engine(), self.url_type, self.url)
+        running = self.prewarming.get(target)
+        if not self.url or (running is not None and not running.done()):
+            return
+        if self.use_async_engine():
+            self.prewarming[target] = self.async_engine().prewarm(self.url)
+        else:
+            self.prewarming[target] = self.sessions.prewarm(self.url_type, self.url)
+
+    def use_async_engine(self):
+        return self.engine_combo.currentIndex() == 1
+
+    def async_engine(self):
+        if self.engine is None:
+            self.engine = AsyncEngine()
+        return self.engine
+
+    def connection_stats(self):
+        if self.use_async_engine():
+            return self.async_engine().client.stats()
+        return self.sessions.stats(self.url_type)
+
+    def get_identity(self):
+        return {
+            "userId": self.user_id_input.text(),
+            "districtId": self.district_id_input.text(),
+            "location": self.location_input.text(),
+            "district": self.district_input.text(),
+            "offCd": self.off_code_input.text(),
+        }
+
+    def scroll_to_widget(self, widget):
+        scroll_bar = self.scroll_area.verticalScrollBar()
+        widget_rect = widget.rect()
+        widget_global_rect = widget.mapToGlobal(widget_rect.topLeft())
+        scroll_area_rect = self.scroll_area.viewport().rect()
+        scroll_area_global_rect = self.scroll_area.viewport().mapToGlobal(
+            scroll_area_rect.topLeft()
+        )
+        target_position = (
+            widget_global_rect.y()
+            - scroll_area_global_rect.y()
+            + scroll_bar.value()
+        )
+        self.animator.scroll_to(scroll_bar, target_position, 500)
+
+    def choose_image_dir(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Evidence Image Folder", self.image_dir_input.text())
+        if directory:
+            self.image_dir_input.setText(directory)
+
+    def image_corpus(self):
+        directory = self.image_dir_input.text().strip()
+        if not directory:
+            return None
+        if self.images is None or self.images.directory != directory:
+            self.images = ImageCorpus(directory)
+        return self.images
+
+    def choose_identity_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Select Identity File", self.identity_file_input.text(),
+            "Identity files (*.csv *.jsonl *.ndjson);;All files (*)",
+        )
+        if path:
+            self.identity_file_input.setText(path)
+
+    def identity_import(self):
+        # Rows are consumed across clicks until the file runs out
+        path = self.identity_file_input.text().strip()
+        if not path:
+            return None
+        if self.identities is None or self.identities.path != path:
+            if self.identities is not None:
+                self.identities.close()
+                self.identities = None
+            self.identities = IdentityImport(path)
+        return self.identities
+
+    def send_challan(self):
+        try:
+            images = self.image_corpus()
+            identities = self.identity_import()
+        except (OSError, ValueError) as e:
+            self.response_body.setText(f"An error occurred: {str(e)}")
+            return
+
+        self.update_url()
+        if not self.url:
+            self.response_body.setText("An error occurred: Enter a URL for the custom endpoint")
+            return
+
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.start_dashboard()
+
+        template = compile_template(self.offence_id, self.get_identity()) if identities is None else None
+        engine = self.async_engine() if self.use_async_engine() else None
+        requested = self.send_count_spin.value()
+        messages = []
+        exhausted = False
+        for queued in range(requested):
+            building = time.perf_counter()
+            self.update_random_ids()
+            notices = []
+            self.batch_transactions = []
+            registration_numbers = []
+            captured = []
+            notice_identities = []
+            for _ in range(self.batch_size_spin.value()):
+                if identities is not None:
+                    try:
+                        identity = next(identities, None)
+                    except (OSError, ValueError) as e:
+                        messages.append(f"An error occurred: {str(e)}")
+                        identity = None
+                    if identity is None:
+                        exhausted = True
+                        break
+                    template = compile_template(self.offence_id, identity)
+                if notices:
+                    self.update_random_ids()
+                self.batch_transactions.append(self.transaction_number)
+                registration_numbers.append(self.registration_number)
+                image_name, image1 = images.next_named() if images is not None else (None, None)
+                notices.append(template.render_notice_parts(
+                    self.transaction_number,
+                    self.registration_number,
+                    self.equipment_id,
+                    self.violation_time,
+                    self.action_time,
+                    image1=image1,
+                ))
+                captured.append((
+                    self.transaction_number, self.registration_number, self.equipment_id, self.violation_time,
+                    self.action_time, image_name,
+                ))
+                notice_identities.append(template.identity)
+            if not notices:
+                messages.append(f"Identity file exhausted after {queued} of {requested} challans")
+                break
+            fields = None
+            if self.send_pool.capture is not None:
+                fields = capture_fields(self.offence_id, notice_identities[0], captured, notice_identities)
+            job = SendJob(
+                self.url_type, self.url, batch_parts(notices), self.batch_transactions, self.session, engine,
+                registration_numbers, fields,
+            )
+            profiler = active_profiler()
+            if profiler is not None:
+                profiler.span("build", building, args={"notices": len(notices)})
+            try:
+                self.send_pool.submit(job)
+            except queue.Full:
+                # Backpressure: refuse the rest rather than growing the queue
+                messages.append(
+                    f"Send queue full: queued {queued} of {requested} challans, "
+                    f"{requested - queued} not sent"
+                )
+                break
+            if exhausted:
+                messages.append(f"Identity file exhausted after {queued + 1} of {requested} challans")
+                break
+        if identities is not None:
+            messages.append(identities.summary())
+        if messages:
+            self.response_body.setText("\n".join(messages))
+
+    def export_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Metrics", "yarc-metrics.csv", "CSV (*.csv);;Prometheus text (*.prom)"
+        )
+        if path:
+            self.metrics.export(path)
+
+    def on_response_received(self, job, view):
+        self.metrics.observe(job.url_type, view.status_code, job.elapsed(), view.timings)
+        self.first_sends.setdefault(job.url, (job.elapsed(), view.timings or {}))
+        if self.coalescing():
+            self.pending_response = (job, view)
+        else:
+            self.pending_response = self.pending_error = None
+            self.show_response(job, view)
+
+    def coalescing(self):
+        # True when something was shown within the last dashboard tick; the
+        # next tick shows the latest result instead
+        return self.dashboard_timer.isActive() and time.perf_counter() - self.shown_at < 1 / DASHBOARD_HZ
+
+    def show_response(self, job, view):
+        rendering = self.shown_at = time.perf_counter()
+        latency = self.metrics.histogram(job.url_type)
+
+        connections = self.connection_stats()
+        frames = self.animator.frame_stats()
+        batch_html = ""
+        if view.itemised is not None:
+            batch_html = (
+                f"<br><strong>Batch:</strong> {len(job.transaction_numbers)} notices, "
+                f"{view.itemised} with per-notice results"
+            )
+        summary_html = ""
+        if view.summary:
+            summary_html = "<br><strong>Result:</strong> " + html.escape(
+                ", ".join(f"{key}={value}" for key, value in view.summary.items())
+            )
+        first_latency, first_timings = self.first_sends.get(job.url, (job.elapsed(), view.timings or {}))
+        first_send = f"{first_latency * 1000:.1f} ms"
+        first_phases = ", ".join(
+            f"{phase} {first_timings[phase] * 1000:.1f} ms" for phase in Metrics.PHASES if phase in first_timings
+        )
+        if first_phases:
+            first_send += f" ({first_phases})"
+        image_stats_html = ""
+        if self.images is not None:
+            image_stats = self.images.stats()
+            image_stats_html = (
+                f"<br><strong>Image Cache:</strong> {image_stats['hits']} hits, "
+                f"{image_stats['misses']} misses, {image_stats['cached']}/{image_stats['images']} cached"
+            )
+        request_details_html = f"""
+        <div style="
+            padding: 10px; 
+            margin-top: 10px; 
+            font-size: 16px;
+            line-height: 1.5;
+            color: #333;
+            ">
+            <strong>Request URL:</strong> {job.url}<br>
+            <strong>Response Time:</strong> {view.elapsed} seconds<br>
+            <strong>Latency:</strong> p50 {latency.percentile(50) * 1000:.1f} ms,
+            p99 {latency.percentile(99) * 1000:.1f} ms over {latency.count} sends<br>
+            <strong>First Send:</strong> {first_send}<br>
+            <strong>Connections:</strong> {connections["connections"]} opened
+            ({connections["prewarmed"]} pre-warmed), {connections["reused"]} reused,
+            {connections["tls_resumed"]} TLS sessions resumed<br>
+            <strong>Frames:</strong> p50 {frames["p50_ms"]:.1f} ms, p99 {frames["p99_ms"]:.1f} ms
+            over {frames["frames"]} animation frames
+            {summary_html}
+            {image_stats_html}
+            {batch_html}
+        </div>
+        """
+
+        self.request_details.setHtml(
+            f"""
+            {view.status_html}
+            {request_details_html}
+        """
+        )
+
+        self.scroll_timer.start()
+
+        if len(view.body_text) > 50:
+            if self.response_viewer is None:
+                self.response_viewer = ResponseViewer(self)
+            self.response_viewer.show_view(view)
+        else:
+            self.response_body.setText(view.body_text)
+        profiler = active_profiler()
+        if profiler is not None:
+            profiler.span("render", rendering)
+    
+    def update_queue_status(self):
+        stats = self.send_pool.stats()
+        self.queue_status_label.setText(
+            f"Queue: {stats['queued']}/{stats['capacity']} waiting, "
+            f"{stats['in_flight']}/{stats['workers']} in flight"
+        )
+        outstanding = stats["queued"] + stats["in_flight"]
+        if outstanding:
+            self.progress_bar.setValue(100 * stats["completed"] // (stats["completed"] + outstanding))
+        else:
+            # Update progress bar, then hide it once the queue drains
+            self.progress_bar.setValue(100)
+            self.progress_bar.hide()
+
+    def on_request_error(self, job, error_message):
+        self.metrics.observe(job.url_type, None, job.elapsed())
+        if self.coalescing():
+            self.pending_error = error_message
+        else:
+            self.pending_response = self.pending_error = None
+            self.shown_at = time.perf_counter()
+            self.response_body.setText(error_message)  # Display error
+
+    def on_queue_changed(self):
+        if not self.dashboard_timer.isActive():
+            self.update_queue_status()
+
+    def start_dashboard(self):
+        self.idle_since = None
+        if not self.dashboard_timer.isActive():
+            self.dashboard_timer.start()
+
+    def refresh_dashboard(self):
+        refreshing = time.perf_counter()
+        self.rolling.add(*self.send_pool.results.drain())
+        snapshot = self.rolling.snapshot()
+        self.render_dashboard(snapshot)
+        self.update_queue_status()
+        if self.pending_response is not None:
+            self.show_response(*self.pending_response)
+            self.pending_response = None
+        if self.pending_error is not None:
+            self.shown_at = time.perf_counter()
+            self.response_body.setText(self.pending_error)
+            self.pending_error = None
+        stats = self.send_pool.stats()
+        if stats["queued"] or stats["in_flight"]:
+            self.idle_since = None
+        elif self.idle_since is None:
+            self.idle_since = time.perf_counter()
+        elif time.perf_counter() - self.idle_since > self.rolling.window:
+            # Keep refreshing until the rolling window has emptied, then stop
+            self.dashboard_timer.stop()
+        profiler = active_profiler()
+        if profiler is not None:
+            profiler.span("dashboard", refreshing)
+
+    def render_dashboard(self, snapshot):
+        self.throughput_label.setText(
+            f"Throughput: {snapshot['rps']:.1f} req/s over the last {self.rolling.window} s, "
+            f"{snapshot['total']} results"
+            + (f" ({snapshot['dropped']} not sampled)" if snapshot["dropped"] else "")
+        )
+        rates = []
+        for key, rate in snapshot["rates"].items():
+            color = STATUS_STYLES.get(int(key[0]), SERVER_ERROR_STYLE)[0] if key[0].isdigit() else "darkred"
+            rates.append(f'<span style="color: {color};">{key} {rate * 100:.1f}%</span>')
+        self.status_rates_label.setText("Status: " + " &nbsp; ".join(rates))
+        latencies = [value for value in snapshot["latency"] if value is not None]
+        peak = f"peak {max(latencies) * 1000:.0f} ms" if latencies else "no sends yet"
+        self.sparkline_label.setText(
+            f"Latency ({self.rolling.history} s): {sparkline(snapshot['latency'])} {peak}"
+        )
+
+
+def run_gui():
+    app = QApplication(sys.argv)
+    window = ChallanSender()
+    window.show()
+    return app.exec_()
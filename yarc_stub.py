@@ -0,0 +1,157 @@
+# Local stand-in for the pushdata endpoint, used for benchmarks and offline testing
+import http.server
+import json
+import math
+import random
+import socket
+import ssl
+import sys
+import threading
+import time
+import zlib
+from yarc_core import STUB_PATH
+
+
+def parse_latency(spec, rng=random):
+    # fixed:MS, uniform:LOW_MS:HIGH_MS, normal:MEAN_MS:SD_MS, lognormal:MEDIAN_MS:SIGMA, exp:MEAN_MS
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(":")] if params else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec}")
+    if kind == "fixed" and len(values) <= 1:
+        delay = values[0] / 1000 if values else 0.0
+        return lambda: delay
+    if kind == "uniform" and len(values) == 2:
+        low, high = values[0] / 1000, values[1] / 1000
+        return lambda: rng.uniform(low, high)
+    if kind == "normal" and len(values) == 2:
+        mean, deviation = values[0] / 1000, values[1] / 1000
+        return lambda: max(0.0, rng.gauss(mean, deviation))
+    if kind == "lognormal" and len(values) == 2:
+        mu, sigma = math.log(values[0] / 1000), values[1]
+        return lambda: rng.lognormvariate(mu, sigma)
+    if kind == "exp" and len(values) == 1:
+        rate = 1000 / values[0]
+        return lambda: rng.expovariate(rate)
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+
+class StubPushdataHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "yarc-stub"
+    wbufsize = -1
+
+    def setup(self):
+        if self.server.ssl_context is not None:
+            # Handshake on the connection's own thread rather than in the accept loop
+            self.request = self.server.ssl_context.wrap_socket(self.request, server_side=True)
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        if self.path.split("?")[0] != STUB_PATH:
+            self.reply(404, {"status": "FAILURE", "message": f"No endpoint at {self.path}"})
+            return
+        body = self.read_body()
+        encoding = self.headers.get("Content-Encoding", "identity").lower()
+        if encoding != "identity":
+            if encoding != "gzip" or not self.server.gzip:
+                self.reply(415, {"status": "FAILURE", "message": f"Unsupported Content-Encoding: {encoding}"},
+                           {"Accept-Encoding": "identity"})
+                return
+            try:
+                body = zlib.decompress(body, 31)
+            except zlib.error:
+                self.reply(400, {"status": "FAILURE", "message": "Invalid gzip body"})
+                return
+        try:
+            notices = json.loads(body)["cctvNoticeData"]
+            transaction_numbers = [notice["transactionNo"] for notice in notices]
+        except (ValueError, KeyError, TypeError):
+            self.reply(400, {"status": "FAILURE", "message": "Invalid cctvNoticeData payload"})
+            return
+        delay = self.server.latency()
+        if delay > 0:
+            time.sleep(delay)
+        if self.server.error_rate and self.server.random.random() < self.server.error_rate:
+            self.reply(500, {"status": "FAILURE", "message": "Simulated server error"})
+            return
+        self.reply(200, {
+            "status": "SUCCESS",
+            "data": [{"transactionNo": number, "status": "ACCEPTED"} for number in transaction_numbers],
+        })
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+            if size == 0:
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def reply(self, status_code, result, headers=None):
+        content = json.dumps(result).encode("utf-8")
+        if len(content) < self.server.response_bytes:
+            result["padding"] = "x" * (self.server.response_bytes - len(content) - len(', "padding": ""'))
+            content = json.dumps(result).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host="127.0.0.1", port=8089, latency="fixed:0", error_rate=0.0, response_bytes=0,
+                 seed=None, verbose=False, certfile=None, keyfile=None, gzip=True):
+        self.random = random.Random(seed)
+        self.ssl_context = None
+        if certfile:
+            self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            self.ssl_context.load_cert_chain(certfile, keyfile)
+        self.latency = parse_latency(latency, self.random)
+        self.error_rate = error_rate
+        self.response_bytes = response_bytes
+        self.verbose = verbose
+        # Without gzip, gzip-encoded bodies are refused with 415
+        self.gzip = gzip
+        self.thread = None
+        super().__init__((host, port), StubPushdataHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        scheme = "https" if self.ssl_context is not None else "http"
+        return f"{scheme}://{host}:{port}{STUB_PATH}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="yarc-stub", daemon=True)
+        self.thread.start()
+        return self
+
+    def handle_error(self, request, client_address):
+        # Clients that stop reading a large body hang up mid-response, and clients
+        # that reject the certificate abort the handshake; neither is an error here
+        if not isinstance(sys.exc_info()[1], (ConnectionError, ssl.SSLError)):
+            super().handle_error(request, client_address)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.thread is not None:
+            self.thread.join()